@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Compare normal and bulk-load mode when loading a CSV file into a
+new Selector and when adding it to a Selector that is already
+populated and indexed.
+
+    python benchmarks/bulk_load.py [rows] [columns]
+"""
+from __future__ import print_function
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datatest import Selector
+
+
+def write_file(path, rows, columns):
+    with open(path, 'w') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['c{0}'.format(i) for i in range(columns)])
+        for row in range(rows):
+            writer.writerow([(row * 7919 + i) % 100003 if i % 3 else
+                             'v{0}_{1}'.format((row * 31 + i) % 1009, i)
+                             for i in range(columns)])
+
+
+def best_of(repeat, function, setup=lambda: None):
+    """Return the fastest of *repeat* calls of function(setup())."""
+    timings = []
+    for _ in range(repeat):
+        value = setup()
+        start = timeit.default_timer()
+        function(value)
+        timings.append(timeit.default_timer() - start)
+    return min(timings)
+
+
+def main(rows=100000, columns=30):
+    directory = tempfile.mkdtemp()
+    counter = [0]
+
+    def get_storage(storage):
+        if storage != 'file':
+            return storage
+        counter[0] += 1
+        return os.path.join(directory, 'storage{0}.sqlite'.format(counter[0]))
+
+    try:
+        path = os.path.join(directory, 'data.csv')
+        write_file(path, rows, columns)
+        print('{0} rows x {1} columns'.format(rows, columns))
+
+        for storage in ['tempfile', 'memory', 'file']:
+            def new_table():
+                return Selector(storage=get_storage(storage))
+
+            def indexed_table():
+                select = Selector(path, storage=get_storage(storage))
+                select.create_index('c0')
+                select.create_index('c1', 'c2')
+                return select
+
+            for label, setup in [('new', new_table),
+                                 ('indexed', indexed_table)]:
+                normal = best_of(3, lambda x: x.load_data(path), setup)
+                bulk = best_of(3, lambda x: x.load_data(path, bulk_load=True), setup)
+                print('{0:9} {1:8} normal {2:.2f}s  bulk_load {3:.2f}s'.format(
+                    storage, label, normal, bulk))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
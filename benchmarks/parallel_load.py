@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Compare a serial Selector load of many CSV files with a load
+that parses the files in a pool of worker processes.
+
+    python benchmarks/parallel_load.py [files] [rows] [workers]
+"""
+from __future__ import print_function
+import csv
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import sqlite3
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datatest import Selector
+from datatest._load.parallel import parse_csv_files
+from datatest._load.parallel import read_parsed
+from datatest._load.temptable import copy_table
+
+
+def write_files(directory, files, rows):
+    paths = []
+    for index in range(files):
+        path = os.path.join(directory, 'file{0}.csv'.format(index))
+        with open(path, 'w') as fh:
+            writer = csv.writer(fh)
+            writer.writerow(['A', 'B', 'C', 'D', 'E', 'F'])
+            for row in range(rows):
+                writer.writerow(['x{0}'.format(row % 97), row, row * 0.5,
+                                 'foo', 'bar{0}'.format(row % 7), index])
+        paths.append(path)
+    return paths
+
+
+def best_of(repeat, function):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def serial_share(paths, kwds):
+    """Return a tuple of (parse_seconds, copy_seconds): the time
+    spent parsing in the workers and the time the parent process
+    spends copying the parsed files into its own table.
+    """
+    start = timeit.default_timer()
+    with parse_csv_files(paths, 1, (), kwds) as parsed:
+        parse_seconds = timeit.default_timer() - start
+        connection = sqlite3.connect('')
+        connection.isolation_level = None
+        cursor = connection.cursor()
+        start = timeit.default_timer()
+        for index, result in enumerate(parsed):
+            read_parsed(cursor, 'staged{0}'.format(index), result)
+            copy_table(cursor, 'loaded', 'staged{0}'.format(index))
+        copy_seconds = timeit.default_timer() - start
+        connection.close()
+    return parse_seconds, copy_seconds
+
+
+def main(files=8, rows=60000, workers=None):
+    workers = workers or multiprocessing.cpu_count()
+    directory = tempfile.mkdtemp()
+    try:
+        paths = write_files(directory, files, rows)
+        print('{0} files x {1} rows, {2} CPUs'.format(
+            files, rows, multiprocessing.cpu_count()))
+        for kwds in [{}, {'infer_types': True}]:
+            serial = best_of(3, lambda: Selector(paths, **kwds).fieldnames)
+            parallel = best_of(3, lambda: Selector(paths, workers=workers,
+                                                   **kwds).fieldnames)
+            parse, copy = serial_share(paths, kwds)
+            print('{0!r:24} serial {1:.2f}s  workers={2} {3:.2f}s  '
+                  '(worker parsing {4:.2f}s, parent copying {5:.2f}s)'.format(
+                      kwds, serial, workers, parallel, parse, copy))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
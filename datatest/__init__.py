@@ -26,6 +26,11 @@ from ._load.working_directory import working_directory
 from ._query.query import Selector
 from ._query.query import Query
 from ._query.query import Result
+from ._query.query import LazyMapping
+from ._query.columnar import ArraySelector
+from ._query.streaming import StreamingSelector
+from ._query.sharded import ShardedSelector
+from ._query.remote import RemoteSelector
 from ._repeatingcontainer import RepeatingContainer
 ProxyGroup = RepeatingContainer  # <- Temporary alias.
 
@@ -33,5 +38,10 @@ ProxyGroup = RepeatingContainer  # <- Temporary alias.
 Selector.__module__ = 'datatest'
 Query.__module__ = 'datatest'
 Result.__module__ = 'datatest'
+LazyMapping.__module__ = 'datatest'
+ArraySelector.__module__ = 'datatest'
+StreamingSelector.__module__ = 'datatest'
+ShardedSelector.__module__ = 'datatest'
+RemoteSelector.__module__ = 'datatest'
 
 __version__ = '0.9.5.dev0'
@@ -49,6 +49,7 @@ class DataSource(datatest.Selector):
             data_list = file
 
         new_cls = cls.__new__(cls)
+        datatest.Selector.__init__(new_cls)  # <- Initialize empty Selector.
         new_cls._connection = DEFAULT_CONNECTION
         cursor = new_cls._connection.cursor()
         with savepoint(cursor):
@@ -65,6 +66,7 @@ class DataSource(datatest.Selector):
     @classmethod
     def from_excel(cls, path, worksheet=0):
         new_cls = cls.__new__(cls)
+        datatest.Selector.__init__(new_cls)  # <- Initialize empty Selector.
         new_cls._connection = DEFAULT_CONNECTION
         cursor = new_cls._connection.cursor()
         with savepoint(cursor):
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Persistent on-disk cache for loaded data sources.
+
+Each cached source is stored in its own SQLite database file. The
+file contains a "datatest_data" table with the loaded records and
+a "datatest_source" table with the fingerprint of the source at
+the time it was loaded.
+"""
+import hashlib
+import os
+import sqlite3
+from .temptable import create_table
+from .temptable import get_column_types
+from .temptable import get_columns
+from .temptable import normalize_names
+from .temptable import savepoint
+from .temptable import table_exists
+
+
+_CACHE_SCHEMA = 'datatest_cache'  # Schema name used when attaching.
+
+
+def get_fingerprint(path, content_hash=False):
+    """Return a fingerprint tuple of (path, size, mtime, digest) for
+    the file at *path*. If *content_hash* is True, the digest is a
+    SHA-1 hex digest of the file's contents, otherwise it is None.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+
+    digest = None
+    if content_hash:
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1048576), b''):
+                sha1.update(chunk)
+        digest = sha1.hexdigest()
+
+    return (path, stat.st_size, stat.st_mtime, digest)
+
+
+def get_cache_file(cache_dir, path, args=(), kwds=None):
+    """Return the cache file path for the source at *path* loaded
+    with the given *args* and *kwds*.
+    """
+    kwds = sorted((kwds or {}).items())
+    key = repr((os.path.abspath(path), tuple(args), kwds))
+    name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, '{0}.sqlite'.format(name))
+
+
+def _attached_table_exists(cursor, table):
+    cursor.execute(
+        'SELECT name FROM {0}.sqlite_master WHERE type=? AND name=?'
+        .format(_CACHE_SCHEMA),
+        ('table', table),
+    )
+    return bool(cursor.fetchall())
+
+
+def _column_defs(columns, types):
+    """Return a string of column definitions for CREATE TABLE."""
+    names = normalize_names(columns)
+    return ', '.join('{0} {1}'.format(x, t).rstrip() for x, t in zip(names, types))
+
+
+def read_cache(cursor, table, cache_file, fingerprint):
+    """Copy records from *cache_file* into a new temporary *table*
+    (keeping the declared column types of the cached records) if
+    the stored fingerprint matches the given *fingerprint*.
+    Returns True if the cache was used or False if the cache entry
+    is missing or stale. When the cached source contained no
+    records, True is returned but no table is created.
+    """
+    if not os.path.isfile(cache_file):
+        return False  # <- EXIT!
+
+    cursor.execute('ATTACH DATABASE ? AS {0}'.format(_CACHE_SCHEMA),
+                   (cache_file,))
+    try:
+        try:
+            if not _attached_table_exists(cursor, 'datatest_source'):
+                return False  # <- EXIT!
+            cursor.execute('SELECT path, size, mtime, digest FROM '
+                           '{0}.datatest_source'.format(_CACHE_SCHEMA))
+            stored = cursor.fetchone()
+        except sqlite3.DatabaseError:
+            return False  # <- EXIT! (File is not a usable cache.)
+
+        if stored is None or tuple(stored) != tuple(fingerprint):
+            return False  # <- EXIT!
+
+        if _attached_table_exists(cursor, 'datatest_data'):
+            cursor.execute('PRAGMA {0}.table_info(datatest_data)'
+                           .format(_CACHE_SCHEMA))
+            table_info = cursor.fetchall()
+            create_table(cursor, table, [x[1] for x in table_info],
+                         types=[x[2] for x in table_info])
+            cursor.execute('INSERT INTO {0} SELECT * FROM {1}.datatest_data'
+                           .format(table, _CACHE_SCHEMA))
+        return True
+    finally:
+        cursor.execute('DETACH DATABASE {0}'.format(_CACHE_SCHEMA))
+
+
+def write_cache(cursor, table, cache_file, fingerprint):
+    """Store records from *table* and the source's *fingerprint* in
+    *cache_file*, replacing any existing cache entry. If *table* does
+    not exist, only the fingerprint is stored.
+    """
+    cursor.execute('ATTACH DATABASE ? AS {0}'.format(_CACHE_SCHEMA),
+                   (cache_file,))
+    try:
+        with savepoint(cursor):
+            cursor.execute('DROP TABLE IF EXISTS {0}.datatest_source'
+                           .format(_CACHE_SCHEMA))
+            cursor.execute('DROP TABLE IF EXISTS {0}.datatest_data'
+                           .format(_CACHE_SCHEMA))
+
+            if table_exists(cursor, table):
+                column_defs = _column_defs(get_columns(cursor, table),
+                                           get_column_types(cursor, table))
+                cursor.execute('CREATE TABLE {0}.datatest_data ({1})'
+                               .format(_CACHE_SCHEMA, column_defs))
+                cursor.execute('INSERT INTO {0}.datatest_data SELECT * FROM {1}'
+                               .format(_CACHE_SCHEMA, table))
+
+            cursor.execute(
+                'CREATE TABLE {0}.datatest_source (path, size, mtime, digest)'
+                .format(_CACHE_SCHEMA)
+            )
+            cursor.execute(
+                'INSERT INTO {0}.datatest_source VALUES (?, ?, ?, ?)'
+                .format(_CACHE_SCHEMA),
+                fingerprint,
+            )
+    finally:
+        cursor.execute('DETACH DATABASE {0}'.format(_CACHE_SCHEMA))
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Helpers for copying and joining tables between SQLite connections.
+
+A table stored in a named database file is attached to the joining
+connection with ATTACH DATABASE. Tables in temporary or in-memory
+databases cannot be attached, so their records are first copied
+(with INSERT ... SELECT) into a temporary database file which is
+attached instead. Records are never loaded into Python objects.
+"""
+import os
+import tempfile
+from .cache import _column_defs
+from .temptable import create_table
+from .temptable import get_column_types
+from .temptable import get_columns
+from .temptable import normalize_names
+
+
+_STAGE_SCHEMA = 'datatest_stage'  # Schema name used when copying.
+_rowid_chunk_size = 500  # Rowids per IN-list when copying selected rows.
+
+
+def copy_to_file(source_cursor, source_table, db_path, rowids=None):
+    """Copy *source_table* (keeping its declared column types) into
+    a "datatest_data" table in the database file at *db_path*. If
+    *rowids* is given, only the rows with those rowids are copied
+    (in rowid order when *rowids* is sorted).
+    """
+    source_cursor.execute('ATTACH DATABASE ? AS {0}'.format(_STAGE_SCHEMA),
+                          (db_path,))
+    try:
+        column_defs = _column_defs(get_columns(source_cursor, source_table),
+                                   get_column_types(source_cursor, source_table))
+        source_cursor.execute('CREATE TABLE {0}.datatest_data ({1})'
+                              .format(_STAGE_SCHEMA, column_defs))
+        statement = 'INSERT INTO {0}.datatest_data SELECT * FROM {1}'.format(
+            _STAGE_SCHEMA, source_table)
+        if rowids is None:
+            source_cursor.execute(statement)
+            return  # <- EXIT!
+
+        statement += ' WHERE rowid IN ({0}) ORDER BY rowid'
+        for start in range(0, len(rowids), _rowid_chunk_size):
+            chunk = rowids[start:start + _rowid_chunk_size]
+            source_cursor.execute(
+                statement.format(', '.join('?' * len(chunk))), chunk)
+    finally:
+        source_cursor.execute('DETACH DATABASE {0}'.format(_STAGE_SCHEMA))
+
+
+def copy_from_file(cursor, table, db_path):
+    """Copy the "datatest_data" table from the database file at
+    *db_path* (see copy_to_file()) into a new *table*, keeping its
+    declared column types.
+    """
+    cursor.execute('ATTACH DATABASE ? AS {0}'.format(_STAGE_SCHEMA),
+                   (db_path,))
+    try:
+        cursor.execute('PRAGMA {0}.table_info(datatest_data)'
+                       .format(_STAGE_SCHEMA))
+        table_info = cursor.fetchall()
+        create_table(cursor, table, [x[1] for x in table_info],
+                     types=[x[2] for x in table_info])
+        cursor.execute('INSERT INTO {0} SELECT * FROM {1}.datatest_data'
+                       .format(table, _STAGE_SCHEMA))
+    finally:
+        cursor.execute('DETACH DATABASE {0}'.format(_STAGE_SCHEMA))
+
+
+def copy_across(source_cursor, source_table, cursor, table, rowids=None):
+    """Copy *source_table* from the connection of *source_cursor*
+    into a new *table* in the connection of *cursor* (by way of a
+    temporary database file). If *rowids* is given, only those rows
+    are copied (see copy_to_file()).
+    """
+    fd, temp_path = tempfile.mkstemp(prefix='datatest_stage_', suffix='.sqlite')
+    os.close(fd)
+    try:
+        copy_to_file(source_cursor, source_table, temp_path, rowids)
+        copy_from_file(cursor, table, temp_path)
+    finally:
+        os.remove(temp_path)
+
+
+def stage_table(cursor, source_connection, source_table, path, schema):
+    """Attach the database that holds *source_table* to the connection
+    of *cursor* as *schema* and return a tuple of (table, temp_path)
+    where *table* is the schema-qualified name to use in queries. If
+    *path* is not given, the records of *source_table* are copied
+    into a new temporary database file and *temp_path* is its path
+    (otherwise *temp_path* is None).
+    """
+    if path:
+        cursor.execute('ATTACH DATABASE ? AS {0}'.format(schema), (path,))
+        return '{0}.{1}'.format(schema, source_table), None  # <- EXIT!
+
+    fd, temp_path = tempfile.mkstemp(prefix='datatest_stage_', suffix='.sqlite')
+    os.close(fd)
+    try:
+        copy_to_file(source_connection.cursor(), source_table, temp_path)
+        cursor.execute('ATTACH DATABASE ? AS {0}'.format(schema), (temp_path,))
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return '{0}.datatest_data'.format(schema), temp_path
+
+
+def unstage_table(cursor, schema, temp_path=None):
+    """Detach a database that was attached with stage_table() and
+    remove its temporary file (if any).
+    """
+    cursor.execute('DETACH DATABASE {0}'.format(schema))
+    if temp_path:
+        os.remove(temp_path)
+
+
+def join_tables(cursor, table, left, right, left_columns, right_columns,
+                on, how='inner', suffix='_right', left_types=None,
+                right_types=None):
+    """Create *table* with the rows of *left* joined to the rows of
+    *right* where the column pairs in *on* are equal. The new table
+    contains every left column followed by every right column (right
+    column names that are already used get the given *suffix*). If
+    *how* is 'left', unmatched left rows are kept and their right
+    columns are NULL. If given, *left_types* and *right_types* are the
+    declared types of the left and right columns.
+    """
+    join_types = {'inner': 'INNER JOIN', 'left': 'LEFT OUTER JOIN'}
+    if how not in join_types:
+        msg = "how must be 'inner' or 'left', got {0!r}"
+        raise ValueError(msg.format(how))
+
+    names = list(left_columns)
+    for name in right_columns:
+        while name in names:
+            name = '{0}{1}'.format(name, suffix)
+        names.append(name)
+    types = list(left_types or [None] * len(left_columns))
+    types.extend(right_types or [None] * len(right_columns))
+    create_table(cursor, table, names, types=types)
+
+    selected = ['l.{0}'.format(x) for x in normalize_names(left_columns)]
+    selected.extend('r.{0}'.format(x) for x in normalize_names(right_columns))
+    conditions = ['l.{0} = r.{1}'.format(*normalize_names([x, y])) for x, y in on]
+    statement = (
+        'INSERT INTO {0} ({1})\n'
+        'SELECT {2}\n'
+        'FROM {3} AS l {4} {5} AS r ON {6}\n'
+        'ORDER BY l.rowid, r.rowid'
+    ).format(
+        table,
+        ', '.join(normalize_names(names)),
+        ', '.join(selected),
+        left,
+        join_types[how],
+        right,
+        ' AND '.join(conditions),
+    )
+    cursor.execute(statement)
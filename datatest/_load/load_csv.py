@@ -4,6 +4,7 @@ from .._utils import exhaustible
 from .._utils import seekable
 from .._utils import file_types
 from .get_reader import get_reader
+from .temptable import _load_options
 from .temptable import load_data
 from .temptable import savepoint
 
@@ -18,13 +19,17 @@ def load_csv(cursor, table, csvfile, encoding=None, **kwds):
     global fallback_encoding
 
     default = kwds.get('restval', '')  # Used for default column value.
+    load_kwds = {'default': default}
+    for key in _load_options:
+        if key in kwds:
+            load_kwds[key] = kwds.pop(key)
 
     if encoding:
         # When an encoding is specified, use it to load *csvfile* or
         # fail if there are errors (no fallback recovery):
         with savepoint(cursor):
             reader = get_reader.from_csv(csvfile, encoding, **kwds)
-            load_data(cursor, table, reader, default=default)
+            load_data(cursor, table, reader, **load_kwds)
 
         return  # <- EXIT!
 
@@ -39,7 +44,7 @@ def load_csv(cursor, table, csvfile, encoding=None, **kwds):
     try:
         with savepoint(cursor):
             reader = get_reader.from_csv(csvfile, preferred_encoding, **kwds)
-            load_data(cursor, table, reader, default=default)
+            load_data(cursor, table, reader, **load_kwds)
 
         return  # <- EXIT!
 
@@ -64,7 +69,7 @@ def load_csv(cursor, table, csvfile, encoding=None, **kwds):
             try:
                 with savepoint(cursor):
                     reader = get_reader.from_csv(csvfile, fallback, **kwds)
-                    load_data(cursor, table, reader, default=default)
+                    load_data(cursor, table, reader, **load_kwds)
 
                 msg = (
                     '{0}: loaded {1!r} using fallback {2!r}: specify an '
@@ -84,3 +89,29 @@ def load_csv(cursor, table, csvfile, encoding=None, **kwds):
             'must specify an appropriate text encoding'
         ).format(reason, csvfile)
         raise UnicodeDecodeError(encoding, object_, start, end, reason)
+
+
+def read_csv_header(path, encoding=None, **kwds):
+    """Return the list of column names from the first row of the CSV
+    file at *path* or None if the header cannot be read (the file is
+    empty or cannot be decoded).
+    """
+    kwds = dict((k, v) for k, v in kwds.items() if k not in _load_options)
+    if encoding:
+        encodings = [encoding]
+    elif isinstance(fallback_encoding, list):
+        encodings = [preferred_encoding] + fallback_encoding
+    else:
+        encodings = [preferred_encoding, fallback_encoding]
+
+    for encoding in encodings:
+        reader = get_reader.from_csv(path, encoding, **kwds)
+        try:
+            return list(next(reader))
+        except StopIteration:
+            return None  # <- EXIT! (File is empty.)
+        except UnicodeDecodeError:
+            pass
+        finally:
+            reader.close()
+    return None
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Parse CSV files in a pool of worker processes.
+
+Each worker loads its file into a database file of its own. The
+parsed records are then copied into the current process's database
+with INSERT ... SELECT (by attaching each file in turn) so rows are
+never pickled or passed through Python objects.
+"""
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import warnings
+from .._compatibility import contextlib
+from .load_csv import load_csv
+from .temptable import create_table
+from .temptable import table_exists
+
+
+_PARSED_SCHEMA = 'datatest_parsed'  # Schema name used when attaching.
+
+
+def _parse_csv(task):
+    """Load a CSV file into a "datatest_data" table in a new database
+    file and return a tuple of (db_path, warning_messages). If the
+    CSV file contains no data, *db_path* will be None.
+    """
+    path, db_path, args, kwds = task
+    connection = sqlite3.connect(db_path)
+    connection.isolation_level = None
+    cursor = connection.cursor()
+    try:
+        cursor.execute('PRAGMA journal_mode=OFF')  # <- File is disposable.
+        cursor.execute('PRAGMA synchronous=OFF')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            load_csv(cursor, 'datatest_data', path, *args, **kwds)
+        messages = [str(x.message) for x in caught]
+
+        if not table_exists(cursor, 'datatest_data'):
+            return None, messages  # <- EXIT!
+        return db_path, messages
+    finally:
+        connection.close()
+
+
+@contextlib.contextmanager
+def parse_csv_files(paths, workers, args=(), kwds=None):
+    """Context manager that parses the CSV files in *paths* using a
+    pool of *workers* processes. Yields a list of parsed results in
+    the same order as *paths* (see read_parsed()). The *args* and
+    *kwds* are passed to load_csv() and must be picklable. Parsed
+    database files are removed when the context manager exits.
+    """
+    if not paths:
+        yield []
+        return  # <- EXIT!
+
+    temp_dir = tempfile.mkdtemp(prefix='datatest_parsed_')
+    try:
+        tasks = []
+        for index, path in enumerate(paths):
+            db_path = os.path.join(temp_dir, 'parsed{0}.sqlite'.format(index))
+            tasks.append((path, db_path, tuple(args), dict(kwds or {})))
+
+        pool = multiprocessing.Pool(min(workers, len(tasks)))
+        try:
+            parsed = pool.map(_parse_csv, tasks, chunksize=1)
+        finally:
+            pool.terminate()
+            pool.join()
+        yield parsed
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def read_parsed(cursor, table, parsed):
+    """Copy the records of a *parsed* result from parse_csv_files()
+    into a new temporary *table* (keeping their declared column
+    types) and re-issue any warnings raised while parsing. Returns
+    True if *table* was created or False if the source contained
+    no records. Must not be called inside a transaction.
+    """
+    db_path, messages = parsed
+    for message in messages:
+        warnings.warn(message)
+
+    if db_path is None:
+        return False  # <- EXIT!
+
+    cursor.execute('ATTACH DATABASE ? AS {0}'.format(_PARSED_SCHEMA),
+                   (db_path,))
+    try:
+        cursor.execute('PRAGMA {0}.table_info(datatest_data)'
+                       .format(_PARSED_SCHEMA))
+        table_info = cursor.fetchall()
+        create_table(cursor, table, [x[1] for x in table_info],
+                     types=[x[2] for x in table_info])
+        cursor.execute('INSERT INTO {0} SELECT * FROM {1}.datatest_data'
+                       .format(table, _PARSED_SCHEMA))
+    finally:
+        cursor.execute('DETACH DATABASE {0}'.format(_PARSED_SCHEMA))
+    return True
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Snapshot files for sharing loaded data between processes.
+
+A snapshot is an SQLite database file that contains a copy of a
+Selector's table (with its indexes) and a "datatest_snapshot" table
+with the table's name and the strings used for the Selector's repr.
+"""
+import os
+import re
+import sqlite3
+from .temptable import savepoint
+from .temptable import table_exists
+from .temptable import uses_temp_database
+
+
+_SNAPSHOT_SCHEMA = 'datatest_snapshot'  # Schema name used when attaching.
+
+_create_pattern = re.compile(
+    r'^CREATE\s+(UNIQUE\s+)?(?:TEMP\s+|TEMPORARY\s+)?(TABLE|INDEX)\s+'
+    r'(IF\s+NOT\s+EXISTS\s+)?',
+    re.IGNORECASE,
+)
+
+
+def get_table_schema(cursor, table):
+    """Return the name of the schema that contains *table* ('temp'
+    or 'main').
+    """
+    cursor.execute(
+        "SELECT 1 FROM sqlite_temp_master WHERE type='table' AND name=?",
+        (table,),
+    )
+    return 'temp' if cursor.fetchone() else 'main'
+
+
+def copy_to_schema(cursor, table, source_schema, target_schema):
+    """Copy *table* and its indexes from *source_schema* into a new
+    table of the same name in *target_schema*.
+    """
+    cursor.execute(
+        'SELECT type, sql FROM {0}.sqlite_master '
+        'WHERE tbl_name=? AND sql IS NOT NULL'.format(source_schema),
+        (table,),
+    )
+    statements = cursor.fetchall()
+    statements.sort(key=lambda x: x[0] == 'index')  # Tables first.
+
+    def qualify(match):
+        unique, type_, if_not_exists = match.groups()
+        return 'CREATE {0}{1} {2}{3}.'.format(
+            unique or '', type_, if_not_exists or '', target_schema)
+
+    for type_, sql in statements:
+        cursor.execute(_create_pattern.sub(qualify, sql, count=1))
+        if type_ == 'table':  # Insert records before creating indexes.
+            cursor.execute('INSERT INTO {0}.{1} SELECT * FROM {2}.{1}'.format(
+                target_schema, table, source_schema))
+
+
+def write_snapshot(cursor, table, path, obj_strings):
+    """Write *table* and the Selector's *obj_strings* to a snapshot
+    file at *path*. The file is written under a temporary name and
+    then renamed so other processes never see a partial snapshot.
+    """
+    temp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    cursor.execute('ATTACH DATABASE ? AS {0}'.format(_SNAPSHOT_SCHEMA),
+                   (temp_path,))
+    try:
+        try:
+            with savepoint(cursor):
+                if table and table_exists(cursor, table):
+                    schema = get_table_schema(cursor, table)
+                    copy_to_schema(cursor, table, schema, _SNAPSHOT_SCHEMA)
+                else:
+                    table = None
+
+                cursor.execute(
+                    'CREATE TABLE {0}.datatest_snapshot (table_name, obj_string)'
+                    .format(_SNAPSHOT_SCHEMA)
+                )
+                cursor.executemany(
+                    'INSERT INTO {0}.datatest_snapshot VALUES (?, ?)'
+                    .format(_SNAPSHOT_SCHEMA),
+                    [(table, x) for x in obj_strings] or [(table, None)],
+                )
+        finally:
+            cursor.execute('DETACH DATABASE {0}'.format(_SNAPSHOT_SCHEMA))
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+    replace = getattr(os, 'replace', os.rename)  # os.replace() is new in 3.3
+    replace(temp_path, path)
+
+
+def read_snapshot_info(cursor, schema='main'):
+    """Return a tuple of (table, obj_strings) from the snapshot in
+    *schema*.
+    """
+    try:
+        cursor.execute('SELECT table_name, obj_string FROM '
+                       '{0}.datatest_snapshot'.format(schema))
+    except sqlite3.DatabaseError:
+        raise ValueError('database is not a datatest snapshot')
+    rows = cursor.fetchall()
+    table = rows[0][0] if rows else None
+    obj_strings = [x[1] for x in rows if x[1] is not None]
+    return table, obj_strings
+
+
+def load_snapshot(cursor, path):
+    """Copy the table from the snapshot file at *path* into a new
+    temporary table (or into the main database when it is a named
+    file). Returns a tuple of (table, obj_strings).
+    """
+    cursor.execute('ATTACH DATABASE ? AS {0}'.format(_SNAPSHOT_SCHEMA),
+                   (path,))
+    try:
+        table, obj_strings = read_snapshot_info(cursor, _SNAPSHOT_SCHEMA)
+        if table:
+            with savepoint(cursor):
+                schema = 'temp' if uses_temp_database(cursor) else 'main'
+                copy_to_schema(cursor, table, _SNAPSHOT_SCHEMA, schema)
+    finally:
+        cursor.execute('DETACH DATABASE {0}'.format(_SNAPSHOT_SCHEMA))
+    return table, obj_strings
@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
+import re
 import sqlite3
+import threading
+from numbers import Integral
+from numbers import Real
 from .._compatibility.collections.abc import Iterable
 from .._compatibility.collections.abc import Mapping
 from .._compatibility.itertools import chain
 from .._compatibility.itertools import count
+from .._compatibility.itertools import islice
 
 
 try:
@@ -12,6 +17,18 @@ except NameError:
     string_types = str
 
 
+def uses_temp_database(cursor):
+    """Return True if the main database of the cursor's connection is
+    a temporary or in-memory database (rather than a named file).
+    Tables are created as temporary tables in these databases.
+    """
+    cursor.execute('PRAGMA database_list')
+    for _, name, filename in cursor.fetchall():
+        if name == 'main':
+            return not filename
+    return True
+
+
 def table_exists(cursor, table):
     cursor.execute('''
         SELECT name
@@ -28,12 +45,14 @@ def table_exists(cursor, table):
 
 
 _table_names = ('tbl{0}'.format(x) for x in count())
+_table_names_lock = threading.Lock()
 def new_table_name(cursor):
     global _table_names
 
-    new_name = next(_table_names)
-    while table_exists(cursor, new_name):
+    with _table_names_lock:
         new_name = next(_table_names)
+        while table_exists(cursor, new_name):
+            new_name = next(_table_names)
 
     return new_name
 
@@ -60,8 +79,146 @@ def normalize_default(value):
     return repr(value)
 
 
-def create_table(cursor, table, columns, default=''):
-    """Creates a temporary table using *table* and *columns* names."""
+def _column_def(column, default, type_=None):
+    if type_:
+        return '{0} {1} DEFAULT {2}'.format(column, type_, default)
+    return '{0} DEFAULT {1}'.format(column, default)
+
+
+_real_pattern = re.compile(r'^-?(\d+\.\d*|\.\d+|\d+(\.\d*)?[eE][-+]?\d+)$')
+_max_integer = 2 ** 63
+
+def _infer_value_type(value):
+    """Return the SQLite type name for a single value or None if the
+    value is missing (None or an empty string).
+    """
+    if value is None or value == '':
+        return None
+
+    if isinstance(value, Integral):
+        return 'INTEGER'
+
+    if isinstance(value, Real):
+        return 'REAL'
+
+    if isinstance(value, string_types):
+        try:  # Only canonical integers (no leading zeros or "+" signs).
+            if str(int(value)) == value and abs(int(value)) < _max_integer:
+                return 'INTEGER'
+        except ValueError:
+            pass
+        if _real_pattern.match(value):
+            return 'REAL'
+
+    return 'TEXT'
+
+
+def infer_types(columns, records):
+    """Return a list of SQLite type names (INTEGER, REAL, or TEXT)
+    for *columns* inferred from the values in *records*. Missing
+    values are ignored and columns that contain no values get an
+    empty string (no declared type).
+    """
+    found = [set() for _ in columns]
+    for record in records:
+        for found_types, value in zip(found, record):
+            value_type = _infer_value_type(value)
+            if value_type:
+                found_types.add(value_type)
+
+    types = []
+    for found_types in found:
+        if not found_types:
+            types.append('')
+        elif 'TEXT' in found_types:
+            types.append('TEXT')
+        elif 'REAL' in found_types:
+            types.append('REAL')
+        else:
+            types.append('INTEGER')
+    return types
+
+
+def _is_real_text(value):
+    return 1 if _real_pattern.match(value) else 0
+
+
+_function_names = ('ISREAL{0}'.format(x) for x in count())
+_function_names_lock = threading.Lock()
+def infer_column_types(cursor, table, columns):
+    """Return a list of SQLite type names for *columns* inferred from
+    every value in *table* (using the same rules as infer_types()).
+    The values must be stored as given--in columns without a declared
+    type.
+    """
+    with _function_names_lock:
+        is_real = next(_function_names)
+    cursor.connection.create_function(is_real, 1, _is_real_text)
+
+    # Values are classed as 0 (missing), 1 (INTEGER), 2 (REAL), or 3
+    # (TEXT). CASE tests each condition in order, so is_real() is only
+    # called for text that could be a number.
+    kind = (
+        "CASE WHEN {0} IS NULL OR {0} = '' THEN 0 "
+        "WHEN typeof({0}) = 'integer' THEN 1 "
+        "WHEN typeof({0}) = 'real' THEN 2 "
+        "WHEN typeof({0}) != 'text' THEN 3 "
+        "WHEN CAST(CAST({0} AS INTEGER) AS TEXT) = {0} "
+        "AND {0} != '-9223372036854775808' THEN 1 "
+        "WHEN {0} GLOB '*[^0-9.eE+-]*' THEN 3 "
+        "WHEN {0} GLOB '[0-9.-]*.*[0-9]*' AND NOT {0} GLOB '?*[^0-9.]*' "
+        "AND NOT {0} GLOB '*.*.*' THEN 2 "  # <- Decimals without exponents.
+        "WHEN {1}({0}) THEN 2 ELSE 3 END"
+    )
+    statement = 'SELECT {0} FROM {1} WHERE {0} {2} LIMIT 1'
+
+    def find(column_kind, condition):  # <- Stops at the first match.
+        cursor.execute(statement.format(column_kind, table, condition))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    types = []
+    for column in normalize_names(columns):
+        column_kind = kind.format(column, is_real)
+        found = find(column_kind, '>= 2')
+        if found is None:
+            types.append('INTEGER' if find(column_kind, '= 1') else '')
+        elif found == 3 or find(column_kind, '= 3'):
+            types.append('TEXT')
+        else:
+            types.append('REAL')
+    return types
+
+
+def convert_records(columns, records, converters):
+    """Return an iterator of *records* with the values of the given
+    columns converted by the functions in the *converters* mapping.
+    Missing values (None or an empty string) are not converted and
+    converters for columns not in *columns* are ignored.
+    """
+    funcs = [(i, converters[col]) for i, col in enumerate(columns)
+             if col in converters]
+    if not funcs:
+        return records
+
+    def convert(record):
+        record = list(record)
+        for index, func in funcs:
+            value = record[index]
+            if value is not None and value != '':
+                record[index] = func(value)
+        return record
+
+    return (convert(record) for record in records)
+
+
+def create_table(cursor, table, columns, default='', types=None):
+    """Creates a temporary table using *table* and *columns* names.
+    If given, *types* should be a sequence of declared column types
+    in the same order as *columns*. When the connection's main
+    database is a named file, a regular table is created in the
+    file instead.
+    """
     columns = normalize_names(columns)
     if columns.count('""') > 1:
         custom_message = ('duplicate column name: contains multiple '
@@ -74,10 +231,15 @@ def create_table(cursor, table, columns, default=''):
         # OperationalError and re-raising it with a modified message.
 
     default = normalize_default(default)
-    column_defs = ['{0} DEFAULT {1}'.format(x, default) for x in columns]
+    types = types or [None] * len(columns)
+    column_defs = [_column_def(x, default, t) for x, t in zip(columns, types)]
     column_defs = ', '.join(column_defs)
 
-    statement = 'CREATE TEMPORARY TABLE {0} ({1})'.format(table, column_defs)
+    if uses_temp_database(cursor):
+        statement = 'CREATE TEMPORARY TABLE {0} ({1})'
+    else:
+        statement = 'CREATE TABLE {0} ({1})'
+    statement = statement.format(table, column_defs)
     cursor.execute(statement)
 
 
@@ -90,7 +252,21 @@ def get_columns(cursor, table):
     return columns
 
 
-def insert_records(cursor, table, columns, records):
+def get_column_types(cursor, table):
+    """Returns list of declared column types used in table (columns
+    without a declared type are given as empty strings).
+    """
+    cursor.execute('PRAGMA table_info({0})'.format(table))
+    types = [x[2] for x in cursor]
+    if not types:
+        raise sqlite3.ProgrammingError('no such table: {0}'.format(table))
+    return types
+
+
+def insert_records(cursor, table, columns, records, chunk_size=None):
+    """Insert *records* into *table*. If *chunk_size* is given, the
+    records are inserted in chunks of *chunk_size* records each.
+    """
     table = normalize_names(table)
     columns = normalize_names(columns)
     sql = 'INSERT INTO {0} ({1}) VALUES ({2})'.format(
@@ -99,7 +275,14 @@ def insert_records(cursor, table, columns, records):
         ', '.join(['?'] * len(columns)),
     )
     try:
-        cursor.executemany(sql, records)
+        if chunk_size:
+            iterator = iter(records)
+            chunk = list(islice(iterator, chunk_size))
+            while chunk:
+                cursor.executemany(sql, chunk)
+                chunk = list(islice(iterator, chunk_size))
+        else:
+            cursor.executemany(sql, records)
     except sqlite3.ProgrammingError as error:
         if 'incorrect number of bindings' in str(error).lower():
             msg = (
@@ -113,27 +296,51 @@ def insert_records(cursor, table, columns, records):
         raise error
 
 
-def alter_table(cursor, table, columns, default=''):
+def alter_table(cursor, table, columns, default='', types=None):
     existing_columns = set(normalize_names(get_columns(cursor, table)))
     default = normalize_default(default)
+    columns = normalize_names(columns)
+    types = types or [None] * len(columns)
 
-    for column in normalize_names(columns):
+    for column, type_ in zip(columns, types):
         if column in existing_columns:
             continue
 
-        sql = 'ALTER TABLE {0} ADD COLUMN {1} DEFAULT {2}'
-        sql = sql.format(table, column, default)
+        sql = 'ALTER TABLE {0} ADD COLUMN {1}'
+        sql = sql.format(table, _column_def(column, default, type_))
 
         cursor.execute(sql)
         existing_columns.add(column)
 
 
+def copy_table(cursor, table, source_table, default=''):
+    """Insert all records from *source_table* into *table* (creating
+    or altering *table* as needed). The declared column types of
+    *source_table* are used for new columns. If *source_table* does
+    not exist, nothing is copied.
+    """
+    if not table_exists(cursor, source_table):
+        return  # <- EXIT!
+
+    columns = get_columns(cursor, source_table)
+    types = get_column_types(cursor, source_table)
+    if table_exists(cursor, table):
+        alter_table(cursor, table, columns, default=default, types=types)
+    else:
+        create_table(cursor, table, columns, default=default, types=types)
+
+    columns = ', '.join(normalize_names(columns))
+    sql = 'INSERT INTO {0} ({1}) SELECT {1} FROM {2}'
+    cursor.execute(sql.format(table, columns, source_table))
+
+
 def drop_table(cursor, table):
     table = normalize_names(table)
     cursor.execute('DROP TABLE IF EXISTS {0}'.format(table))
 
 
 _savepoint_names = ('svpnt{0}'.format(x) for x in count())
+_savepoint_names_lock = threading.Lock()
 class savepoint(object):
     """Sqlite SAVEPOINT context manager."""
     def __init__(self, cursor):
@@ -146,7 +353,8 @@ class savepoint(object):
                    'assigning "isolation_level=None".')
             raise ValueError(msg)
 
-        self.name = next(_savepoint_names)
+        with _savepoint_names_lock:
+            self.name = next(_savepoint_names)
         self.cursor = cursor
 
     def __enter__(self):
@@ -159,10 +367,80 @@ class savepoint(object):
             self.cursor.execute('ROLLBACK TO {0}'.format(self.name))
 
 
+class bulk_load(object):
+    """Context manager that tunes the database of *cursor*'s
+    connection (where create_table() puts new tables) for inserting
+    many records into *table*.
+
+    While active, the journal is kept in memory and a larger page
+    cache is used. Indexes on *table* are dropped and rebuilt once
+    loading is finished (rebuilding an index is faster than updating
+    it for every inserted record). The original settings are restored
+    on exit.
+    """
+    def __init__(self, cursor, table=None, cache_size=-262144):
+        if cursor.connection.isolation_level is not None:
+            msg = ('The cursor\'s connection must be running in '
+                   '"autocommit" mode to change the journal mode. Turn '
+                   'on autocommit by assigning "isolation_level=None".')
+            raise ValueError(msg)
+
+        self.cursor = cursor
+        self.table = table
+        self.cache_size = cache_size
+        self._restore = []
+        self._indexes = []
+        self._schema = 'temp' if uses_temp_database(cursor) else 'main'
+
+    def _pragma(self, name, value):
+        self.cursor.execute('PRAGMA {0}.{1}'.format(self._schema, name))
+        self._restore.append((name, self.cursor.fetchone()[0]))
+        self._set_pragma(name, value)
+
+    def _set_pragma(self, name, value):
+        self.cursor.execute('PRAGMA {0}.{1}={2}'.format(self._schema, name, value))
+        self.cursor.fetchall()  # <- Some PRAGMAs return the new value.
+
+    def __enter__(self):
+        self._pragma('journal_mode', 'MEMORY')
+        self._pragma('cache_size', self.cache_size)
+
+        if self.table:
+            master = 'sqlite_temp_master' if self._schema == 'temp' else 'sqlite_master'
+            self.cursor.execute(
+                "SELECT name, sql FROM {0} "
+                "WHERE type='index' AND tbl_name=? AND sql IS NOT NULL".format(master),
+                (self.table,),
+            )
+            self._indexes = self.cursor.fetchall()
+            for name, _ in self._indexes:
+                self.cursor.execute('DROP INDEX {0}.{1}'.format(self._schema, name))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for _, sql in self._indexes:
+            self.cursor.execute(sql)
+        for name, value in reversed(self._restore):
+            self._set_pragma(name, value)
+
+
+# Keyword arguments accepted by load_data() in addition to *default*
+# (used to separate them from reader arguments).
+_load_options = ('infer_types', 'converters', 'chunk_size')
+
+
 def load_data(cursor, table, *args, **kwds):
     """
-    load_data(cursor, table, columns, records, default='')
-    load_data(cursor, table, records, default='')
+    load_data(cursor, table, columns, records, default='', infer_types=False, converters=None, chunk_size=None)
+    load_data(cursor, table, records, default='', infer_types=False, converters=None, chunk_size=None)
+
+    When *infer_types* is True, INTEGER, REAL, or TEXT column types
+    are declared so that numeric values are stored natively by SQLite.
+    The types are inferred from every value--the records are staged
+    in an untyped table first and then copied into *table*. The *converters* argument can be a
+    mapping of column names to functions used to convert values
+    before they are inserted. When *chunk_size* is given, records
+    are inserted in chunks of that size.
     """
     try:
         records, = args
@@ -171,6 +449,9 @@ def load_data(cursor, table, *args, **kwds):
         columns, records = args
 
     default = kwds.pop('default', '')
+    infer = kwds.pop('infer_types', False)
+    converters = kwds.pop('converters', None)
+    chunk_size = kwds.pop('chunk_size', None)
     if kwds:
         msg = 'load_data() got unexpected keyword argument {0!r}'
         raise TypeError(msg.format(next(iter(kwds.keys()))))
@@ -201,9 +482,28 @@ def load_data(cursor, table, *args, **kwds):
     if isinstance(first_record, Mapping):
         records = ([rec.get(c, '') for c in columns] for rec in records)
 
+    if converters:
+        records = convert_records(columns, records, converters)
+
     with savepoint(cursor):
+        types = None
+        if infer:
+            staging_table = new_table_name(cursor)
+            create_table(cursor, staging_table, columns)
+            insert_records(cursor, staging_table, columns, records, chunk_size)
+            types = infer_column_types(cursor, staging_table, columns)
+
         if table_exists(cursor, table):
-            alter_table(cursor, table, columns, default=default)
+            alter_table(cursor, table, columns, default=default, types=types)
+        else:
+            create_table(cursor, table, columns, default=default, types=types)
+
+        if infer:
+            cursor.execute('INSERT INTO {0} ({1}) SELECT {1} FROM {2}'.format(
+                normalize_names(table),
+                ', '.join(normalize_names(columns)),
+                staging_table,
+            ))
+            drop_table(cursor, staging_table)
         else:
-            create_table(cursor, table, columns, default=default)
-        insert_records(cursor, table, columns, records)
+            insert_records(cursor, table, columns, records, chunk_size)
@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""Selector that answers queries from NumPy arrays."""
+from __future__ import absolute_import
+from __future__ import division
+import math
+import sqlite3
+import threading
+
+from .._compatibility.builtins import *
+from .._compatibility.collections.abc import Mapping
+from .._compatibility.collections.abc import Set
+from .._predicate import Predicate
+from .query import DictItems
+from .query import Result
+from .query import Selector
+from .query import _equality_types
+from .query import _get_match_function
+from .query import _max_integer
+from .query import _parse_columns
+from .query import _source_column
+from .query import _sqlite_sortkey
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+_max_exact_float = 2 ** 53  # Integers up to this size are exact as floats.
+_max_dense_groups = 2 ** 22  # Largest number of possible code combinations
+                             # counted with bincount() rather than sorting.
+
+
+def _get_affinity(declared_type):
+    """Return the affinity SQLite applies to a value that is compared
+    with a column of *declared_type*: 'NUMERIC' for INTEGER, REAL, and
+    NUMERIC columns, 'TEXT' for TEXT columns, or None if no conversion
+    is made.
+    """
+    declared_type = (declared_type or '').upper()
+    if 'INT' in declared_type:
+        return 'NUMERIC'
+    if any(x in declared_type for x in ('CHAR', 'CLOB', 'TEXT')):
+        return 'TEXT'
+    if 'BLOB' in declared_type or not declared_type:
+        return None
+    return 'NUMERIC'  # <- REAL and NUMERIC.
+
+
+_affinity_connection = None  # In-memory database used by _apply_affinity().
+_affinity_lock = threading.Lock()
+
+def _apply_affinity(values, affinity):
+    """Return a list of *values* converted by SQLite using the given
+    column *affinity* ('NUMERIC' or 'TEXT'). The values are stored in
+    a column with that affinity and read back, so the conversion is
+    exactly the one SQLite makes.
+    """
+    global _affinity_connection
+
+    with _affinity_lock:
+        if _affinity_connection is None:
+            _affinity_connection = sqlite3.connect(':memory:', check_same_thread=False)
+            _affinity_connection.execute('CREATE TABLE affinity (NUMERIC NUMERIC, TEXT TEXT)')
+        cursor = _affinity_connection.cursor()
+        cursor.executemany('INSERT INTO affinity ({0}) VALUES (?)'.format(affinity),
+                           [(x,) for x in values])
+        cursor.execute('SELECT {0} FROM affinity ORDER BY rowid'.format(affinity))
+        converted = [row[0] for row in cursor]
+        _affinity_connection.rollback()  # <- Leave the table empty.
+    return converted
+
+
+class _ArrayColumn(object):
+    """A column of values stored as an array of integer *codes* that
+    index into a list of *uniques*. The uniques are sorted in SQLite's
+    order so comparing codes is the same as comparing values. When
+    every value is an integer (that fits in 64 bits) or every value is
+    a float, the values are also stored in a *numbers* array.
+    """
+    def __init__(self, values, affinity=None):
+        self.affinity = affinity
+        code_map = {}  # Keyed by (type, value) so 1 and 1.0 differ.
+        uniques = []
+        codes = []
+        for value in values:
+            map_key = (value.__class__, value)
+            code = code_map.get(map_key)
+            if code is None:
+                code = code_map[map_key] = len(uniques)
+                uniques.append(value)
+            codes.append(code)
+
+        order = sorted(range(len(uniques)), key=lambda i: _sqlite_sortkey(uniques[i]))
+        rank = numpy.empty(len(uniques), dtype=numpy.intp)
+        rank[order] = numpy.arange(len(uniques))
+        self.codes = rank[numpy.array(codes, dtype=numpy.intp)]
+        self.uniques = numpy.empty(len(uniques), dtype=object)
+        self.uniques[:] = [uniques[i] for i in order]
+        self.null_code = 0 if (uniques and self.uniques[0] is None) else -1
+
+        unique_types = set(x.__class__ for x in uniques)
+        if unique_types == set([int]) \
+                and all(-_max_integer <= x <= _max_integer for x in uniques):
+            self.numbers = numpy.array(values, dtype=numpy.int64)
+        elif unique_types == set([float]):
+            self.numbers = numpy.array(values, dtype=numpy.float64)
+        else:
+            self.numbers = None
+
+    def take(self, index):
+        """Return a list of values at positions in *index*."""
+        if self.numbers is not None:
+            return self.numbers[index].tolist()
+        return self.uniques[self.codes[index]].tolist()
+
+
+def _group_rows(code_arrays, sizes):
+    """Return a tuple of (first_index, group_ids) for rows of the
+    given *code_arrays* (whose codes are less than the corresponding
+    *sizes*). Groups are numbered in sorted order and *first_index*
+    holds the position of the first row in each group.
+    """
+    combination_count = 1
+    for size in sizes:
+        combination_count *= max(size, 1)
+
+    if combination_count > _max_dense_groups:
+        stacked = numpy.column_stack(code_arrays)
+        _, first_index, group_ids = numpy.unique(
+            stacked, axis=0, return_index=True, return_inverse=True)
+        return first_index, group_ids.ravel()  # <- EXIT!
+
+    combined = numpy.zeros(len(code_arrays[0]), dtype=numpy.intp)
+    for codes, size in zip(code_arrays, sizes):
+        combined = combined * size + codes
+    present = numpy.bincount(combined, minlength=combination_count) > 0
+    group_ids = (numpy.cumsum(present) - 1)[combined]
+
+    # With repeated indexes, the last assignment wins, so assigning in
+    # reverse leaves the first position of each group.
+    first_index = numpy.empty(int(present.sum()), dtype=numpy.intp)
+    positions = numpy.arange(len(combined))
+    first_index[group_ids[::-1]] = positions[::-1]
+    return first_index, group_ids
+
+
+class ArraySelector(Selector):
+    """A Selector that keeps each column in NumPy arrays and answers
+    queries with vectorized filtering, grouping, and aggregation. It
+    accepts the same arguments as :class:`Selector` and works with
+    the same :class:`Query` methods::
+
+        select = datatest.ArraySelector('myfile.csv', infer_types=True)
+
+    Text and other values are stored as categorical codes, so
+    where-clause predicates are evaluated once per distinct value
+    rather than once per row. This works best for numeric or
+    low-cardinality data. Sums and averages of columns that are not
+    entirely integer or entirely float are computed by SQLite.
+
+    .. note::
+
+        This class requires the optional, third-party library
+        NumPy.
+    """
+    def __init__(self, objs=None, *args, **kwds):
+        """Initialize self."""
+        if numpy is None:
+            raise ImportError(
+                "No module named 'numpy'\n"
+                "\n"
+                "ArraySelector is an optional class that requires the "
+                "third-party library 'numpy'."
+            )
+        self._arrays = None
+        super(ArraySelector, self).__init__(objs, *args, **kwds)
+
+    def load_data(self, objs, *args, **kwds):
+        try:
+            super(ArraySelector, self).load_data(objs, *args, **kwds)
+        finally:
+            self._arrays = None  # <- Rebuilt on next query.
+    load_data.__doc__ = Selector.load_data.__doc__
+
+    def drop_source(self, source):
+        try:
+            super(ArraySelector, self).drop_source(source)
+        finally:
+            self._arrays = None  # <- Rebuilt on next query.
+    drop_source.__doc__ = Selector.drop_source.__doc__
+
+    def refresh(self):
+        try:
+            return super(ArraySelector, self).refresh()
+        finally:
+            self._arrays = None  # <- Rebuilt on next query.
+    refresh.__doc__ = Selector.refresh.__doc__
+
+    def _get_arrays(self):
+        """Return a dictionary of _ArrayColumn objects (built from the
+        loaded table as needed).
+        """
+        if self._arrays is None:
+            arrays = {}
+            cursor = self._connection.cursor()
+            names = self.fieldnames
+            if self._partitioned:
+                names.append(_source_column)
+            cursor.execute('PRAGMA table_info({0})'.format(self._table))
+            declared_types = dict((x[1], x[2]) for x in cursor)
+            for name in names:
+                cursor.execute('SELECT {0} FROM {1}'.format(
+                    self._escape_field_name(name), self._table))
+                affinity = _get_affinity(declared_types.get(name))
+                arrays[name] = _ArrayColumn([row[0] for row in cursor], affinity)
+            self._arrays = arrays
+        return self._arrays
+
+    @staticmethod
+    def _convert_predicate(predicate, affinity):
+        """Return *predicate* with its comparison values converted by
+        the column *affinity*--the conversion SQLite makes when a
+        Selector compares a column using "=" or "IN".
+        """
+        if isinstance(predicate, Predicate):
+            if predicate._inverted and type(predicate.obj) in _equality_types:
+                return ~Predicate(_apply_affinity([predicate.obj], affinity)[0])
+        elif isinstance(predicate, Set):
+            return set(_apply_affinity(list(predicate), affinity))
+        elif type(predicate) in _equality_types:
+            return _apply_affinity([predicate], affinity)[0]
+        return predicate
+
+    def _row_index(self, arrays, where):
+        """Return array of row positions that match *where*."""
+        row_count = len(arrays[next(iter(arrays))].codes) if arrays else 0
+        mask = numpy.ones(row_count, dtype=bool)
+        for key, predicate in where.items():
+            self._assert_fields_exist([key])
+            column = arrays[key]
+            if column.affinity:
+                predicate = self._convert_predicate(predicate, column.affinity)
+            match = _get_match_function(predicate)
+            lookup = numpy.fromiter(
+                (bool(match(x)) for x in column.uniques),
+                dtype=bool,
+                count=len(column.uniques),
+            )
+            mask &= lookup[column.codes]
+        return numpy.flatnonzero(mask)
+
+    def _select_rows(self, columns, where, distinct):
+        key, value = _parse_columns(columns)
+        key_columns, value_columns = self._parse_key_value_names(key, value)
+        arrays = self._get_arrays()
+        index = self._row_index(arrays, where)
+        all_columns = [arrays[x] for x in key_columns + value_columns]
+
+        if distinct and len(index):
+            first_index, _ = _group_rows(
+                [x.codes[index] for x in all_columns],
+                [len(x.uniques) for x in all_columns],
+            )
+            index = index[numpy.sort(first_index)]
+
+        if key and len(index):
+            key_codes = [arrays[x].codes[index] for x in reversed(key_columns)]
+            index = index[numpy.lexsort(key_codes)]  # <- Stable sort.
+
+        rows = zip(*[x.take(index) for x in all_columns])
+        return self._format_results(columns, iter(rows))
+
+    def _select(self, columns, **where):
+        key, value = _parse_columns(columns)
+        return self._select_rows(columns, where, isinstance(value, Set))
+
+    def _select_distinct(self, columns, **where):
+        return self._select_rows(columns, where, True)
+
+    def _get_sql_query(self, method_name, args, kwds):
+        return None  # <- Queries are answered from arrays, not SQL.
+
+    def _select_aggregate(self, sqlfunc, columns, **where):
+        sqlfunc = sqlfunc.upper()
+        key, value = _parse_columns(columns)
+        key_columns, value_columns = self._parse_key_value_names(key, value)
+        arrays = self._get_arrays()
+
+        if sqlfunc in ('SUM', 'AVG'):
+            for name in value_columns:
+                if arrays[name].numbers is None:
+                    parent = super(ArraySelector, self)
+                    return parent._select_aggregate(sqlfunc, columns, **where)
+
+        index = self._row_index(arrays, where)
+        if key:
+            if len(index):
+                first_index, group_ids = _group_rows(
+                    [arrays[x].codes[index] for x in key_columns],
+                    [len(arrays[x].uniques) for x in key_columns],
+                )
+                group_count = len(first_index)
+            else:
+                first_index = group_ids = numpy.array([], dtype=numpy.intp)
+                group_count = 0
+        else:
+            group_ids = numpy.zeros(len(index), dtype=numpy.intp)
+            group_count = 1
+
+        distinct = isinstance(value, Set)
+        aggregated = []
+        for name in value_columns:
+            column = arrays[name]
+            aggregated.append(self._aggregate(
+                sqlfunc, column, index, group_ids, group_count, distinct))
+
+        key_values = [arrays[x].take(index[first_index]) for x in key_columns]
+        rows = zip(*(key_values + aggregated))
+        results = self._format_results(columns, iter(rows))
+
+        if isinstance(columns, Mapping):
+            results = DictItems((k, next(v)) for k, v in results)
+            return Result(results, evaluation_type=dict)
+        return next(results)
+
+    @staticmethod
+    def _aggregate(sqlfunc, column, index, group_ids, group_count, distinct):
+        """Return a list of aggregate values (one for each group)."""
+        codes = column.codes[index]
+        not_null = codes != column.null_code
+        codes = codes[not_null]
+        group_ids = group_ids[not_null]
+        positions = index[not_null]
+
+        if distinct and len(codes):
+            first, _ = _group_rows([group_ids, codes],
+                                   [group_count, len(column.uniques)])
+            group_ids = group_ids[first]
+            codes = codes[first]
+            positions = positions[first]
+
+        counts = numpy.bincount(group_ids, minlength=group_count)
+        if sqlfunc == 'COUNT':
+            return counts.tolist()
+
+        if sqlfunc in ('MIN', 'MAX'):
+            if sqlfunc == 'MIN':
+                found = numpy.full(group_count, len(column.uniques), dtype=numpy.intp)
+                numpy.minimum.at(found, group_ids, codes)
+            else:
+                found = numpy.full(group_count, -1, dtype=numpy.intp)
+                numpy.maximum.at(found, group_ids, codes)
+            return [column.uniques[x] if n else None for x, n in zip(found, counts)]
+
+        # SUM and AVG (only called for columns with a numbers array).
+        numbers = column.numbers[positions]
+        bound = 0
+        if numbers.dtype == numpy.int64 and len(numbers):
+            bound = int(numpy.abs(numbers).max()) * len(numbers)
+
+        if 0 < bound <= _max_exact_float:
+            totals = numpy.bincount(group_ids, numbers, group_count)
+            totals = totals.astype(numpy.int64).tolist()  # <- Exact.
+        elif 0 < bound <= _max_integer:
+            totals = numpy.zeros(group_count, dtype=numpy.int64)
+            numpy.add.at(totals, group_ids, numbers)  # <- Cannot overflow.
+            totals = totals.tolist()
+        else:
+            totals = []
+            order = numpy.argsort(group_ids, kind='stable')
+            bounds = numpy.searchsorted(group_ids[order], numpy.arange(group_count + 1))
+            numbers = numbers[order].tolist()
+            for start, stop in zip(bounds[:-1], bounds[1:]):
+                if numbers and isinstance(numbers[0], float):
+                    totals.append(math.fsum(numbers[start:stop]))
+                else:
+                    totals.append(sum(numbers[start:stop]))
+            if any(abs(x) > _max_integer for x in totals if isinstance(x, int)):
+                raise OverflowError('integer overflow')
+
+        results = []
+        for total, count in zip(totals, counts):
+            if not count:
+                results.append(None)
+            elif sqlfunc == 'AVG':
+                results.append(total / count)
+            else:
+                results.append(total)
+        return results
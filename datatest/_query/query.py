@@ -2,13 +2,20 @@
 from __future__ import absolute_import
 import csv
 import inspect
+import os
+import random
+import re
 try:
     import sqlite3
 except ImportError:
     sqlite3 = None  # Missing from Jython and Micropython.
 import sys
+import threading
+import timeit
+import weakref
 from glob import glob
 from numbers import Number
+from operator import itemgetter
 
 from .._compatibility.builtins import *
 from .._compatibility import abc
@@ -34,13 +41,37 @@ from .._utils import _make_token
 from .._utils import _unique_everseen
 from .._utils import file_types
 from .._utils import string_types
+from .._utils import regex_types
+from .._load.cache import get_cache_file
+from .._load.cache import get_fingerprint
+from .._load.cache import read_cache
+from .._load.cache import write_cache
 from .._load.get_reader import get_reader
+from .._load.join import copy_across
+from .._load.join import join_tables
+from .._load.join import stage_table
+from .._load.join import unstage_table
 from .._load.load_csv import load_csv
+from .._load.load_csv import read_csv_header
+from .._load.parallel import parse_csv_files
+from .._load.parallel import read_parsed
+from .._load.snapshot import load_snapshot
+from .._load.snapshot import read_snapshot_info
+from .._load.snapshot import write_snapshot
+from .._load.temptable import _load_options
+from .._load.temptable import alter_table
+from .._load.temptable import bulk_load
+from .._load.temptable import copy_table
+from .._load.temptable import create_table
 from .._load.temptable import drop_table
+from .._load.temptable import get_column_types
+from .._load.temptable import get_columns
 from .._load.temptable import load_data
 from .._load.temptable import new_table_name
+from .._load.temptable import normalize_names
 from .._load.temptable import savepoint
 from .._load.temptable import table_exists
+from .._predicate import Predicate
 from .._predicate import MatcherObject
 from .._predicate import MatcherTuple
 from .._predicate import get_matcher
@@ -51,15 +82,210 @@ except NameError:
     # If not available, use as an alias for OSError.
     FileNotFoundError = OSError
 
-# For the following database connection, the synchronous flag is
-# set to "OFF" for faster insertions and commits. Since the database
-# is temporary, long-term integrity should not be a concern--in the
-# unlikely event of data corruption, it should be entirely acceptable
-# to simply rebuild the temporary tables.
-DEFAULT_CONNECTION = sqlite3.connect('')  # <- Using '' makes a temp file.
-DEFAULT_CONNECTION.execute('PRAGMA synchronous=OFF')
-DEFAULT_CONNECTION.isolation_level = None  # <- Run in 'autocommit' mode.
+try:
+    TimeoutError  # New in Python 3.3.
+except NameError:
+    # If not available, use as an alias for OSError.
+    TimeoutError = OSError
+
+def _connect(database=''):
+    """Return a new SQLite connection for use with a Selector.
+
+    The synchronous flag is set to "OFF" for faster insertions and
+    commits. Since the database is temporary, long-term integrity
+    should not be a concern--in the unlikely event of data corruption,
+    it should be entirely acceptable to simply rebuild the temporary
+    tables. The connection is not bound to the thread that created
+    it, but it must not be used by two threads at once--Selectors
+    wrap it in a _LockedConnection.
+    """
+    connection = sqlite3.connect(database, check_same_thread=False)
+    connection.execute('PRAGMA synchronous=OFF')
+    connection.isolation_level = None  # <- Run in 'autocommit' mode.
+    return connection
+
+
+class _LockedConnection(object):
+    """Wrapper for an SQLite *connection* that is shared by threads.
+    Every call to the connection, or to one of its cursors, is made
+    while holding the wrapper's lock. Without it, threads can
+    deadlock: one thread registering a function holds the GIL while
+    waiting for the connection, another thread's running statement
+    holds the connection while its function waits for the GIL.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        self.lock = threading.RLock()
+
+    def cursor(self):
+        with self.lock:
+            return _LockedCursor(self.connection.cursor(), self)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def __getattr__(self, name):
+        attr = getattr(self.connection, name)
+        if not callable(attr):
+            return attr  # <- EXIT!
+
+        def locked_call(*args, **kwds):
+            with self.lock:
+                return attr(*args, **kwds)
+        return locked_call
+
+
+class _LockedCursor(object):
+    """Cursor of a _LockedConnection."""
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._lock = connection.lock
+        self.connection = connection
+
+    @property
+    def arraysize(self):
+        return self._cursor.arraysize
+
+    @arraysize.setter
+    def arraysize(self, value):
+        self._cursor.arraysize = value
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, *args):
+        with self._lock:
+            self._cursor.execute(*args)
+        return self
+
+    def executemany(self, *args):
+        with self._lock:
+            self._cursor.executemany(*args)
+        return self
+
+    def fetchone(self):
+        with self._lock:
+            return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        if size is None:
+            size = self._cursor.arraysize
+        with self._lock:
+            return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        with self._lock:
+            return self._cursor.fetchall()
+
+    def close(self):
+        with self._lock:
+            self._cursor.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._lock:
+            row = self._cursor.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    next = __next__  # For Python 2.x compatibility.
+
+
+_mmap_size = 1073741824  # Bytes to memory-map when storage is a file path.
+
+
+def _connect_storage(storage):
+    """Return a new connection using the given *storage* backing:
+    'memory', 'tempfile', or the path of a database file.
+    """
+    if storage == 'memory':
+        connection = _connect(':memory:')
+        connection.execute('PRAGMA temp_store=MEMORY')
+    elif storage == 'tempfile':
+        connection = _connect('')  # <- Using '' makes a temp file.
+    elif isinstance(storage, string_types) and storage:
+        connection = _connect(storage)
+        connection.execute('PRAGMA mmap_size={0}'.format(_mmap_size))
+    else:
+        msg = "storage must be 'memory', 'tempfile', or a file path, got {0!r}"
+        raise ValueError(msg.format(storage))
+    return connection
+
+
+def _connect_snapshot(path):
+    """Return a new read-only connection to the snapshot file at
+    *path* (see Selector.snapshot()).
+    """
+    connection = _connect(path)
+    connection.execute('PRAGMA query_only=ON')
+    connection.execute('PRAGMA mmap_size={0}'.format(_mmap_size))
+    return connection
+
+
+def _copy_tables(source, target):
+    """Copy the tables (and their indexes) from the *source* connection
+    into the *target* connection. Each table is rebuilt in the schema
+    it came from--temporary tables stay temporary--so tables created
+    later with create_table() are kept alongside them.
+    """
+    source_cursor = source.cursor()
+    target_cursor = target.cursor()
+    for schema, master in [('main', 'sqlite_master'), ('temp', 'sqlite_temp_master')]:
+        source_cursor.execute(
+            "SELECT type, name, sql FROM {0} "
+            "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite%' "
+            "ORDER BY type='index'".format(master)
+        )
+        for type_, name, sql in source_cursor.fetchall():
+            if type_ == 'table' and schema == 'temp':
+                sql = re.sub(r'^CREATE\s+TABLE', 'CREATE TEMPORARY TABLE', sql)
+            target_cursor.execute(sql)
+            if type_ == 'table':
+                rows = source.execute('SELECT * FROM {0}.{1}'.format(schema, name))
+                qmarks = ', '.join('?' * len(rows.description))
+                statement = 'INSERT INTO {0}.{1} VALUES ({2})'.format(schema, name, qmarks)
+                target_cursor.executemany(statement, rows)
+
+
+# Connections inherited from a parent process. They are kept open
+# (and never used) in the child because closing them can release
+# locks or remove journal files that still belong to the parent.
+_inherited_connections = []
+
+
+# The DEFAULT_CONNECTION is used by the backward compatibility APIs
+# in the __past__ sub-package. Selector objects open a connection of
+# their own.
+DEFAULT_CONNECTION = _connect('')  # <- Using '' makes a temp file.
 _user_function_name_gen = ('FUNC{0}'.format(x) for x in itertools.count())
+_user_function_name_lock = threading.Lock()
+_default_arraysize = 1024  # Rows per fetchmany() call when formatting results.
+_progress_interval = 1000  # SQLite VM steps between progress handler calls.
+_sample_chunk_size = 500  # Rowids per IN-list when fetching sampled rows.
+_source_column = '_source'  # Hidden column used by partitioned Selectors.
+_storage_table = 'datatest_selector'  # Table name used in storage files.
+_storage_owners = weakref.WeakValueDictionary()  # Selectors by (path, table).
+_storage_owners_lock = threading.Lock()
+_statement_cache_size = 256  # Generated SQL clauses kept per Selector.
+_equality_types = tuple(set(string_types + (int, float)))  # Compared with "=?".
+_index_use_threshold = 5  # Uses before a column set is advised for indexing.
+_index_cost_threshold = 0.5  # Seconds spent before a column set is advised.
+_max_integer = 2 ** 63 - 1  # Largest value of an SQLite INTEGER.
 
 
 PY2 = sys.version_info[0] == 2
@@ -598,6 +824,16 @@ _execution_step = namedtuple(
     field_names=('function', 'args', 'kwds')
 )
 
+_index_advice = namedtuple(
+    typename='index_advice',
+    field_names=('columns', 'uses', 'seconds', 'status', 'seconds_saved')
+)
+
+_query_cache_info = namedtuple(
+    typename='query_cache_info',
+    field_names=('hits', 'misses', 'maxsize', 'currsize')
+)
+
 RESULT_TOKEN = _make_token(
     'RESULT',
     'Token for representing a data result when optimizing execution plan.',
@@ -915,14 +1151,24 @@ class Query(object):
 
         return result
 
-    def fetch(self):
-        """Executes query and returns an eagerly evaluated result."""
+    def fetch(self, lazy=False):
+        """Executes query and returns an eagerly evaluated result.
+
+        When *lazy* is True, a query that selects a :py:class:`dict`
+        from a Selector returns a read-only :class:`LazyMapping`
+        instead. Its groups are not loaded until they are looked up::
+
+            values = select({'id': 'value'}).sum().fetch(lazy=True)
+            assert values['A123'] == 42  # <- Queries only 'A123'.
+        """
+        if lazy:
+            return LazyMapping(self)  # <- EXIT!
         result = self.execute()
         if isinstance(result, Result):
             return result.fetch()
         return result
 
-    def _explain(self, optimize=True, file=sys.stdout):
+    def _explain(self, optimize=True, file=sys.stdout, sql=False, analyze=False):
         """A convenience method primarily intended to help when
         debugging and developing execution plan optimizations.
 
@@ -930,6 +1176,12 @@ class Query(object):
         to stdout). If *optimize* is True, an optimized plan will
         be printed if one can be constructed.
 
+        If *sql* is True, the SQL statement for the plan's select
+        step is also printed along with SQLite's EXPLAIN QUERY PLAN
+        output (showing table scans, index use, and temporary
+        B-trees). If *analyze* is True, ANALYZE is run on the
+        Selector's table before the plan is made (implies *sql*).
+
         If *file* is set to None, returns execution plan as a string.
         """
         source = self.source
@@ -956,12 +1208,40 @@ class Query(object):
         formatted = 'Data Source:\n  {0}\nExecution Plan{1}:\n{2}'
         formatted = formatted.format(source_repr, optimized_text, steps)
 
+        if sql or analyze:
+            formatted = '{0}\n{1}'.format(
+                formatted, self._explain_sql(source, execution_plan, analyze))
+
         if file:
             file.write(formatted)
             file.write('\n')
         else:
             return formatted
 
+    @staticmethod
+    def _explain_sql(source, execution_plan, analyze):
+        """Return the SQL text for the _explain() method."""
+        query = None
+        if isinstance(source, Selector) and len(execution_plan) > 1:
+            select_step, call_step = execution_plan[0], execution_plan[1]
+        else:
+            select_step = call_step = (None,)  # <- Plan has no select step.
+        if select_step[0] is getattr and call_step[0] == RESULT_TOKEN:
+            method_name = select_step[1][1]
+            _, args, kwds = call_step
+            query = source._get_sql_query(method_name, args, kwds)
+        if query is None:
+            return 'SQL Query:\n  <not available>'  # <- EXIT!
+
+        stmnt, params = query
+        plan = source._get_query_plan(stmnt, params, analyze)
+        stmnt = '\n'.join('  {0}'.format(x) for x in stmnt.split('\n'))
+        plan = '\n'.join('  {0}'.format(x) for x in plan)
+
+        analyzed_text = ' (analyzed)' if analyze else ''
+        formatted = 'SQL Query:\n{0}\n  params: {1!r}\nSQL Query Plan{2}:\n{3}'
+        return formatted.format(stmnt, params, analyzed_text, plan)
+
     def __repr__(self):
         class_repr = self.__class__.__name__
 
@@ -1050,6 +1330,644 @@ with contextlib.suppress(AttributeError):  # inspect.Signature() is new in 3.3
     ])
 
 
+def _is_none(value):
+    return value is None
+
+
+class LazyMapping(Mapping):
+    """A read-only mapping over a :class:`Query` that selects a
+    :py:class:`dict` from a Selector. Nothing is fetched when it is
+    created--each lookup runs the query for a single key (using an
+    index on the key columns) and returns the same value that the
+    fully evaluated dictionary would contain::
+
+        mapping = select({'id': 'value'}).fetch(lazy=True)
+        mapping['A123']    # <- Fetches the 'A123' group.
+        'A123' in mapping  # <- Checks for matching rows.
+        len(mapping)       # <- Counts distinct keys.
+
+    Iterating over the mapping streams its keys from the database.
+    Looking up every item runs one query per key, so use
+    :meth:`Query.fetch` when all of the data is needed.
+    """
+    _key_types = string_types + (int, float, bytes)  # Values stored by SQLite.
+
+    def __init__(self, query):
+        if not isinstance(query.source, Selector):
+            raise TypeError('lazy results require a query with a Selector source')
+        columns = query.args[0]
+        if not isinstance(columns, Mapping):
+            msg = 'lazy results require a query that selects a dict, got {0!r}'
+            raise TypeError(msg.format(columns))
+        if any(step[0] == 'flatten' for step in query._query_steps):
+            raise TypeError('lazy results do not support flatten()')
+
+        key, _ = _parse_columns(columns)
+        self._query = query.__copy__()
+        self._key = key
+        self._key_columns = (key,) if isinstance(key, string_types) else tuple(key)
+        try:
+            query.source.create_index(*self._key_columns)
+        except (TypeError, sqlite3.Error):
+            pass  # <- No table yet, a read-only snapshot, or no index support.
+
+    def _key_query(self, key):
+        """Return a copy of the query limited to the rows of *key*
+        or None if *key* can not match any rows.
+        """
+        if len(self._key_columns) == 1:
+            values = (key,)
+        elif isinstance(key, tuple) and len(key) == len(self._key_columns):
+            values = key
+        else:
+            return None  # <- EXIT!
+
+        where = dict(self._query.kwds)
+        for column, value in zip(self._key_columns, values):
+            if column in where and not _get_match_function(where[column])(value):
+                return None  # <- EXIT!
+            if value is None:
+                where[column] = _is_none  # <- "=?" never matches NULL.
+            elif isinstance(value, bool):
+                where[column] = int(value)  # <- Equal to 1 or 0 (as in a dict).
+            elif isinstance(value, self._key_types):
+                where[column] = value
+            else:
+                return None  # <- EXIT!
+
+        query = self._query.__copy__()
+        query.kwds = where
+        return query
+
+    def _group_query(self, where):
+        """Return a query of {key: count} pairs for *where*."""
+        columns = {self._key: self._key_columns[0]}
+        return Query(self._query.source, columns, **where).count()
+
+    def __getitem__(self, key):
+        hash(key)  # <- Unhashable keys raise TypeError (like a dict).
+        query = self._key_query(key)
+        if query is not None:
+            for value in query.fetch().values():
+                return value
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        try:
+            hash(key)
+        except TypeError:
+            return False
+        query = self._key_query(key)
+        if query is None:
+            return False
+        return bool(self._group_query(query.kwds).fetch())
+
+    def __iter__(self):
+        for key, _ in self._group_query(self._query.kwds).execute():
+            yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return '<{0} {1!r}>'.format(self.__class__.__name__, self._query)
+
+
+def _get_match_function(predicate):
+    """Return a function that checks values the same way as the
+    where-clause built by Selector._build_where_clause().
+    """
+    if isinstance(predicate, Set):
+        return lambda x: x is not None and x in predicate
+    if callable(predicate) and not isinstance(predicate, type):
+        return predicate
+    matcher = get_matcher(predicate)
+    if isinstance(matcher, (MatcherObject, MatcherTuple)):
+        return lambda x: matcher == x
+    return lambda x: x is not None and x == predicate  # SQL "=" semantics.
+
+
+def _is_indexable(predicate):
+    """Return True if a where-clause *predicate* is translated into an
+    SQL expression that can use an index (rather than a user-defined
+    function).
+    """
+    if isinstance(predicate, Set):
+        return True
+    if callable(predicate) and not isinstance(predicate, type):
+        return False
+    return not isinstance(get_matcher(predicate), (MatcherObject, MatcherTuple))
+
+
+def _freeze_columns(columns):
+    """Return a hashable value that describes *columns* (including
+    the types of any containers) for use as a cache key.
+    """
+    if isinstance(columns, string_types):
+        return columns
+    if isinstance(columns, Mapping):
+        items = tuple((_freeze_columns(k), _freeze_columns(v))
+                      for k, v in columns.items())
+        return (type(columns), items)
+    if isinstance(columns, Iterable):
+        return (type(columns), tuple(_freeze_columns(x) for x in columns))
+    return columns
+
+
+def _where_shape(where):
+    """Return a hashable description of the SQL expressions used for
+    the *where* keywords or None if the expressions depend on the
+    predicate values (e.g., functions or regular expressions). Only
+    equality and set-membership predicates have a shape.
+    """
+    shape = []
+    for key, val in sorted(where.items(), key=lambda x: x[0]):
+        if key == _source_column:
+            return None  # <- EXIT! (May be pruned by partition.)
+        if isinstance(val, Set):
+            shape.append((key, len(val)))
+        elif type(val) in _equality_types:
+            shape.append((key, None))
+        else:
+            return None  # <- EXIT!
+    return tuple(shape)
+
+
+class _IdentityKey(object):
+    """Wrap *obj* so that it is hashed and compared by identity. The
+    wrapper keeps a reference to *obj* so its id() is not reused.
+    """
+    __slots__ = ('obj',)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __hash__(self):
+        return id(self.obj)
+
+    def __eq__(self, other):
+        return isinstance(other, _IdentityKey) and other.obj is self.obj
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+def _callable_keys(values):
+    """Return a tuple of identity keys for the callables nested in
+    the tuples of *values* (e.g., a function inside a tuple predicate).
+    """
+    keys = []
+    for value in values:
+        if isinstance(value, tuple):
+            keys.extend(_callable_keys(value))
+        elif callable(value) and not isinstance(value, type):
+            keys.append(_IdentityKey(value))
+    return tuple(keys)
+
+
+def _cache_clauses(method):
+    """Decorator for the Selector's clause-building methods. The
+    returned clauses are kept in the Selector's statement cache and
+    reused for calls with the same method and *columns* shape.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        cache_key = (method.__name__,) + tuple(_freeze_columns(x) for x in args)
+        try:
+            clauses = self._statement_cache.get(cache_key)
+        except TypeError:  # <- Unhashable arguments.
+            return method(self, *args)
+        if clauses is None:
+            clauses = method(self, *args)
+            self._store_statement(cache_key, clauses)
+        return clauses
+    return wrapper
+
+
+def _get_storage_class_samples():
+    """Return a list of (storage_class, values) tuples where *values*
+    are sample Python objects returned by sqlite3 for each of SQLite's
+    storage classes.
+    """
+    connection = sqlite3.connect(':memory:')
+    try:
+        cursor = connection.execute(
+            "SELECT NULL, 1, 4611686018427387904, 1.5, 'x', x'00'"
+        )
+        row = cursor.fetchone()
+    finally:
+        connection.close()
+    return [
+        ('null', row[0:1]),
+        ('integer', row[1:3]),
+        ('real', row[3:4]),
+        ('text', row[4:5]),
+        ('blob', row[5:6]),
+    ]
+
+_storage_class_samples = _get_storage_class_samples()
+
+
+def _sql_truthy(key):
+    """Return SQL expression that evaluates the truth value of *key*
+    using Python's rules for the objects returned by sqlite3.
+    """
+    return ("(CASE typeof({0}) WHEN 'null' THEN 0 "
+            "WHEN 'text' THEN {0} != '' "
+            "WHEN 'blob' THEN length({0}) > 0 "
+            "ELSE {0} != 0 END)").format(key)
+
+
+def _sql_type_check(key, type_):
+    """Return SQL expression that checks if the values of *key* are
+    instances of *type_* or None if the check depends on the value
+    itself (rather than its storage class).
+    """
+    names = []
+    for name, samples in _storage_class_samples:
+        matches = set(isinstance(x, type_) for x in samples)
+        if len(matches) > 1:
+            return None  # <- EXIT!
+        if matches.pop():
+            names.append(name)
+
+    if not names:
+        return '0'
+    if len(names) == len(_storage_class_samples):
+        return '1'
+    names = ', '.join("'{0}'".format(x) for x in names)
+    return 'typeof({0}) IN ({1})'.format(key, names)
+
+
+_regex_special_chars = set('.^$*+?{}[]|()\\')
+_glob_special_chars = set('*?[')
+
+
+def _regex_to_glob(regex):
+    """Return a GLOB pattern that matches the same text values as a
+    search using the compiled *regex* or None if the regex is too
+    complex to translate. Only regexes made of literal characters,
+    "." and ".*" (optionally anchored with "^" and "$") are supported.
+    The pattern is not valid for values containing newlines.
+    """
+    pattern = regex.pattern
+    if not isinstance(pattern, string_types):
+        return None  # <- EXIT! (Bytes pattern.)
+    if regex.flags & ~re.UNICODE:
+        return None  # <- EXIT! (Flags like IGNORECASE or VERBOSE.)
+
+    anchored_start = pattern.startswith('^')
+    if anchored_start:
+        pattern = pattern[1:]
+
+    anchored_end = False
+    if pattern.endswith('$'):
+        backslashes = len(pattern[:-1]) - len(pattern[:-1].rstrip('\\'))
+        if backslashes % 2 == 0:  # Even count means "$" is not escaped.
+            anchored_end = True
+            pattern = pattern[:-1]
+
+    parts = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\':
+            char = pattern[index + 1:index + 2]
+            if not char or char.isalnum() or char == '_':
+                return None  # <- EXIT! (Character class or backreference.)
+            index += 2
+        elif char == '.':
+            if pattern[index + 1:index + 2] == '*':
+                parts.append('*')
+                index += 2
+            else:
+                parts.append('?')
+                index += 1
+            continue
+        elif char in _regex_special_chars:
+            return None  # <- EXIT!
+        else:
+            index += 1
+
+        if char in _glob_special_chars:
+            char = '[{0}]'.format(char)
+        parts.append(char)
+
+    if not anchored_start:
+        parts.insert(0, '*')
+    if not anchored_end:
+        parts.append('*')
+    return ''.join(parts)
+
+
+def _get_row_size(row):
+    """Return approximate memory size of a result *row* in bytes."""
+    return sys.getsizeof(row) + sum(sys.getsizeof(x) for x in row)
+
+
+class _ResultCache(object):
+    """Least-recently-used cache of query result rows. The total size
+    of the cached rows (as estimated by sys.getsizeof()) is limited to
+    *maxsize* bytes. When *maxsize* is 0, no results are cached.
+    """
+    _fetch_size = 256  # Number of rows to fetch at a time.
+
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.currsize = 0
+        self._entries = {}  # Maps keys to tuples of (rows, size).
+        self._order = []  # Keys ordered from least to most recently used.
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return cached rows for *key* or None if *key* is missing."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._order.remove(key)
+            self._order.append(key)
+            return entry[0]
+
+    def load(self, key, cursor):
+        """Fetch rows from *cursor* and return an iterator of rows.
+        If all of the rows fit within *maxsize*, they are added to the
+        cache. Otherwise, the rows fetched so far are chained with the
+        unread rows from *cursor* and nothing is cached.
+        """
+        rows = []
+        size = 0
+        while True:
+            fetched = cursor.fetchmany(self._fetch_size)
+            if not fetched:
+                break
+            rows.extend(fetched)
+            size += sum(_get_row_size(row) for row in fetched)
+            if size > self.maxsize:
+                return itertools.chain(rows, cursor)  # <- EXIT!
+
+        with self._lock:
+            if key not in self._entries:
+                while self._order and self.currsize + size > self.maxsize:
+                    oldest = self._order.pop(0)
+                    self.currsize -= self._entries.pop(oldest)[1]
+                self._entries[key] = (rows, size)
+                self._order.append(key)
+                self.currsize += size
+        return iter(rows)
+
+    def clear(self):
+        """Remove all cached results (hit and miss counts are kept)."""
+        with self._lock:
+            self._entries.clear()
+            del self._order[:]
+            self.currsize = 0
+
+    def info(self):
+        with self._lock:
+            return _query_cache_info(
+                self.hits, self.misses, self.maxsize, self.currsize)
+
+
+def _fetch_rows(cursor):
+    """Return an iterator of rows from *cursor*. DB-API cursors are
+    read with fetchmany() in batches of the cursor's arraysize, other
+    iterables are iterated over directly.
+    """
+    fetchmany = getattr(cursor, 'fetchmany', None)
+    if fetchmany is None or getattr(cursor, 'arraysize', 1) <= 1:
+        return iter(cursor)
+    return itertools.chain.from_iterable(iter(fetchmany, []))
+
+
+class _MonitoredOperation(object):
+    """A query or load that is limited by a Selector's *timeout* and
+    reported to its *progress* callback. While one of its calls is
+    running, the operation is checked by the connection's progress
+    handler every few SQLite virtual machine steps. Only the time
+    spent inside its calls is counted against the timeout.
+    """
+    def __init__(self, selector, description):
+        self.selector = selector
+        self.description = description  # Used in the timeout message.
+        self.steps = 0  # Approximate number of VM steps run so far.
+        self.seconds = 0.0  # Time spent inside the operation's calls.
+        self.error = None  # Exception that interrupted the operation.
+        self._started = None
+
+    def check(self):
+        """Called by the progress handler--return 1 to interrupt the
+        running statement or 0 to let it continue.
+        """
+        if self.error is not None:
+            return 0  # <- Already interrupted (let cleanup statements run).
+        self.steps += _progress_interval
+        try:
+            progress = self.selector._progress
+            if progress is not None:
+                progress(self.steps)
+            timeout = self.selector._timeout
+            if timeout is not None:
+                seconds = self.seconds + (timeit.default_timer() - self._started)
+                if seconds > timeout:
+                    msg = '{0} exceeded timeout of {1} seconds'
+                    raise TimeoutError(msg.format(self.description, timeout))
+        except BaseException as error:
+            self.error = error
+            return 1
+        return 0
+
+    def run(self, function, *args):
+        """Call *function* with *args* as part of the operation. If
+        the operation is interrupted, the "interrupted" error from
+        SQLite is replaced with the exception that caused it.
+        """
+        selector = self.selector
+        previous, selector._active_operation = selector._active_operation, self
+        self._started = timeit.default_timer()
+        try:
+            return function(*args)
+        except sqlite3.OperationalError:
+            if self.error is None:
+                raise
+        finally:
+            self.seconds += timeit.default_timer() - self._started
+            selector._active_operation = previous
+        raise self.error
+
+
+class _MonitoredCursor(object):
+    """Wrapper for a cursor whose rows are fetched as part of a
+    _MonitoredOperation.
+    """
+    def __init__(self, cursor, operation):
+        self._cursor = cursor
+        self._operation = operation
+
+    @property
+    def arraysize(self):
+        return self._cursor.arraysize
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def fetchone(self):
+        return self._operation.run(self._cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            size = self._cursor.arraysize
+        return self._operation.run(self._cursor.fetchmany, size)
+
+    def fetchall(self):
+        return self._operation.run(self._cursor.fetchall)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    next = __next__  # For Python 2.x compatibility.
+
+
+def _get_sample_size(row_count, n, fraction):
+    """Return the number of rows to sample from *row_count* rows
+    given either a fixed *n* or a *fraction*.
+    """
+    if (n is None) == (fraction is None):
+        raise TypeError('sample() requires either n or fraction')
+    if fraction is not None:
+        if not 0.0 <= fraction <= 1.0:
+            raise ValueError('fraction must be between 0 and 1, got {0!r}'.format(fraction))
+        return int(round(row_count * fraction))
+    if n < 0:
+        raise ValueError('n must not be negative, got {0!r}'.format(n))
+    return min(n, row_count)
+
+
+def _sample_rowids(cursor, table, rng, size, row_count, min_rowid, max_rowid):
+    """Return a sorted list of *size* rowids chosen at random from the
+    *row_count* rows of *table*.
+    """
+    span = max_rowid - min_rowid + 1
+    if span == row_count:  # <- Contiguous rowids.
+        return sorted(rng.sample(range(min_rowid, max_rowid + 1), size))  # <- EXIT!
+
+    if size * 2 > row_count or row_count * 2 < span:
+        # Most random draws would be rejected, so pick row positions
+        # and find their rowids in one pass over the rowid index.
+        positions = set(rng.sample(range(row_count), size))
+        cursor.execute('SELECT rowid FROM {0} ORDER BY rowid'.format(table))
+        return [row[0] for position, row in enumerate(cursor)
+                if position in positions]  # <- EXIT!
+
+    # Draw rowids from min..max and keep those that exist.
+    chosen = set()
+    while len(chosen) < size:
+        draws = min((size - len(chosen)) * 2, _sample_chunk_size)
+        candidates = [rng.randint(min_rowid, max_rowid) for _ in range(draws)]
+        cursor.execute('SELECT rowid FROM {0} WHERE rowid IN ({1})'.format(
+            table, ', '.join('?' * len(candidates))), candidates)
+        existing = set(row[0] for row in cursor)
+        for rowid in candidates:  # <- Keep draw order for a repeatable sample.
+            if rowid in existing and rowid not in chosen:
+                chosen.add(rowid)
+                if len(chosen) == size:
+                    break
+    return sorted(chosen)
+
+
+def _make_obj_string(obj):
+    """Return a one-line string for *obj* to use in a Selector's repr."""
+    obj_str = repr(obj)
+    obj_str = ' '.join(obj_str.split())  # Normalize whitespace.
+
+    # Truncate to 61 characters. The limit of 61 was chosen
+    # so that the repr for a single-source Selector will never
+    # exceed 72 characters (61 + len of other repr parts = 72).
+    if len(obj_str) > 61:
+        obj_str = '{0}...{1}'.format(obj_str[:50], obj_str[-8:])
+    return obj_str
+
+
+def _partition_index_name(table):
+    return 'idx_{0}__source'.format(table)
+
+
+def _describe_sources(obj_strings):
+    """Return a short description of a Selector's sources."""
+    if len(obj_strings) == 1:
+        return obj_strings[0]
+    return '{0} sources'.format(len(obj_strings))
+
+
+def _sample_string(size, obj_strings):
+    """Return a repr() string for a sample of *size* rows."""
+    return 'sample of {0} rows from {1}'.format(size, _describe_sources(obj_strings))
+
+
+def _normalize_join_on(on):
+    """Return a list of (left, right) column name pairs for the *on*
+    argument of Selector.join().
+    """
+    if isinstance(on, string_types):
+        return [(on, on)]
+    if isinstance(on, Mapping):
+        return list(on.items())
+    return [(x, x) for x in on]
+
+
+def _read_header(obj, args, kwds):
+    """Return a list of the field names in *obj* (using the header
+    row for CSV files and other tabular sources) without loading its
+    data.
+    """
+    kwds = dict((k, v) for k, v in kwds.items()
+                if k not in _load_options and k not in ('workers', 'bulk_load'))
+    if _is_csv_path(obj):
+        header = read_csv_header(obj, *args, **kwds)
+    else:
+        reader = get_reader(obj, *args, **kwds)
+        try:
+            header = next(iter(reader), None)
+        finally:
+            close = getattr(reader, 'close', None)
+            if close:
+                close()
+    return [str(name).strip() for name in (header or [])]
+
+
+def _is_csv_path(obj):
+    return isinstance(obj, string_types) and obj.lower().endswith('.csv')
+
+
+def _load_obj(cursor, table, obj, args, kwds):
+    """Load a single data source *obj* into *table*."""
+    if (_is_csv_path(obj) or (
+            isinstance(obj, file_types)
+            and getattr(obj, 'name', '').lower().endswith('.csv')
+        )
+    ):
+        load_csv(cursor, table, obj, *args, **kwds)
+    else:
+        kwds = dict(kwds)
+        load_kwds = {}
+        for key in _load_options:
+            if key in kwds:
+                load_kwds[key] = kwds.pop(key)
+        reader = get_reader(obj, *args, **kwds)
+        load_data(cursor, table, reader, **load_kwds)
+
+
 class Selector(object):
     """A class to quickly load and select tabular data. The given
     *objs*, *\\*args*, and *\\*\\*kwds*, can be any values supported
@@ -1078,13 +1996,138 @@ class Selector(object):
     Load multple files using a shell-style wildcard::
 
         select = datatest.Selector('*.csv')
+
+    Load files using an on-disk cache. File sources are stored in
+    the *cache_dir* directory and, on later runs, unchanged files
+    (same path, size, and modification time) are read from the cache
+    rather than being parsed again. When *cache_hash* is True, the
+    file's contents must also match a stored SHA-1 digest::
+
+        select = datatest.Selector('*.csv', cache_dir='.datatest_cache')
+
+    Load data with typed columns. When *infer_types* is True, column
+    types (INTEGER, REAL, or TEXT) are inferred from all of the rows
+    so numeric values are stored, compared, and aggregated natively.
+    The *converters* argument maps column names to functions that
+    convert non-empty values as they are loaded::
+
+        select = datatest.Selector('myfile.csv', infer_types=True)
+        select = datatest.Selector('myfile.csv', converters={'A': float})
+
+    Parse many CSV files in parallel. When *workers* is greater than
+    one, CSV files are parsed in a pool of worker processes, each
+    file into a database file of its own, and the parsed records are
+    copied into the Selector's table, in order, with SQL (any *args*
+    and *kwds* must be picklable)::
+
+        select = datatest.Selector('data/*.csv', workers=4)
+
+    Load large sources in bulk-load mode. When *bulk_load* is True,
+    SQLite is tuned for inserting (in-memory journal, larger page
+    cache) and existing indexes are dropped and rebuilt once the
+    load is finished. This helps most when adding data to a large,
+    indexed Selector. Query-time settings are restored afterwards::
+
+        select.load_data('big_file.csv', bulk_load=True)
+
+    Select a storage backing. By default, data is stored in an
+    anonymous temporary file (``storage='tempfile'``). Small and
+    medium datasets can be kept entirely in memory with
+    ``storage='memory'``. For very large datasets, a database file
+    path can be given--the file is memory-mapped so page reads go
+    through the operating system's page cache::
+
+        select = datatest.Selector('myfile.csv', storage='memory')
+        select = datatest.Selector('huge.csv', storage='/scratch/data.sqlite')
+
+    When a file path is used, the loaded data is kept in the file's
+    ``datatest_selector`` table after the Selector is closed. Other
+    Selectors that use the same file at the same time get tables of
+    their own (``datatest_selector_1``, ``datatest_selector_2``, etc.).
+    A table left by a Selector that no longer exists is replaced by
+    the next Selector that needs it. Tables in use are tracked within
+    a process--do not share a storage file between processes.
+
+    Let the Selector create indexes as needed. The columns used in
+    where-clauses, ordering, and grouping are tracked across queries.
+    When *auto_index* is True, an index is created for columns that
+    are used often or that account for significant query time (see
+    :meth:`index_report`)::
+
+        select = datatest.Selector('myfile.csv', auto_index=True)
+
+    Cache query results in memory. When *query_cache* is given, the
+    rows of recently used queries are kept--up to a total of
+    *query_cache* bytes--and repeated queries are answered without
+    running SQL again. Queries with where-clause functions are not
+    cached, and the cache is cleared whenever new data is loaded (see
+    :meth:`query_cache_info`)::
+
+        select = datatest.Selector('myfile.csv', query_cache=64 * 1024 * 1024)
+
+    Set the number of rows fetched from SQLite at a time. Results are
+    read in batches of *arraysize* rows (default 1024); larger values
+    trade memory for fewer round trips::
+
+        select = datatest.Selector('myfile.csv', arraysize=4096)
+
+    Defer loading until the data is needed. When *lazy* is True, only
+    the header row of each source is read when it is added--so
+    :attr:`fieldnames` is available right away--and the data is
+    loaded when the first query runs::
+
+        select = datatest.Selector('*.csv', lazy=True)
+
+    Keep each source as its own partition. When *partitioned* is
+    True, every row records the source it was loaded from in an
+    indexed, hidden ``_source`` field. It is not listed in
+    :attr:`fieldnames` but it can be selected and used in
+    where-clauses--queries only read the rows of the matching
+    sources. A single source can be removed with
+    :meth:`drop_source`::
+
+        select = datatest.Selector('*.csv', partitioned=True)
+        query = select('A', _source='orders_2019.csv')
+
+    Limit long-running work. When *timeout* is given, a query or load
+    that spends more than *timeout* seconds in SQLite is stopped and
+    TimeoutError is raised (a partial load is rolled back). When
+    *progress* is given, it is called periodically with the
+    approximate number of SQLite steps the current query or load has
+    run--raise an exception from the callback to cancel it::
+
+        select = datatest.Selector('huge.csv', timeout=30.0)
+        select = datatest.Selector('huge.csv', progress=print)
+
+    Limits are checked between SQLite steps, so a single call to a
+    slow where-clause function is not interrupted part-way through.
+    The :meth:`refresh`, :meth:`drop_source`, :meth:`sample`, and
+    :meth:`join` methods are limited the same way.
     """
     def __init__(self, objs=None, *args, **kwds):
         """Initialize self."""
-        self._connection = DEFAULT_CONNECTION
+        self._timeout = kwds.pop('timeout', None)
+        self._progress = kwds.pop('progress', None)
+        self._thread_state = threading.local()  # Running _MonitoredOperation.
+        self._storage = kwds.pop('storage', 'tempfile')
+        self._connection = _connect_storage(self._storage)
+        self._readonly = False
         self._user_function_dict = dict()  # User-defined SQLite functions.
-        self._table = None  # Table name.
+        self._lazy = kwds.pop('lazy', False)
+        self._partitioned = kwds.pop('partitioned', False)
+        self._source_files = {}  # Fingerprint and load arguments by path.
+        self._pending_loads = []  # List of (obj_list, args, kwds) tuples.
+        self._loading_pending = False  # True while _load_pending() runs.
+        self._load_lock = threading.RLock()  # Guards loading and pending loads.
+        self._pending_fieldnames = []  # Field names including pending loads.
+        self._table = None  # Table name (also resets the schema cache).
         self._obj_strings = []  # Strings for repr().
+        self._cache_dir = kwds.pop('cache_dir', None)
+        self._auto_index = kwds.pop('auto_index', False)
+        self._index_usage = {}  # Column usage for the index advisor.
+        self._cache_hash = kwds.pop('cache_hash', False)
+        self._query_cache = _ResultCache(kwds.pop('query_cache', 0))
+        self._arraysize = kwds.pop('arraysize', _default_arraysize)
         if objs:
             try:
                 self.load_data(objs, *args, **kwds)
@@ -1092,6 +2135,147 @@ class Selector(object):
                 __tracebackhide__ = True
                 raise
 
+    @property
+    def _connection(self):
+        """The Selector's own SQLite connection. When accessed from a
+        forked child process, a new connection is created and the
+        loaded data is copied into it--SQLite handles must not be
+        carried across a fork.
+        """
+        if self._connection_pid != os.getpid():
+            self._reconnect()
+        return self._connection_obj
+
+    @_connection.setter
+    def _connection(self, connection):
+        if self._has_limits():
+            connection.set_progress_handler(
+                self._progress_handler, _progress_interval)
+        self._connection_obj = _LockedConnection(connection)
+        self._connection_pid = os.getpid()
+
+    def _has_limits(self):
+        """Return True if a *timeout* or *progress* callback is set."""
+        return (getattr(self, '_timeout', None) is not None
+                or getattr(self, '_progress', None) is not None)
+
+    @property
+    def _active_operation(self):
+        """The _MonitoredOperation running in the current thread."""
+        return getattr(self._thread_state, 'operation', None)
+
+    @_active_operation.setter
+    def _active_operation(self, operation):
+        self._thread_state.operation = operation
+
+    def _progress_handler(self):
+        operation = self._active_operation
+        if operation is None:
+            return 0
+        return operation.check()
+
+    def _run_monitored(self, description, function, *args):
+        """Call *function* with *args* as a _MonitoredOperation (if
+        the Selector has no limits, *function* is called directly).
+        """
+        if not self._has_limits():
+            return function(*args)
+        return _MonitoredOperation(self, description).run(function, *args)
+
+    @contextlib.contextmanager
+    def _monitoring(self, other):
+        """Context manager that checks the statements run on *other*
+        Selector's connection against this Selector's active operation
+        (e.g., when copying data into a new Selector).
+        """
+        if not self._has_limits() or other is self:
+            yield
+            return  # <- EXIT!
+
+        connection = other._connection
+        connection.set_progress_handler(self._progress_handler, _progress_interval)
+        try:
+            yield
+        finally:
+            if other._has_limits():
+                handler = other._progress_handler
+            else:
+                handler = None
+            connection.set_progress_handler(handler, _progress_interval)
+
+    @property
+    def _table(self):
+        """The name of the Selector's table. When sources are waiting
+        to be loaded (see *lazy*), they are loaded before the name is
+        returned.
+        """
+        if getattr(self, '_pending_loads', None):
+            with self._load_lock:  # <- Other threads wait for the load.
+                if self._pending_loads and not self._loading_pending:
+                    self._load_pending()
+        return self._table_name
+
+    @_table.setter
+    def _table(self, table):
+        self._table_name = table
+        self._clear_schema_cache()
+
+    def _clear_schema_cache(self):
+        """Forget the cached table columns and generated SQL clauses.
+        Must be called whenever the table or its columns change.
+        """
+        self._schema_cache = None  # Tuple of (columns, column_set).
+        self._statement_cache = {}  # SQL clauses by method and shape.
+
+    def _store_statement(self, cache_key, value):
+        """Add *value* to the statement cache (the cache is cleared
+        when it is full).
+        """
+        if len(self._statement_cache) >= _statement_cache_size:
+            self._statement_cache.clear()
+        self._statement_cache[cache_key] = value
+
+    def _get_column_types(self, columns):
+        """Return a list of the declared types of *columns* in the
+        Selector's table (columns without a type give empty strings).
+        """
+        cursor = self._connection.cursor()
+        types = dict(zip(get_columns(cursor, self._table),
+                         get_column_types(cursor, self._table)))
+        return [types[x] for x in columns]
+
+    def _get_table_columns(self):
+        """Return a tuple of (columns, column_set) for the Selector's
+        table (including hidden columns). The result is cached until
+        the table changes.
+        """
+        if self._schema_cache is None:
+            cursor = self._connection.cursor()
+            cursor.execute('PRAGMA table_info({0})'.format(self._table_name))
+            columns = tuple(x[1] for x in cursor)
+            self._schema_cache = (columns, frozenset(columns))
+        return self._schema_cache
+
+    def _reconnect(self):
+        """Replace the inherited connection with a new one. Tables in
+        a temporary or in-memory database are private to the inherited
+        connection, so they are read from it (in this process's copy
+        of the parent's memory) one last time and copied over. The
+        inherited connection is never written to or closed.
+        """
+        storage = getattr(self, '_storage', 'tempfile')
+        if getattr(self, '_readonly', False):
+            new_connection = _connect_snapshot(storage)
+        else:
+            new_connection = _connect_storage(storage)
+        inherited = self._connection_obj.connection  # <- Skip the lock (a parent
+                                                    # thread may have held it).
+        if getattr(self, '_table_name', None) and storage in ('memory', 'tempfile'):
+            _copy_tables(inherited, new_connection)
+        _inherited_connections.append(inherited)
+        self._user_function_dict = dict()  # <- Functions are per-connection.
+        self._connection = new_connection
+
     def load_data(self, objs, *args, **kwds):
         """Load data from one or more objects into the Selector. The
         given *objs*, *\\*args*, and *\\*\\*kwds*, can be any values
@@ -1123,40 +2307,536 @@ class Selector(object):
         else:
             obj_list = objs
 
+        with self._load_lock:
+            if self._lazy and not any(exhaustible(x) for x in obj_list
+                                      if not isinstance(x, string_types)):
+                self._defer_load(obj_list, args, kwds)
+                return  # <- EXIT!
+            self._run_monitored('load', self._load_obj_list, obj_list, args, kwds)
+
+    def _defer_load(self, obj_list, args, kwds):
+        """Read the header of each object in *obj_list* and save the
+        objects to be loaded when the table is first used.
+        """
+        if not self._pending_loads:
+            self._pending_fieldnames = self.fieldnames
+
+        fieldnames = self._pending_fieldnames
+        for obj in obj_list:
+            for name in _read_header(obj, args, kwds):
+                if name not in fieldnames:
+                    fieldnames.append(name)
+            self._append_obj_string(obj)
+        self._pending_loads.append((obj_list, args, kwds))
+
+    def _load_pending(self):
+        """Load the sources saved by _defer_load(). Must be called
+        with the load lock held. Each source is removed from the
+        pending list only after it has been loaded, so other threads
+        keep waiting on the lock until the table is complete.
+        """
+        obj_strings = list(self._obj_strings)  # <- Already appended.
+        self._loading_pending = True
+        try:
+            while self._pending_loads:
+                obj_list, args, kwds = self._pending_loads[0]
+                try:
+                    self._run_monitored(
+                        'load', self._load_obj_list, obj_list, args, dict(kwds))
+                finally:
+                    self._obj_strings = list(obj_strings)
+                self._pending_loads = self._pending_loads[1:]
+        finally:
+            self._loading_pending = False
+
+    def _load_obj_list(self, obj_list, args, kwds):
+        """Load the objects in *obj_list* into the Selector's table."""
+        workers = kwds.pop('workers', None) or 1
+        bulk = kwds.pop('bulk_load', False)
+        default = kwds.get('restval', '')
+
         cursor = self._connection.cursor()
-        with savepoint(cursor):
-            table = self._table or new_table_name(cursor)
-            for obj in obj_list:
-                if ((
-                        isinstance(obj, string_types)
-                        and obj.lower().endswith('.csv')
-                    ) or (
-                        isinstance(obj, file_types)
-                        and getattr(obj, 'name', '').lower().endswith('.csv')
-                    )
-                ):
-                    load_csv(cursor, table, obj, *args, **kwds)
-                else:
-                    reader = get_reader(obj, *args, **kwds)
-                    load_data(cursor, table, reader)
+        staged = {}  # Staging tables for cached/parsed sources (by index).
+        try:
+            if self._cache_dir:
+                staged = self._stage_cached_objs(cursor, obj_list, args, kwds)
+
+            if workers > 1:
+                staged.update(self._stage_parsed_objs(
+                    cursor, obj_list, args, kwds, workers, exclude=staged))
 
-                self._append_obj_string(obj)
+            # Files whose headers are read before loading (see below).
+            prescan = []
+            if not kwds.get('infer_types'):
+                prescan = [obj for i, obj in enumerate(obj_list)
+                           if i not in staged and _is_csv_path(obj)]
+
+            if bulk:
+                loading = bulk_load(cursor, self._table)
+            else:
+                loading = contextlib.suppress()  # <- No-op context manager.
+
+            with loading:
+                with savepoint(cursor):
+                    table = self._table or self._new_table_name(cursor)
+                    if len(prescan) > 1:
+                        self._prescan_headers(
+                            cursor, table, prescan, args, kwds, default)
+
+                    for index, obj in enumerate(obj_list):
+                        if self._partitioned:
+                            self._track_source_file(obj, args, kwds)
+
+                        if index in staged:
+                            copy_table(cursor, table, staged[index], default)
+                        else:
+                            _load_obj(cursor, table, obj, args, kwds)
+
+                        self._append_obj_string(obj)
+                        if self._partitioned:
+                            self._mark_partition(cursor, table, obj)
+        finally:
+            for staging_table in staged.values():
+                drop_table(cursor, staging_table)
+            self._query_cache.clear()  # <- Cached results are stale.
+            self._clear_schema_cache()  # <- Columns may have been added.
 
         if not self._table and table_exists(cursor, table):
             self._table = table
 
-    def _append_obj_string(self, obj):
-        """Get string for *obj*, limit to one line, and append to list."""
-        obj_str = repr(obj)
-        obj_str = ' '.join(obj_str.split())  # Normalize whitespace.
+    def _new_table_name(self, cursor):
+        """Return the name to use when creating the Selector's table.
+        When the data is stored in a database file, the first of the
+        names "datatest_selector", "datatest_selector_1", etc. that is
+        not used by another live Selector is taken and a table left
+        with that name by an earlier Selector is dropped.
+        """
+        if self._storage in ('memory', 'tempfile'):
+            return new_table_name(cursor)
+
+        path = os.path.realpath(self._storage)
+        with _storage_owners_lock:
+            for number in itertools.count():
+                table = '{0}_{1}'.format(_storage_table, number) if number else _storage_table
+                owner = _storage_owners.get((path, table))
+                if owner is None or owner is self:
+                    _storage_owners[(path, table)] = self
+                    break
+        drop_table(cursor, table)
+        return table
+
+    def _mark_partition(self, cursor, table, obj):
+        """Set the hidden source column for rows that were just loaded
+        from *obj*. File paths are used as given, other objects use
+        their repr() string. The column and its index are created
+        when the first source is loaded.
+        """
+        if not table_exists(cursor, table):
+            return  # <- EXIT! (Nothing loaded yet.)
+
+        index_name = _partition_index_name(table)
+        if _source_column not in get_columns(cursor, table):
+            alter_table(cursor, table, [_source_column], default=None)
+            cursor.execute('CREATE INDEX {0} ON {1} ({2})'.format(
+                index_name, table, _source_column))
+        elif not self._has_partition_index(cursor, table):
+            msg = '{0!r} is reserved for partitioned Selectors, found in {1!r}'
+            raise ValueError(msg.format(_source_column, obj))
+
+        source = obj if isinstance(obj, string_types) else self._obj_strings[-1]
+        cursor.execute('UPDATE {0} SET {1}=? WHERE {1} IS NULL'.format(
+            table, _source_column), (source,))
+
+    def _track_source_file(self, obj, args, kwds):
+        """Save the fingerprint and load arguments of *obj* (if it is
+        a file path) so it can be reloaded by refresh().
+        """
+        if isinstance(obj, string_types) and os.path.isfile(obj):
+            fingerprint = get_fingerprint(obj, self._cache_hash)
+            self._source_files[obj] = (fingerprint, args, kwds)
+
+    def refresh(self):
+        """Reload the file sources of a partitioned Selector that have
+        changed since they were loaded and return a list of their
+        paths. A file has changed when its size or modification time
+        is different (or its contents when *cache_hash* is True).
+        The rows of each changed file are deleted and loaded again
+        in a single transaction--rows from other sources are left in
+        place::
+
+            select = datatest.Selector('*.csv', partitioned=True)
+            ...
+            select.refresh()  # <- Reload files rewritten since loading.
+
+        If a file no longer exists, FileNotFoundError is raised and
+        nothing is changed.
+        """
+        if not self._partitioned:
+            raise TypeError('refresh() requires a Selector created '
+                            'with partitioned=True')
+        return self._run_monitored('refresh', self._refresh)
+
+    def _refresh(self):
+        changed = []
+        for path in sorted(self._source_files):
+            old_fingerprint, args, kwds = self._source_files[path]
+            if not os.path.isfile(path):
+                __tracebackhide__ = True
+                raise FileNotFoundError('no source file {0!r}'.format(path))
+            fingerprint = get_fingerprint(path, self._cache_hash)
+            if fingerprint != old_fingerprint:
+                changed.append((path, fingerprint, args, kwds))
+
+        if not changed:
+            return []  # <- EXIT!
+
+        cursor = self._connection.cursor()
+        try:
+            with savepoint(cursor):
+                table = self._table or self._new_table_name(cursor)
+                for path, _, args, kwds in changed:
+                    if table_exists(cursor, table):
+                        cursor.execute('DELETE FROM {0} WHERE {1}=?'.format(
+                            table, _source_column), (path,))
+                    _load_obj(cursor, table, path, args, kwds)
+                    self._mark_partition(cursor, table, path)
+        finally:
+            self._query_cache.clear()  # <- Cached results are stale.
+            self._clear_schema_cache()  # <- Columns may have been added.
+
+        if not self._table and table_exists(cursor, table):
+            self._table = table
+        for path, fingerprint, args, kwds in changed:
+            self._source_files[path] = (fingerprint, args, kwds)
+        return [path for path, _, _, _ in changed]
+
+    @staticmethod
+    def _has_partition_index(cursor, table):
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='index' AND name=? "
+            "UNION SELECT 1 FROM sqlite_temp_master WHERE type='index' AND name=?",
+            (_partition_index_name(table),) * 2,
+        )
+        return bool(cursor.fetchall())
+
+    def drop_source(self, source):
+        """Remove the rows that were loaded from *source* from a
+        partitioned Selector. The *source* should be a file path or,
+        for other objects, the string shown for it in the Selector's
+        repr--the same values found in the ``_source`` field::
+
+            select = datatest.Selector('*.csv', partitioned=True)
+            select.drop_source('orders_2019.csv')
+
+        To replace a source, drop it and load it again with
+        :meth:`load_data`.
+        """
+        if not self._partitioned:
+            raise TypeError('drop_source() requires a Selector created '
+                            'with partitioned=True')
+        self._run_monitored('drop_source', self._drop_source, source)
+
+    def _drop_source(self, source):
+        cursor = self._connection.cursor()
+        with savepoint(cursor):
+            cursor.execute('DELETE FROM {0} WHERE {1}=?'.format(
+                self._table, _source_column), (source,))
+            deleted = cursor.rowcount
+        self._query_cache.clear()  # <- Cached results are stale.
+        self._source_files.pop(source, None)
+
+        for obj_str in [_make_obj_string(source), source]:
+            if obj_str in self._obj_strings:
+                self._obj_strings.remove(obj_str)
+                break
+        else:
+            if deleted < 1:
+                msg = 'no source {0!r} in {1!r}'.format(source, self)
+                raise LookupError(msg)
+
+    def _prescan_headers(self, cursor, table, paths, args, kwds, default):
+        """Read the header row of each CSV file in *paths* and create
+        (or alter) *table* so it has the union of their columns. This
+        defines the schema once rather than altering the table as
+        each file with new columns is loaded.
+        """
+        columns = []
+        seen = set()
+        for path in paths:
+            header = read_csv_header(path, *args, **kwds)
+            if not header:
+                continue
+            normalized = normalize_names(header)
+            if len(set(normalized)) != len(normalized):
+                return  # <- EXIT! (Load files one at a time as usual.)
+            for name, normalized_name in zip(header, normalized):
+                if normalized_name not in seen:
+                    seen.add(normalized_name)
+                    columns.append(name)
+
+        if not columns:
+            return  # <- EXIT!
+
+        if table_exists(cursor, table):
+            alter_table(cursor, table, columns, default=default)
+        else:
+            create_table(cursor, table, columns, default=default)
+
+    def snapshot(self, path):
+        """Save the loaded data to a snapshot file at *path*. Other
+        processes can open the snapshot with :meth:`from_snapshot`
+        rather than loading the original data sources again::
+
+            select = datatest.Selector('*.csv')
+            select.snapshot('mydata.snapshot')
+
+        The snapshot is written to a temporary file and then renamed,
+        so processes never open a partially written snapshot.
+        """
+        cursor = self._connection.cursor()
+        write_snapshot(cursor, self._table, path, self._obj_strings)
+
+    @classmethod
+    def from_snapshot(cls, path, readonly=True, **kwds):
+        """Return a new Selector using the data in a snapshot file
+        created with :meth:`snapshot`. Any *\\*\\*kwds* are passed
+        to the Selector class initialization.
+
+        When *readonly* is True, the Selector queries the snapshot
+        file directly. No data is copied and the operating system's
+        page cache is shared by all processes that open the same
+        snapshot, but no data can be loaded into the Selector::
+
+            select = datatest.Selector.from_snapshot('mydata.snapshot')
+
+        When *readonly* is False, the data is copied into a private
+        in-memory database (or the given *storage*) and more data can
+        be loaded as usual.
+        """
+        if not os.path.isfile(path):
+            __tracebackhide__ = True
+            raise FileNotFoundError('no snapshot file {0!r}'.format(path))
+
+        if readonly:
+            if 'storage' in kwds:
+                raise ValueError('cannot specify storage for a readonly snapshot')
+            new_selector = cls(**kwds)
+            new_selector._readonly = True
+            new_selector._storage = path
+            new_selector._connection = _connect_snapshot(path)
+            cursor = new_selector._connection.cursor()
+            table, obj_strings = read_snapshot_info(cursor)
+        else:
+            kwds.setdefault('storage', 'memory')
+            new_selector = cls(**kwds)
+            cursor = new_selector._connection.cursor()
+            if new_selector._storage in ('memory', 'tempfile'):
+                table, obj_strings = load_snapshot(cursor, path)
+            else:  # <- Use the storage file's table name.
+                new_table = new_selector._new_table_name(cursor)
+                table, obj_strings = load_snapshot(cursor, path)
+                if table and table != new_table:
+                    new_selector._rename_table(cursor, table, new_table)
+                    table = new_table
+
+        new_selector._table = table
+        new_selector._obj_strings = obj_strings
+        if table:
+            new_selector._partitioned = \
+                new_selector._has_partition_index(cursor, table)
+        return new_selector
+
+    def _rename_table(self, cursor, table, new_table):
+        """Rename *table* to *new_table* (its partition index, if any,
+        is rebuilt with a matching name).
+        """
+        has_partition_index = self._has_partition_index(cursor, table)
+        with savepoint(cursor):
+            cursor.execute('ALTER TABLE {0} RENAME TO {1}'.format(table, new_table))
+            if has_partition_index:
+                cursor.execute('DROP INDEX {0}'.format(_partition_index_name(table)))
+                cursor.execute('CREATE INDEX {0} ON {1} ({2})'.format(
+                    _partition_index_name(new_table), new_table, _source_column))
+
+    def sample(self, n=None, fraction=None, seed=None):
+        """Return a new Selector that contains a random sample of the
+        loaded rows--either *n* rows or a *fraction* of them. Queries
+        against the sample work like queries against the full data,
+        which makes it useful for a quick check before a longer
+        validation::
+
+            sample = select.sample(n=10000, seed=1234)
+            validate(sample('A'), {'x', 'y', 'z'})
+
+        Rows are chosen by rowid and copied (with SQL, keeping the
+        column types) into an in-memory Selector in their original
+        order. The same *seed* always selects the same rows from the
+        same data.
+        """
+        return self._run_monitored('sample', self._sample, n, fraction, seed)
+
+    def _sample(self, n, fraction, seed):
+        new_selector = self.__class__(storage='memory', arraysize=self._arraysize)
+        if not self._table:
+            _get_sample_size(0, n, fraction)  # <- Validate arguments.
+            return new_selector  # <- EXIT!
+
+        cursor = self._connection.cursor()
+        cursor.execute('SELECT count(*), min(rowid), max(rowid) FROM {0}'.format(self._table))
+        row_count, min_rowid, max_rowid = cursor.fetchone()
+        size = _get_sample_size(row_count, n, fraction)
+
+        rng = random.Random(seed)
+        if size:
+            rowids = _sample_rowids(cursor, self._table, rng, size,
+                                    row_count, min_rowid, max_rowid)
+        else:
+            rowids = []
+
+        new_cursor = new_selector._connection.cursor()
+        table = new_table_name(new_cursor)
+        with self._monitoring(new_selector):
+            copy_across(cursor, self._table, new_cursor, table, rowids)
+            if self._partitioned:
+                new_cursor.execute('CREATE INDEX {0} ON {1} ({2})'.format(
+                    _partition_index_name(table), table, _source_column))
+        new_selector._partitioned = self._partitioned
+
+        new_selector._table = table
+        new_selector._obj_strings = [_sample_string(size, self._obj_strings)]
+        return new_selector
+
+    def join(self, other, on, how='inner', suffix='_right'):
+        """Return a new Selector that contains the rows of this
+        Selector joined to the rows of *other* where the columns
+        given by *on* are equal. The join is run inside SQLite, so
+        neither side is loaded into Python objects::
+
+            orders = datatest.Selector('orders.csv')
+            customers = datatest.Selector('customers.csv')
+            joined = orders.join(customers, on={'customer_id': 'id'}, how='left')
+
+            # Get orders that refer to a customer that does not exist.
+            orphans = joined('order_id', id=lambda x: x is None)
+
+        The *on* argument can be a column name, a list of column names
+        used by both Selectors, or a dictionary that maps this
+        Selector's column names to *other*'s column names. When *how*
+        is ``'inner'`` (the default), only matching rows are kept.
+        When *how* is ``'left'``, rows without a match are kept and
+        *other*'s columns are NULL (None).
+
+        The new Selector has all of this Selector's columns followed
+        by all of *other*'s columns (with their column types). Column
+        names from *other* that are already used get the given *suffix*.
+
+        A Selector whose data is stored in a database file (see the
+        *storage* argument or :meth:`from_snapshot`) is attached to
+        the join directly. Other Selectors are first copied, with
+        SQL, into a temporary database file which is attached instead.
+        """
+        if not isinstance(other, Selector) or not hasattr(other, '_table'):
+            msg = 'cannot join {0} with {1}'
+            raise TypeError(msg.format(self.__class__.__name__,
+                                       other.__class__.__name__))
+
+        on = _normalize_join_on(on)
+        self._assert_fields_exist([x for x, _ in on])
+        other._assert_fields_exist([y for _, y in on])
+        return self._run_monitored('join', self._join, other, on, how, suffix)
+
+    def _join(self, other, on, how, suffix):
+        storage = self._storage
+        if storage not in ('memory', 'tempfile'):
+            storage = 'tempfile'
+        new_selector = self.__class__(storage=storage, arraysize=self._arraysize)
+        cursor = new_selector._connection.cursor()
+
+        sides = []
+        for schema, selector in [('datatest_left', self), ('datatest_right', other)]:
+            path = None
+            if selector._storage not in ('memory', 'tempfile'):
+                path = selector._storage  # <- Attach database file.
+            sides.append((selector, path, schema))
+
+        staged = []  # List of (table, temp_path) tuples.
+        try:
+            with self._monitoring(other):
+                for selector, path, schema in sides:
+                    staged.append(stage_table(cursor, selector._connection,
+                                              selector._table, path, schema))
+            with self._monitoring(new_selector):
+                with savepoint(cursor):
+                    table = new_table_name(cursor)
+                    join_tables(cursor, table, staged[0][0], staged[1][0],
+                                self.fieldnames, other.fieldnames, on, how,
+                                suffix, self._get_column_types(self.fieldnames),
+                                other._get_column_types(other.fieldnames))
+        finally:
+            for (_, temp_path), (_, _, schema) in zip(staged, sides):
+                unstage_table(cursor, schema, temp_path)
+
+        new_selector._table = table
+        new_selector._obj_strings = ['join of {0} and {1}'.format(
+            _describe_sources(self._obj_strings),
+            _describe_sources(other._obj_strings),
+        )]
+        return new_selector
+
+    def _stage_cached_objs(self, cursor, obj_list, args, kwds):
+        """Load file path objects through the on-disk cache and return
+        a dictionary that maps *obj_list* indexes to staging tables.
+        Stale or missing cache entries are rebuilt one file at a time.
+        """
+        if not os.path.isdir(self._cache_dir):
+            os.makedirs(self._cache_dir)
 
-        # Truncate to 61 characters. The limit of 61 was chosen
-        # so that the repr for a single-source Selector will never
-        # exceed 72 characters (61 + len of other repr parts = 72).
-        if len(obj_str) > 61:
-            obj_str = '{0}...{1}'.format(obj_str[:50], obj_str[-8:])
+        staged = {}
+        try:
+            for index, obj in enumerate(obj_list):
+                if not (isinstance(obj, string_types) and os.path.isfile(obj)):
+                    continue
+
+                fingerprint = get_fingerprint(obj, self._cache_hash)
+                cache_file = get_cache_file(self._cache_dir, obj, args, kwds)
+                staging_table = new_table_name(cursor)
+                staged[index] = staging_table
+                if not read_cache(cursor, staging_table, cache_file, fingerprint):
+                    _load_obj(cursor, staging_table, obj, args, kwds)
+                    write_cache(cursor, staging_table, cache_file, fingerprint)
+        except Exception:
+            for staging_table in staged.values():
+                drop_table(cursor, staging_table)
+            raise
+        return staged
+
+    def _stage_parsed_objs(self, cursor, obj_list, args, kwds, workers,
+                           exclude=()):
+        """Parse the CSV file paths in *obj_list* using a pool of
+        *workers* processes and return a dictionary that maps
+        *obj_list* indexes to staging tables. Indexes in *exclude*
+        are skipped.
+        """
+        indexes = [i for i, obj in enumerate(obj_list)
+                   if i not in exclude and _is_csv_path(obj)]
+        paths = [obj_list[i] for i in indexes]
 
-        self._obj_strings.append(obj_str)
+        staged = {}
+        with parse_csv_files(paths, workers, args, kwds) as parsed:
+            try:
+                for index, result in zip(indexes, parsed):
+                    staging_table = new_table_name(cursor)
+                    staged[index] = staging_table
+                    read_parsed(cursor, staging_table, result)
+            except Exception:
+                for staging_table in staged.values():
+                    drop_table(cursor, staging_table)
+                raise
+        return staged
+
+    def _append_obj_string(self, obj):
+        """Get string for *obj*, limit to one line, and append to list."""
+        self._obj_strings.append(_make_obj_string(obj))
 
     def __repr__(self):
         """Return a string representation of the data source."""
@@ -1171,12 +2851,22 @@ class Selector(object):
             '\n    '.join(sorted(self._obj_strings)),
         )
 
+    @property
+    def storage(self):
+        """The Selector's storage backing: ``'memory'``, ``'tempfile'``,
+        or the path of its database file.
+        """
+        return self._storage
+
     @property
     def fieldnames(self):
         """A list of field names used by the data source."""
-        cursor = self._connection.cursor()
-        cursor.execute('PRAGMA table_info({0})'.format(self._table))
-        return [x[1] for x in cursor]
+        if self._pending_loads:
+            return list(self._pending_fieldnames)  # <- Without loading.
+        fieldnames = list(self._get_table_columns()[0])
+        if self._partitioned and _source_column in fieldnames:
+            fieldnames.remove(_source_column)  # <- Hidden column.
+        return fieldnames
 
     def __call__(self, columns, **where):
         """After a Selector has been created, it can be called like a
@@ -1225,20 +2915,31 @@ class Selector(object):
             __tracebackhide__ = True
             raise
 
+    def _build_query(self, select_clause, trailing_clause=None, **kwds_filter):
+        """Return a tuple of the select-query statement and its
+        parameters.
+        """
+        stmnt = 'SELECT {0} FROM {1}'.format(select_clause, self._table)
+        where_clause, params = self._build_where_clause(kwds_filter)
+        if where_clause:
+            stmnt = '{0} WHERE {1}'.format(stmnt, where_clause)
+        if trailing_clause:
+            stmnt = '{0}\n{1}'.format(stmnt, trailing_clause)
+        return stmnt, params
+
     def _execute_query(self, select_clause, trailing_clause=None, **kwds_filter):
         """Execute query and return cursor object."""
+        stmnt, params = self._build_query(
+            select_clause, trailing_clause, **kwds_filter)
         try:
-            # Build select-query.
-            stmnt = 'SELECT {0} FROM {1}'.format(select_clause, self._table)
-            where_clause, params = self._build_where_clause(kwds_filter)
-            if where_clause:
-                stmnt = '{0} WHERE {1}'.format(stmnt, where_clause)
-            if trailing_clause:
-                stmnt = '{0}\n{1}'.format(stmnt, trailing_clause)
-
-            # Execute query.
             cursor = self._connection.cursor()
-            cursor.execute(stmnt, params)
+            cursor.arraysize = self._arraysize
+            if self._has_limits():
+                operation = _MonitoredOperation(self, 'query')
+                operation.run(cursor.execute, stmnt, params)
+                cursor = _MonitoredCursor(cursor, operation)
+            else:
+                cursor.execute(stmnt, params)
 
         except Exception as e:
             exc_cls = e.__class__
@@ -1247,16 +2948,273 @@ class Selector(object):
 
         return cursor
 
+    def _get_sql_query(self, method_name, args, kwds):
+        """Return a tuple of the statement and parameters that the
+        select method named *method_name* (``'_select'``,
+        ``'_select_distinct'``, or ``'_select_aggregate'``) would
+        execute for the given *args* and *kwds*. Returns None if no
+        data is loaded.
+        """
+        if not self._table:
+            return None
+        clauses_method = getattr(self, '{0}_clauses'.format(method_name))
+        _, select_clause, trailing_clause = clauses_method(*args)
+        return self._build_query(select_clause, trailing_clause, **kwds)
+
+    def _get_query_plan(self, stmnt, params, analyze=False):
+        """Return a list of lines describing SQLite's query plan for
+        *stmnt*. If *analyze* is True, ANALYZE is run first so the
+        planner has statistics for the Selector's table and indexes.
+        """
+        cursor = self._connection.cursor()
+        if analyze and self._table:
+            cursor.execute('ANALYZE {0}'.format(self._table))
+        cursor.execute('EXPLAIN QUERY PLAN {0}'.format(stmnt), params)
+
+        depths = {0: -1}  # Nesting depth of each node (by id).
+        lines = []
+        for row in cursor:
+            node_id, parent_id, detail = row[0], row[1], row[-1]
+            depth = depths.get(parent_id, -1) + 1
+            depths[node_id] = depth
+            lines.append('{0}{1}'.format('  ' * depth, detail))
+        return lines
+
+    def _execute_select(self, key, select_clause, trailing_clause, where):
+        """Execute query using _execute_query() and track the usage of
+        *key* columns (ORDER BY and GROUP BY) and *where* columns for
+        the index advisor. When the query cache is enabled, an iterator
+        of rows is returned instead of a cursor.
+        """
+        cache_key = None
+        if self._query_cache.maxsize:
+            cache_key = self._get_cache_key(select_clause, trailing_clause, where)
+            if cache_key is not None:
+                rows = self._query_cache.get(cache_key)
+                if rows is not None:
+                    return iter(rows)  # <- EXIT!
+
+        start = timeit.default_timer()
+        cursor = self._execute_query(select_clause, trailing_clause, **where)
+        seconds = timeit.default_timer() - start
+
+        if key:
+            key = (key,) if isinstance(key, string_types) else tuple(key)
+            self._track_index_usage(key, seconds)
+        where_columns = [k for k, v in where.items() if _is_indexable(v)]
+        if where_columns:
+            self._track_index_usage(tuple(sorted(where_columns)), seconds)
+
+        if cache_key is not None:
+            return self._query_cache.load(cache_key, cursor)
+        return cursor
+
+    def _get_cache_key(self, select_clause, trailing_clause, where):
+        """Return a query cache key or None if the query should not be
+        cached. Queries that use functions (which may not return the
+        same values each time) or unhashable predicates are not cached.
+        """
+        for value in where.values():
+            if callable(value) and not isinstance(value, type):
+                return None  # <- EXIT!
+            if isinstance(value, Set):
+                continue  # <- Sets are compared by their members.
+            try:
+                hash(value)
+            except TypeError:
+                return None  # <- EXIT!
+        where_clause, params = self._build_where_clause(where)
+        key = (select_clause, trailing_clause, where_clause,
+               tuple((type(p), p) for p in params),  # <- 1 and 1.0 differ.
+               _callable_keys(where.values()))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def query_cache_info(self):
+        """Return a named tuple of *hits*, *misses*, *maxsize*, and
+        *currsize* for the Selector's query cache (sizes are given in
+        bytes)::
+
+            select = datatest.Selector('myfile.csv', query_cache=1000000)
+            ...
+            print(select.query_cache_info())
+        """
+        return self._query_cache.info()
+
+    def _track_index_usage(self, columns, seconds):
+        """Record a query's use of *columns* and the *seconds* it took
+        to execute. When *auto_index* is enabled, an index is created
+        once the columns pass the use or cost threshold (a read-only
+        Selector can not create indexes, so they are only recommended).
+        """
+        usage = self._index_usage.get(columns)
+        if usage is None:
+            usage = {'uses': 0, 'seconds': 0.0, 'status': None,
+                     'uses_after': 0, 'seconds_after': 0.0}
+            self._index_usage[columns] = usage
+
+        if usage['status'] == 'created':
+            usage['uses_after'] += 1
+            usage['seconds_after'] += seconds
+            return  # <- EXIT!
+
+        usage['uses'] += 1
+        usage['seconds'] += seconds
+        if usage['uses'] >= _index_use_threshold \
+                or usage['seconds'] >= _index_cost_threshold:
+            if self._auto_index and not self._readonly:
+                self.create_index(*columns)
+                usage['status'] = 'created'
+            else:
+                usage['status'] = 'recommended'
+
+    def index_report(self):
+        """Return a list of column sets that the Selector recommended
+        for indexing or automatically indexed. Each item is a named
+        tuple of *columns*, *uses* and *seconds* (before indexing),
+        *status* ('recommended' or 'created'), and an estimate of
+        *seconds_saved* by the created index::
+
+            select = datatest.Selector('myfile.csv', auto_index=True)
+            ...
+            for advice in select.index_report():
+                print(advice)
+
+        Query times are measured when the query is executed (when
+        SQLite returns its first row), so they are approximate.
+        """
+        report = []
+        for columns, usage in self._index_usage.items():
+            if not usage['status']:
+                continue
+            seconds_saved = None
+            if usage['status'] == 'created':
+                average = usage['seconds'] / usage['uses']
+                seconds_saved = max(
+                    average * usage['uses_after'] - usage['seconds_after'],
+                    0.0,
+                )
+            report.append(_index_advice(
+                columns,
+                usage['uses'],
+                usage['seconds'],
+                usage['status'],
+                seconds_saved,
+            ))
+        report.sort(key=lambda x: x.seconds, reverse=True)
+        return report
+
+    def _translate_predicate(self, key, val):
+        """Return a tuple of (expression, params) that implements the
+        *val* predicate for column *key* using native SQL or None if
+        the predicate requires a user-defined function.
+        """
+        inverted = False
+        if isinstance(val, Predicate):
+            inverted = val._inverted
+            val = val.obj
+        elif callable(val) and not isinstance(val, type):
+            return None  # <- EXIT!
+
+        params = []
+        if isinstance(val, Set):
+            expression = '{0} IN ({1})'.format(key, ', '.join('?' * len(val)))
+            params.extend(val)
+        elif val is Ellipsis:
+            expression = '1'
+        elif val is True:
+            expression = _sql_truthy(key)
+        elif val is False:
+            expression = 'NOT {0}'.format(_sql_truthy(key))
+        elif isinstance(val, type):
+            expression = _sql_type_check(key, val)
+        elif isinstance(val, regex_types):
+            glob_pattern = _regex_to_glob(val)
+            if glob_pattern is None:
+                return None  # <- EXIT!
+            # Values that are not text (which raise an error) or that
+            # contain newlines (where "$" and "." behave differently)
+            # are still checked with the regex itself.
+            func_name = self._get_user_function(get_matcher(val)._func,
+                                                keyref=val)
+            expression = ("(CASE WHEN typeof({0}) = 'text' "
+                          "AND {0} NOT GLOB ? THEN {0} GLOB ? "
+                          "ELSE {1}({0}) END)").format(key, func_name)
+            params.extend(['*\n*', glob_pattern])
+        elif inverted and not callable(val) and not isinstance(val, tuple):
+            expression = '{0}=?'.format(key)
+            params.append(val)
+        else:
+            return None  # <- EXIT!
+
+        if expression is None:
+            return None  # <- EXIT!
+
+        if inverted:
+            # Use COALESCE() so that NULL comparisons become true.
+            expression = 'NOT COALESCE({0}, 0)'.format(expression)
+        return expression, params
+
+    def _prune_partitions(self, val):
+        """Return a tuple of (expression, params) that limits a query
+        to the partitions whose source matches *val*. The predicate
+        is checked once per source (using the partition index) and
+        the matches are given as an IN-list.
+        """
+        cursor = self._connection.cursor()
+        cursor.execute('SELECT DISTINCT {0} FROM {1}'.format(
+            _source_column, self._table))
+        match = _get_match_function(val)
+        sources = [row[0] for row in cursor if match(row[0])]
+        expression = '{0} IN ({1})'.format(_source_column, ', '.join('?' * len(sources)))
+        return expression, sources
+
     def _build_where_clause(self, where_dict):
         """Return SQL 'WHERE' clause that implements *where* keyword
-        constraints.
+        constraints. Clauses made only of equality and set-membership
+        predicates are cached by shape--only their parameters are
+        rebuilt.
+        """
+        shape = _where_shape(where_dict)
+        if shape is None:
+            return self._translate_where_clause(where_dict)  # <- EXIT!
+
+        cache_key = ('where', shape)
+        clause = self._statement_cache.get(cache_key)
+        if clause is None:
+            clause, params = self._translate_where_clause(where_dict)
+            self._store_statement(cache_key, clause)
+            return clause, params  # <- EXIT!
+
+        params = []
+        for key, val in sorted(where_dict.items(), key=lambda x: x[0]):
+            if isinstance(val, Set):
+                params.extend(val)
+            else:
+                params.append(val)
+        return clause, params
+
+    def _translate_where_clause(self, where_dict):
+        """Return a tuple of the 'WHERE' clause and its parameters
+        for the *where_dict* keyword constraints.
         """
         clause = []
         params = []
         items = where_dict.items()
         items = sorted(items, key=lambda x: x[0])  # Ordered by key.
         for key, val in items:
-            if isinstance(val, Set):
+            if key == _source_column and self._partitioned:
+                translated = self._prune_partitions(val)
+            else:
+                translated = self._translate_predicate(key, val)
+            if translated:
+                expression, expression_params = translated
+                clause.append(expression)
+                params.extend(expression_params)
+            elif isinstance(val, Set):
                 clause.append('{key} IN ({qmarks})'.format(
                     key=key,
                     qmarks=', '.join('?' * len(val))
@@ -1322,19 +3280,30 @@ class Selector(object):
             def func(x):
                 return _func(x)
 
-        func_name = next(_user_function_name_gen)
+        with _user_function_name_lock:
+            func_name = next(_user_function_name_gen)
         self._connection.create_function(func_name, 1, func)  # <- Register!
         self._user_function_dict[func_key] = func_name
 
-    def _format_result_group(self, columns, cursor):
+    def _format_result_group(self, columns, cursor, offset=0):
+        """Return a Result of rows from *cursor* formatted by the
+        *columns* types. Values are taken from each row starting at
+        the *offset* position (used to skip over key values).
+        """
         outer_type = type(columns)
         inner_type = type(next(iter(columns)))
+        rows = _fetch_rows(cursor)
         if issubclass(inner_type, str):
-            result = (row[0] for row in cursor)
-        elif issubclass(inner_type, tuple) and hasattr(inner_type, '_fields'):
-            result = (inner_type(*x) for x in cursor)  # If namedtuple.
+            result = map(itemgetter(offset), rows)
         else:
-            result = (inner_type(x) for x in cursor)
+            if offset:
+                rows = map(itemgetter(slice(offset, None)), rows)
+            if inner_type is tuple:
+                result = rows  # <- Rows are already tuples.
+            elif issubclass(inner_type, tuple) and hasattr(inner_type, '_fields'):
+                result = itertools.starmap(inner_type, rows)  # If namedtuple.
+            else:
+                result = map(inner_type, rows)
         return Result(result, evaluation_type=outer_type) # <- EXIT!
 
     def _format_results(self, columns, cursor):
@@ -1354,17 +3323,17 @@ class Selector(object):
             slice_index = 1 if issubclass(key_type, str) else len(key)
 
             if issubclass(key_type, str):
-                keyfunc = lambda row: row[0]
+                keyfunc = itemgetter(0)
+            elif key_type is tuple:
+                keyfunc = itemgetter(slice(0, slice_index))
             elif issubclass(key_type, tuple) and hasattr(key_type, '_fields'):
                 keyfunc = lambda row: key_type(*row[:slice_index])  # If namedtuple.
             else:
                 keyfunc = lambda row: key_type(row[:slice_index])
-            grouped = itertools.groupby(cursor, keyfunc)
+            grouped = itertools.groupby(_fetch_rows(cursor), keyfunc)
 
-            inner = next(iter(value))
-            index = 1 if isinstance(inner, str) else len(inner)
-            sliced = ((k, (x[-index:] for x in g)) for k, g in grouped)
-            formatted = ((k, self._format_result_group(value, g)) for k, g in sliced)
+            formatted = ((k, self._format_result_group(value, g, slice_index))
+                         for k, g in grouped)
             dictitems =  DictItems(formatted)
             return Result(dictitems, evaluation_type=result_type) # <- EXIT!
 
@@ -1374,30 +3343,54 @@ class Selector(object):
         """Assert that given fieldnames are present in data source,
         raises LookupError if fields are missing.
         """
-        available = self.fieldnames
+        available = self._get_available_fields()
         for name in fieldnames:
             if name not in available:
                 msg = '{0!r} not in {1!r}'.format(name, self)
                 __tracebackhide__ = True
                 raise LookupError(msg)
 
+    def _get_available_fields(self):
+        """Return a set of the field names that can be used in queries
+        (including the ``_source`` pseudo-field of partitioned
+        Selectors).
+        """
+        if self._pending_loads:
+            available = frozenset(self._pending_fieldnames)
+        else:
+            available = self._get_table_columns()[1]
+        if self._partitioned:
+            available = available.union([_source_column])  # <- Pseudo-field.
+        return available
+
     def _escape_field_name(self, name):
         """Escape field names for SQLite."""
         name = name.replace('"', '""')
         return '"{0}"'.format(name)
 
-    def _parse_key_value(self, key, value):
+    def _parse_key_value_names(self, key, value):
+        """Return a tuple of *key* and *value* column names (after
+        asserting that the columns exist).
+        """
         key_columns = (key,) if isinstance(key, str) else tuple(key)
         value = tuple(value)[0]
         value_columns = (value,) if isinstance(value, str) else  tuple(value)
         self._assert_fields_exist(key_columns)
         self._assert_fields_exist(value_columns)
+        return key_columns, value_columns
+
+    def _parse_key_value(self, key, value):
+        key_columns, value_columns = self._parse_key_value_names(key, value)
         key_columns = tuple(self._escape_field_name(x) for x in key_columns)
         value_columns = tuple(self._escape_field_name(x) for x in value_columns)
 
         return key_columns, value_columns
 
-    def _select(self, columns, **where):
+    @_cache_clauses
+    def _select_clauses(self, columns):
+        """Return a tuple of (key, select_clause, trailing_clause)
+        for the _select() method.
+        """
         key, value = _parse_columns(columns)
         key_columns, value_columns = self._parse_key_value(key, value)
 
@@ -1409,10 +3402,18 @@ class Selector(object):
             order_by = 'ORDER BY {0}'.format(', '.join(key_columns))
         else:
             order_by = None
-        cursor = self._execute_query(select_clause, order_by, **where)
+        return key, select_clause, order_by
+
+    def _select(self, columns, **where):
+        key, select_clause, order_by = self._select_clauses(columns)
+        cursor = self._execute_select(key, select_clause, order_by, where)
         return self._format_results(columns, cursor)
 
-    def _select_distinct(self, columns, **where):
+    @_cache_clauses
+    def _select_distinct_clauses(self, columns):
+        """Return a tuple of (key, select_clause, trailing_clause)
+        for the _select_distinct() method.
+        """
         key, value = _parse_columns(columns)
         key_columns, value_columns = self._parse_key_value(key, value)
 
@@ -1422,10 +3423,18 @@ class Selector(object):
             order_by = 'ORDER BY {0}'.format(', '.join(key_columns))
         else:
             order_by = None
-        cursor = self._execute_query(select_clause, order_by, **where)
+        return key, select_clause, order_by
+
+    def _select_distinct(self, columns, **where):
+        key, select_clause, order_by = self._select_distinct_clauses(columns)
+        cursor = self._execute_select(key, select_clause, order_by, where)
         return self._format_results(columns, cursor)
 
-    def _select_aggregate(self, sqlfunc, columns, **where):
+    @_cache_clauses
+    def _select_aggregate_clauses(self, sqlfunc, columns):
+        """Return a tuple of (key, select_clause, trailing_clause)
+        for the _select_aggregate() method.
+        """
         key, value = _parse_columns(columns)
         key_columns, value_columns = self._parse_key_value(key, value)
 
@@ -1440,7 +3449,12 @@ class Selector(object):
             group_by = 'GROUP BY {0}'.format(', '.join(key_columns))
         else:
             group_by = None
-        cursor = self._execute_query(select_clause, group_by, **where)
+        return key, select_clause, group_by
+
+    def _select_aggregate(self, sqlfunc, columns, **where):
+        key, select_clause, group_by = \
+            self._select_aggregate_clauses(sqlfunc, columns)
+        cursor = self._execute_select(key, select_clause, group_by, where)
         results =  self._format_results(columns, cursor)
 
         if isinstance(columns, Mapping):
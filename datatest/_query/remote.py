@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+"""Selector whose shards are held by worker servers (see the
+datatest.worker module) and queried over a socket connection.
+
+Requests and responses are pickled objects sent with the framing and
+HMAC authentication of multiprocessing.connection. A request is a
+tuple of (command, arg1, arg2, ...) and every request is answered by
+one ('done', value) or ('error', exception) message. The "execute"
+command first streams its rows in ('rows', batch) messages.
+"""
+from __future__ import absolute_import
+import pickle
+import re
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # <- Python 2.x name.
+
+from .._compatibility.builtins import *
+from .._load.temptable import alter_table
+from .._load.temptable import create_table
+from .._load.temptable import insert_records
+from .._load.temptable import normalize_names
+from .._load.temptable import savepoint
+from .._load.temptable import table_exists
+from .._utils import string_types
+from .query import Selector
+from .sharded import ShardedSelector
+from .sharded import _function_name_pattern
+from .sharded import _open_streams
+from .sharded import _ready_connection
+from .sharded import _shard_hash
+
+
+_batch_size = 1024  # Rows per message when sending or streaming rows.
+_dataset_pattern = re.compile(r'^\w+$')
+
+
+def _dataset_table(name):
+    """Return the table name used for the dataset *name*."""
+    if not _dataset_pattern.match(name):
+        msg = 'dataset name must contain only letters, digits, or underscores: {0!r}'
+        raise ValueError(msg.format(name))
+    return 'dataset_{0}'.format(name)
+
+
+def _parse_address(address):
+    """Return a (host, port) tuple for an *address* given as a tuple
+    or as a 'host:port' string.
+    """
+    if isinstance(address, string_types):
+        host, _, port = address.rpartition(':')
+        return (host or 'localhost', int(port))
+    host, port = address
+    return (host, int(port))
+
+
+def _normalize_authkey(authkey):
+    if authkey is None:
+        raise TypeError('an authkey is required to connect to workers')
+    if not isinstance(authkey, bytes):
+        authkey = authkey.encode('utf-8')
+    return authkey
+
+
+class RemoteWorker(object):
+    """Server that holds Selector tables by dataset name and answers
+    requests from :class:`RemoteSelector` clients.
+    """
+    commands = ('describe', 'load', 'append', 'create_index', 'execute')
+
+    def __init__(self):
+        self.datasets = {}  # Selectors by dataset name.
+
+    def _get_selector(self, name):
+        table = _dataset_table(name)
+        if name not in self.datasets:
+            self.datasets[name] = Selector(storage='memory')
+        return self.datasets[name], table
+
+    def describe(self, name):
+        """Return a tuple of ([(column, type), ...], max_rowid) for
+        the dataset *name*.
+        """
+        selector, table = self._get_selector(name)
+        cursor = selector._connection.cursor()
+        if not table_exists(cursor, table):
+            return [], 0  # <- EXIT!
+        cursor.execute('PRAGMA table_info({0})'.format(table))
+        columns = [(x[1], x[2]) for x in cursor.fetchall()]
+        cursor.execute('SELECT max(rowid) FROM {0}'.format(table))
+        return columns, (cursor.fetchone()[0] or 0)
+
+    def load(self, name, objs, args=(), kwds=None):
+        """Load *objs* (paths on the worker's host or picklable
+        reader-like objects) into the dataset *name*.
+        """
+        selector, table = self._get_selector(name)
+        selector.load_data(objs, *args, **(kwds or {}))
+        if selector._table_name and selector._table_name != table:
+            cursor = selector._connection.cursor()
+            cursor.execute('ALTER TABLE {0} RENAME TO {1}'.format(
+                selector._table_name, table))
+            selector._table = table
+        return self.describe(name)
+
+    def append(self, name, columns, rows):
+        """Insert *rows* of (rowid, value1, value2, ...) into the
+        dataset *name*, adding any of the (column, type) pairs in
+        *columns* that the table is missing.
+        """
+        selector, table = self._get_selector(name)
+        names = [x[0] for x in columns]
+        types = [x[1] for x in columns]
+        cursor = selector._connection.cursor()
+        with savepoint(cursor):
+            if table_exists(cursor, table):
+                alter_table(cursor, table, names, types=types)
+            else:
+                create_table(cursor, table, names, types=types)
+                selector._table = table
+            if rows:
+                insert_records(cursor, table, ['rowid'] + names, rows)
+        selector._query_cache.clear()
+        selector._clear_schema_cache()
+
+    def create_index(self, name, columns):
+        selector, _ = self._get_selector(name)
+        selector.create_index(*columns)
+
+    def execute(self, name, statement, params, functions):
+        """Run *statement* and generate its rows in batches."""
+        selector, _ = self._get_selector(name)
+        connection = selector._connection
+        for func_name, func in functions:
+            connection.create_function(func_name, 1, func)
+        cursor = connection.execute(statement, params)
+        batch = cursor.fetchmany(_batch_size)
+        while batch:
+            yield batch
+            batch = cursor.fetchmany(_batch_size)
+
+    def handle(self, request):
+        """Answer a *request* and return the list of messages to send
+        back to the client.
+        """
+        command, args = request[0], request[1:]
+        try:
+            if command not in self.commands:
+                raise ValueError('unknown command: {0!r}'.format(command))
+            if command == 'execute':
+                messages = [('rows', batch) for batch in self.execute(*args)]
+                messages.append(('done', None))
+            else:
+                messages = [('done', getattr(self, command)(*args))]
+        except Exception as error:
+            messages = [('error', error)]
+        return messages
+
+    def serve_forever(self, listener):
+        """Accept client connections from *listener* and answer their
+        requests. Requests are answered, in the order received, by the
+        calling thread. Each client is read by a thread of its own and
+        sent its replies by another, so a client that reads its rows
+        slowly does not hold up the others (the rows of a reply are
+        read from SQLite in full before they are sent).
+        """
+        requests = queue.Queue()
+
+        def send(connection, replies):
+            for messages in iter(replies.get, None):  # <- None when disconnected.
+                try:
+                    for message in messages:
+                        try:
+                            data = pickle.dumps(message)
+                        except Exception as error:  # <- Could not be pickled.
+                            data = pickle.dumps(('error', RuntimeError(repr(error))))
+                        connection.send_bytes(data)
+                except (IOError, OSError):
+                    pass  # <- Client went away mid-response.
+            connection.close()
+
+        def receive(connection):
+            replies = queue.Queue()
+            thread = threading.Thread(target=send, args=(connection, replies))
+            thread.daemon = True
+            thread.start()
+            while True:
+                try:
+                    request = connection.recv()
+                except (EOFError, IOError, OSError):
+                    request = None
+                requests.put((replies, request))
+                if request is None:
+                    return  # <- EXIT!
+
+        def accept():
+            while True:
+                try:
+                    connection = listener.accept()
+                except (AuthenticationError, EOFError, IOError, OSError):
+                    continue  # <- Failed handshake.
+                thread = threading.Thread(target=receive, args=(connection,))
+                thread.daemon = True
+                thread.start()
+
+        thread = threading.Thread(target=accept)
+        thread.daemon = True
+        thread.start()
+
+        while True:
+            replies, request = requests.get()
+            if request is None:
+                replies.put(None)  # <- Sender closes the connection.
+            else:
+                replies.put(self.handle(request))
+
+
+class RemoteSelector(ShardedSelector):
+    """A :class:`ShardedSelector` whose shards are held by worker
+    servers, possibly on other hosts. Start a worker on each host
+    (any sources given are loaded into the worker right away)::
+
+        python -m datatest.worker --port 7001 --authkey secret data/*.csv
+
+    Then connect to the workers with their *addresses* (as
+    ``(host, port)`` tuples or ``'host:port'`` strings) and the same
+    *authkey*::
+
+        select = datatest.RemoteSelector(
+            addresses=['host1:7001', 'host2:7001'],
+            authkey='secret',
+        )
+
+    Data loaded by the RemoteSelector itself is split across the
+    workers like a ShardedSelector's shards (in turn, or by a hash of
+    *shard_key*) and keeps its load order. Rows that the workers
+    loaded themselves are only ordered within each worker. Each
+    worker can hold several datasets; use *name* to choose one
+    (defaults to ``'default'``).
+
+    Where-clause functions are run by the workers, so they must be
+    picklable and importable on the worker's host. Because the
+    workers unpickle the requests they receive, only share the
+    *authkey* with trusted clients.
+    """
+    def __init__(self, objs=None, *args, **kwds):
+        """Initialize self."""
+        if kwds.get('partitioned'):
+            raise ValueError('RemoteSelector does not support partitioned=True')
+        addresses = kwds.pop('addresses', None)
+        if not addresses:
+            raise TypeError('RemoteSelector requires a list of worker addresses')
+        authkey = _normalize_authkey(kwds.pop('authkey', None))
+        self._dataset = kwds.pop('name', 'default')
+        self._remote_table = _dataset_table(self._dataset)
+        self._shard_key = kwds.pop('shard_key', None)
+        self._shard_functions = {}  # User-defined functions by name.
+        self._row_offset = 0  # Rowid offset for the next distributed rows.
+        self._schema_synced = False
+        self._streams = {}  # Results still being received, by connection.
+        self._remote_connections = [
+            Client(_parse_address(x), authkey=authkey) for x in addresses]
+
+        # Skip ShardedSelector.__init__(), there are no local shards.
+        super(ShardedSelector, self).__init__(objs, *args, **kwds)
+        self._sync_schema()
+
+    def _request(self, connection, *request):
+        """Send *request* to a worker and return its response."""
+        _ready_connection(connection, self._streams)
+        connection.send(request)
+        status, value = connection.recv()
+        if status == 'error':
+            raise value
+        return value
+
+    def _sync_schema(self):
+        """Create the local table (used to build queries) with the
+        columns of all workers, and add any missing columns to the
+        workers' tables.
+        """
+        if self._schema_synced:
+            return  # <- EXIT!
+
+        descriptions = [self._request(x, 'describe', self._dataset)
+                        for x in self._remote_connections]
+        columns = []
+        for worker_columns, max_rowid in descriptions:
+            for column in worker_columns:
+                if column[0] not in [x[0] for x in columns]:
+                    columns.append(column)
+            self._row_offset = max(self._row_offset, max_rowid)
+
+        if columns:
+            cursor = self._connection.cursor()
+            table = self._remote_table
+            create_table(cursor, table, [x[0] for x in columns],
+                         types=[x[1] for x in columns])
+            self._table = table
+            for connection, (worker_columns, _) in \
+                    zip(self._remote_connections, descriptions):
+                if len(worker_columns) < len(columns):
+                    self._request(connection, 'append', self._dataset, columns, [])
+        self._schema_synced = True
+
+    def _load_obj_list(self, obj_list, args, kwds):
+        self._sync_schema()
+        super(RemoteSelector, self)._load_obj_list(obj_list, args, kwds)
+
+    def _distribute(self):
+        """Send rows from the Selector's own table to the workers (the
+        table keeps its columns but no rows).
+        """
+        table = self._table_name
+        if not table:
+            return  # <- EXIT!
+        if table != self._remote_table:  # <- First load without remote data.
+            cursor = self._connection.cursor()
+            cursor.execute('ALTER TABLE {0} RENAME TO {1}'.format(
+                table, self._remote_table))
+            self._table = table = self._remote_table
+
+        connection = self._connection
+        connection.create_function('SHARDHASH', 1, _shard_hash)
+        cursor = connection.cursor()
+        cursor.execute('PRAGMA table_info({0})'.format(table))
+        columns = [(x[1], x[2]) for x in cursor.fetchall()]
+        cursor.execute('SELECT max(rowid) FROM {0}'.format(table))
+        max_rowid = cursor.fetchone()[0] or 0
+
+        if self._shard_key:
+            self._assert_fields_exist([self._shard_key])
+            shard_expr = 'SHARDHASH({0})'.format(normalize_names(self._shard_key))
+        else:
+            shard_expr = 'rowid'
+        shard_count = len(self._remote_connections)
+        column_names = ', '.join(normalize_names([x[0] for x in columns]))
+
+        for index, remote in enumerate(self._remote_connections):
+            cursor.execute(
+                'SELECT rowid + ?, {0} FROM {1} WHERE {2} % ? = ?'.format(
+                    column_names, table, shard_expr),
+                (self._row_offset, shard_count, index),
+            )
+            batch = cursor.fetchmany(_batch_size)
+            self._request(remote, 'append', self._dataset, columns, batch)
+            while len(batch) == _batch_size:
+                batch = cursor.fetchmany(_batch_size)
+                if batch:
+                    self._request(remote, 'append', self._dataset, columns, batch)
+
+        cursor.execute('DELETE FROM {0}'.format(table))
+        self._row_offset += max_rowid
+
+    def create_index(self, *columns):
+        self._assert_fields_exist(columns)
+        if not self._table:
+            return  # <- EXIT!
+        for connection in self._remote_connections:
+            self._request(connection, 'create_index', self._dataset, columns)
+    create_index.__doc__ = Selector.create_index.__doc__
+
+    def _scatter(self, statement, params):
+        if not self._table:
+            return []  # <- EXIT!
+
+        names = set(_function_name_pattern.findall(statement))
+        functions = [(x, self._shard_functions[x]) for x in sorted(names)
+                     if x in self._shard_functions]
+        try:
+            pickle.dumps(functions)
+        except Exception:
+            raise TypeError('where-clause functions must be picklable to '
+                            'run on remote workers')
+
+        request = ('execute', self._dataset, statement, list(params), functions)
+        return _open_streams(self._remote_connections, request, self._streams)
+
+    def close(self):
+        """Close the connections to the workers (the workers keep
+        their data).
+        """
+        connections, self._remote_connections = \
+            getattr(self, '_remote_connections', []), []
+        self._streams = {}
+        for connection in connections:
+            try:
+                connection.send(None)
+            except (IOError, OSError):
+                pass
+            connection.close()
@@ -0,0 +1,553 @@
+# -*- coding: utf-8 -*-
+"""Selector that splits its rows across shard databases queried by
+worker processes.
+"""
+from __future__ import absolute_import
+from __future__ import division
+import collections
+import heapq
+import multiprocessing
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import weakref
+import zlib
+from numbers import Integral
+
+from .._compatibility.builtins import *
+from .._compatibility.collections.abc import Mapping
+from .._compatibility.collections.abc import Set
+from .._load.temptable import drop_table
+from .._load.temptable import new_table_name
+from .._load.temptable import normalize_names
+from .._load.temptable import savepoint
+from .query import DictItems
+from .query import Result
+from .query import Selector
+from .query import _connect
+from .query import _max_integer
+from .query import _parse_columns
+from .query import _sqlite_sortkey
+
+
+_batch_size = 1024  # Rows per message when streaming rows from a shard.
+_shard_schema = 'datatest_shard'  # Schema name used when attaching a shard.
+_function_name_pattern = re.compile(r'\b(FUNC\d+)\(')
+_unsupported_options = ('query_cache', 'auto_index', 'timeout', 'progress')
+
+
+def _shard_hash(value):
+    """Return a stable hash of *value* for assigning rows to shards."""
+    return zlib.crc32(repr(value).encode('utf-8')) & 0xffffffff
+
+
+def _shard_worker(path, connection):
+    """Answer (statement, params, functions) requests received over
+    *connection* using the shard database at *path*. The rows of each
+    result are sent in ('rows', batch) messages followed by one
+    ('done', None) or ('error', exception) message. A request of None
+    stops the worker.
+    """
+    database = _connect(path)
+    database.execute('PRAGMA query_only=ON')
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+
+        statement, params, functions = request
+        try:
+            for name, func in functions:
+                database.create_function(name, 1, func)
+            cursor = database.execute(statement, params)
+            batch = cursor.fetchmany(_batch_size)
+            while batch:
+                connection.send(('rows', batch))
+                batch = cursor.fetchmany(_batch_size)
+            response = ('done', None)
+        except Exception as error:
+            response = ('error', error)
+
+        try:
+            connection.send(response)
+        except Exception as error:  # <- Exception could not be pickled.
+            connection.send(('error', RuntimeError(repr(error))))
+    database.close()
+    connection.close()
+
+
+def _iter_local_shard(path, statement, params, functions):
+    """Run *statement* on the shard database at *path* in the current
+    process and generate its rows.
+    """
+    connection = _connect(path)  # <- Own connection, results are read lazily.
+    try:
+        for name, func in functions:
+            connection.create_function(name, 1, func)
+        for row in connection.execute(statement, params):
+            yield row
+    finally:
+        connection.close()
+
+
+class _ShardStream(object):
+    """Iterable of the rows sent over *connection* in reply to one
+    request: ('rows', batch) messages followed by ('done', None) or
+    ('error', exception). Batches are received as the rows are
+    iterated. Streams still being read are tracked in *pending* (a
+    dictionary of weak references by connection).
+    """
+    def __init__(self, connection, pending):
+        self._connection = connection
+        self._pending = pending
+        self._batches = collections.deque()
+        self._error = None
+        pending[connection] = weakref.ref(self)
+
+    def _receive(self):
+        """Return the next batch of rows or None when finished."""
+        status, value = self._connection.recv()
+        if status == 'rows':
+            return value
+        del self._pending[self._connection]
+        self._connection = None
+        if status == 'error':
+            raise value
+        return None
+
+    def spool(self):
+        """Receive any remaining batches into memory so the connection
+        can be used for another request.
+        """
+        try:
+            while self._connection is not None:
+                batch = self._receive()
+                if batch:
+                    self._batches.append(batch)
+        except Exception as error:
+            self._error = error  # <- Raised when iteration reaches it.
+
+    def __iter__(self):
+        while True:
+            if self._batches:
+                batch = self._batches.popleft()
+            elif self._error is not None:
+                error, self._error = self._error, None
+                raise error
+            elif self._connection is None:
+                return  # <- EXIT!
+            else:
+                batch = self._receive()
+                if batch is None:
+                    return  # <- EXIT!
+            for row in batch:
+                yield row
+
+
+def _ready_connection(connection, pending):
+    """Finish receiving any result still pending on *connection* so it
+    can be used for another request. The rows of a result that is
+    still in use are kept in memory, the rows of an abandoned result
+    are discarded.
+    """
+    reference = pending.get(connection)
+    if reference is None:
+        return  # <- EXIT!
+    stream = reference()
+    if stream is not None:
+        stream.spool()
+    else:
+        while connection.recv()[0] == 'rows':
+            pass
+        del pending[connection]
+
+
+def _open_streams(connections, request, pending):
+    """Send *request* over each of the *connections* and return a
+    list of _ShardStream objects to read the replies.
+    """
+    for connection in connections:
+        _ready_connection(connection, pending)
+    for connection in connections:
+        connection.send(request)
+    return [_ShardStream(connection, pending) for connection in connections]
+
+
+def _add_values(values):
+    """Add partial SUM or COUNT values (ignoring NULLs)."""
+    values = [x for x in values if x is not None]
+    if not values:
+        return None
+    total = sum(values)
+    if isinstance(total, Integral) and abs(total) > _max_integer:
+        raise OverflowError('integer overflow')
+    return total
+
+
+def _merge_values(sqlfunc, values):
+    """Combine the partial aggregate *values* from each shard."""
+    if sqlfunc == 'COUNT':
+        return _add_values(values) or 0
+    if sqlfunc == 'SUM':
+        return _add_values(values)
+    if sqlfunc == 'AVG':
+        total = _add_values([x for x, _ in values])
+        count = _add_values([n for _, n in values])
+        return (total / count) if count else None
+
+    values = [x for x in values if x is not None]  # MIN or MAX.
+    if not values:
+        return None
+    if sqlfunc == 'MIN':
+        return min(values, key=_sqlite_sortkey)
+    return max(values, key=_sqlite_sortkey)
+
+
+class ShardedSelector(Selector):
+    """A Selector that splits its rows across several shard databases
+    and answers queries with one worker process per shard. It accepts
+    the same arguments as :class:`Selector` and works with the same
+    :class:`Query` methods::
+
+        select = datatest.ShardedSelector('*.csv', shards=8)
+
+    Rows are assigned to *shards* databases (defaults to the number
+    of CPUs) in turn, or by a hash of the *shard_key* column when one
+    is given. Each query runs on all shards at the same time and the
+    partial results are merged: sums and counts are added, minimums
+    and maximums are compared, averages are rebuilt from sums and
+    counts, and groups are merged by key. Results are returned in the
+    same order as a :class:`Selector` would return them.
+
+    Where-clause functions are sent to the workers, so they must be
+    picklable (e.g., defined at the module level). When they are not,
+    the shards are queried one after another in the current process.
+
+    The shard databases are stored in a temporary directory that is
+    removed when :meth:`close` is called.
+    """
+    def __init__(self, objs=None, *args, **kwds):
+        """Initialize self."""
+        if kwds.get('partitioned'):
+            raise ValueError('ShardedSelector does not support partitioned=True')
+        for name in _unsupported_options:
+            if kwds.get(name):
+                msg = 'ShardedSelector does not support the {0!r} option'
+                raise ValueError(msg.format(name))
+        shard_count = kwds.pop('shards', None) or multiprocessing.cpu_count()
+        self._shard_key = kwds.pop('shard_key', None)
+        self._shard_dir = tempfile.mkdtemp(prefix='datatest-shards-')
+        self._shard_paths = [os.path.join(self._shard_dir, 'shard{0}.sqlite'.format(i))
+                             for i in range(shard_count)]
+        self._owner_pid = os.getpid()
+        self._row_offset = 0  # Rowid offset for the next distributed rows.
+        self._workers = None  # List of (process, connection) tuples.
+        self._workers_pid = None
+        self._shard_functions = {}  # User-defined functions by name.
+        self._streams = {}  # Results still being received, by connection.
+        super(ShardedSelector, self).__init__(objs, *args, **kwds)
+
+    def _load_obj_list(self, obj_list, args, kwds):
+        super(ShardedSelector, self)._load_obj_list(obj_list, args, kwds)
+        self._distribute()
+
+    def _distribute(self):
+        """Move rows from the Selector's own table into the shard
+        databases (the table keeps its columns but no rows).
+        """
+        table = self._table_name
+        if not table:
+            return  # <- EXIT!
+
+        connection = self._connection
+        connection.create_function('SHARDHASH', 1, _shard_hash)
+        cursor = connection.cursor()
+        cursor.execute('PRAGMA table_info({0})'.format(table))
+        table_info = cursor.fetchall()
+        cursor.execute('SELECT max(rowid) FROM {0}'.format(table))
+        max_rowid = cursor.fetchone()[0] or 0
+
+        if self._shard_key:
+            self._assert_fields_exist([self._shard_key])
+            shard_expr = 'SHARDHASH({0})'.format(normalize_names(self._shard_key))
+        else:
+            shard_expr = 'rowid'
+        shard_count = len(self._shard_paths)
+        columns = ', '.join(normalize_names([x[1] for x in table_info]))
+
+        for index, path in enumerate(self._shard_paths):
+            cursor.execute('ATTACH DATABASE ? AS {0}'.format(_shard_schema), (path,))
+            try:
+                with savepoint(cursor):
+                    self._update_shard_table(cursor, table, table_info)
+                    cursor.execute(
+                        'INSERT INTO {0}.{1} (rowid, {2}) '
+                        'SELECT rowid + ?, {2} FROM {1} '
+                        'WHERE {3} % ? = ?'.format(_shard_schema, table, columns, shard_expr),
+                        (self._row_offset, shard_count, index),
+                    )
+            finally:
+                cursor.execute('DETACH DATABASE {0}'.format(_shard_schema))
+
+        cursor.execute('DELETE FROM {0}'.format(table))
+        self._row_offset += max_rowid
+
+    @staticmethod
+    def _update_shard_table(cursor, table, table_info):
+        """Create *table* in the attached shard (or add any columns
+        it is missing) to match *table_info*.
+        """
+        def column_def(info):
+            _, name, type_, _, default, _ = info
+            column_def = normalize_names(name)
+            if type_:
+                column_def = '{0} {1}'.format(column_def, type_)
+            if default is not None:
+                column_def = '{0} DEFAULT {1}'.format(column_def, default)
+            return column_def
+
+        cursor.execute('PRAGMA {0}.table_info({1})'.format(_shard_schema, table))
+        existing = set(x[1] for x in cursor.fetchall())
+        if not existing:
+            cursor.execute('CREATE TABLE {0}.{1} ({2})'.format(
+                _shard_schema, table, ', '.join(column_def(x) for x in table_info)))
+            return  # <- EXIT!
+
+        for info in table_info:
+            if info[1] not in existing:
+                cursor.execute('ALTER TABLE {0}.{1} ADD COLUMN {2}'.format(
+                    _shard_schema, table, column_def(info)))
+
+    def create_index(self, *columns):
+        self._assert_fields_exist(columns)
+        if not self._table:
+            return  # <- EXIT!
+        whitelist = lambda col: ''.join(x for x in col if x.isalnum())
+        idx_name = 'idx_{0}_{1}'.format(
+            self._table, '_'.join(whitelist(col) for col in columns))
+        columns = ', '.join(self._escape_field_name(x) for x in columns)
+
+        cursor = self._connection.cursor()
+        for path in self._shard_paths:
+            cursor.execute('ATTACH DATABASE ? AS {0}'.format(_shard_schema), (path,))
+            try:
+                cursor.execute('CREATE INDEX IF NOT EXISTS {0}.{1} ON {2} ({3})'.format(
+                    _shard_schema, idx_name, self._table, columns))
+            finally:
+                cursor.execute('DETACH DATABASE {0}'.format(_shard_schema))
+    create_index.__doc__ = Selector.create_index.__doc__
+
+    def _create_user_function(self, func, func_key=None):
+        if not func_key:
+            try:
+                func_key = hash(func)
+            except TypeError:
+                func_key = id(func)
+        super(ShardedSelector, self)._create_user_function(func, func_key)
+        self._shard_functions[self._user_function_dict[func_key]] = func
+
+    def _get_workers(self):
+        """Return the list of worker (process, connection) tuples,
+        starting the workers if needed.
+        """
+        if self._workers is None or self._workers_pid != os.getpid():
+            workers = []
+            for path in self._shard_paths:
+                parent_end, child_end = multiprocessing.Pipe()
+                process = multiprocessing.Process(
+                    target=_shard_worker, args=(path, child_end))
+                process.daemon = True
+                process.start()
+                child_end.close()
+                workers.append((process, parent_end))
+            self._workers = workers
+            self._workers_pid = os.getpid()
+            self._streams = {}
+        return self._workers
+
+    def _scatter(self, statement, params):
+        """Run *statement* on every shard and return a list of row
+        iterables (one for each shard). Rows are received from the
+        shards as they are iterated.
+        """
+        if not self._table:
+            return []  # <- EXIT!
+
+        names = set(_function_name_pattern.findall(statement))
+        functions = [(x, self._shard_functions[x]) for x in sorted(names)
+                     if x in self._shard_functions]
+        try:
+            pickle.dumps(functions)
+        except Exception:  # Query shards in the current process.
+            return [_iter_local_shard(x, statement, params, functions)
+                    for x in self._shard_paths]  # <- EXIT!
+
+        connections = [connection for _, connection in self._get_workers()]
+        request = (statement, list(params), functions)
+        return _open_streams(connections, request, self._streams)
+
+    def _gather(self, statement, params):
+        """Run *statement* on every shard and return a list of row
+        lists (one for each shard).
+        """
+        return [list(rows) for rows in self._scatter(statement, params)]
+
+    def _select_rows(self, columns, where, distinct):
+        key, value = _parse_columns(columns)
+        key_columns, value_columns = self._parse_key_value(key, value)
+        all_columns = ', '.join(key_columns + value_columns)
+
+        if distinct:  # Get first rowid of each distinct row.
+            select_clause = '{0}, min(rowid)'.format(all_columns)
+            trailing_clause = 'GROUP BY {0}'.format(all_columns)
+        else:  # Each shard returns its rows in result order.
+            select_clause = '{0}, rowid'.format(all_columns)
+            trailing_clause = 'ORDER BY {0}'.format(', '.join(key_columns + ('rowid',)))
+        shard_rows = self._scatter(*self._build_query(select_clause, trailing_clause, **where))
+
+        key_width = len(key_columns)
+        if key_width:
+            sort_key = lambda row: [_sqlite_sortkey(x) for x in row[:key_width]] + [row[-1]]
+        else:
+            sort_key = lambda row: row[-1]
+
+        if distinct:
+            first_rowids = {}
+            for rows in shard_rows:
+                for row in rows:
+                    values, rowid = row[:-1], row[-1]
+                    if values not in first_rowids or rowid < first_rowids[values]:
+                        first_rowids[values] = rowid
+            rows = [values + (rowid,) for values, rowid in first_rowids.items()]
+            rows.sort(key=sort_key)
+        else:
+            def decorate(index, rows):  # <- Index breaks ties without comparing rows.
+                return ((sort_key(row), index, row) for row in rows)
+            rows = (row for _, _, row in heapq.merge(
+                *[decorate(i, x) for i, x in enumerate(shard_rows)]))
+        return self._format_results(columns, (row[:-1] for row in rows))
+
+    def _select(self, columns, **where):
+        key, value = _parse_columns(columns)
+        return self._select_rows(columns, where, isinstance(value, Set))
+
+    def _select_distinct(self, columns, **where):
+        return self._select_rows(columns, where, True)
+
+    def _select_aggregate(self, sqlfunc, columns, **where):
+        sqlfunc = sqlfunc.upper()
+        key, value = _parse_columns(columns)
+        key_columns, value_columns = self._parse_key_value(key, value)
+        key_width = len(key_columns)
+
+        key_names, _ = self._parse_key_value_names(key, value)
+        if self._shard_key and self._shard_key in key_names:
+            # Each group is entirely within one shard.
+            _, select_clause, group_by = \
+                self._select_aggregate_clauses(sqlfunc, columns)
+            shard_rows = self._gather(*self._build_query(select_clause, group_by, **where))
+            rows = [row for rows in shard_rows for row in rows]
+            rows.sort(key=lambda row: [_sqlite_sortkey(x) for x in row[:key_width]])
+        elif isinstance(value, Set):
+            rows = self._aggregate_distinct(sqlfunc, columns, where)
+        else:
+            if sqlfunc == 'AVG':
+                partials = ['SUM({0}), COUNT({0})'.format(x) for x in value_columns]
+            else:
+                partials = ['{0}({1})'.format(sqlfunc, x) for x in value_columns]
+            select_clause = ', '.join(key_columns + tuple(partials))
+            group_by = 'GROUP BY {0}'.format(', '.join(key_columns)) if key else None
+            shard_rows = self._gather(*self._build_query(select_clause, group_by, **where))
+
+            groups = {}
+            for rows in shard_rows:
+                for row in rows:
+                    values = row[key_width:]
+                    if sqlfunc == 'AVG':
+                        values = list(zip(values[0::2], values[1::2]))
+                    groups.setdefault(row[:key_width], []).append(values)
+            if not key and not groups:
+                groups[()] = []  # <- Always one row without a key.
+
+            rows = []
+            for group_key, partial_rows in groups.items():
+                merged = [_merge_values(sqlfunc, [x[i] for x in partial_rows])
+                          for i in range(len(value_columns))]
+                rows.append(group_key + tuple(merged))
+            rows.sort(key=lambda row: [_sqlite_sortkey(x) for x in row[:key_width]])
+
+        results = self._format_results(columns, iter(rows))
+        if isinstance(columns, Mapping):
+            results = DictItems((k, next(v)) for k, v in results)
+            return Result(results, evaluation_type=dict)
+        return next(results)
+
+    def _aggregate_distinct(self, sqlfunc, columns, where):
+        """Return aggregate rows for a distinct aggregate (e.g.,
+        COUNT(DISTINCT x)). The distinct rows from each shard are
+        combined in a scratch table and aggregated by SQLite, since
+        the same value can appear in more than one shard.
+        """
+        key, value = _parse_columns(columns)
+        key_names, value_names = self._parse_key_value_names(key, value)
+        key_columns, value_columns = self._parse_key_value(key, value)
+        all_columns = ', '.join(key_columns + value_columns)
+        shard_rows = self._gather(*self._build_query(
+            'DISTINCT {0}'.format(all_columns), None, **where))
+
+        cursor = self._connection.cursor()
+        scratch_table = new_table_name(cursor)
+        names = normalize_names(key_names + value_names)
+        cursor.execute('CREATE TEMPORARY TABLE {0} ({1})'.format(
+            scratch_table, ', '.join(names)))
+        try:
+            statement = 'INSERT INTO {0} VALUES ({1})'.format(
+                scratch_table, ', '.join('?' * len(names)))
+            with savepoint(cursor):
+                for rows in shard_rows:
+                    cursor.executemany(statement, rows)
+            _, select_clause, group_by = \
+                self._select_aggregate_clauses(sqlfunc, columns)
+            statement = 'SELECT {0} FROM {1}'.format(select_clause, scratch_table)
+            if group_by:
+                statement = '{0}\n{1}'.format(statement, group_by)
+            cursor.execute(statement)
+            return cursor.fetchall()
+        finally:
+            drop_table(cursor, scratch_table)
+
+    def _get_sql_query(self, method_name, args, kwds):
+        return None  # <- Queries are split across shards.
+
+    def _unsupported(self, *args, **kwds):
+        raise TypeError('operation not supported by ShardedSelector')
+    sample = join = snapshot = _unsupported
+
+    @classmethod
+    def from_snapshot(cls, path, readonly=True, **kwds):
+        raise TypeError('operation not supported by ShardedSelector')
+
+    def close(self):
+        """Stop the worker processes and remove the shard databases."""
+        workers, self._workers = self._workers, None
+        if workers and self._workers_pid == os.getpid():
+            for process, connection in workers:
+                try:
+                    connection.send(None)
+                except (IOError, OSError):
+                    pass
+                connection.close()
+            for process, _ in workers:
+                process.join()
+        self._streams = {}
+
+        if self._owner_pid == os.getpid() and os.path.isdir(self._shard_dir):
+            shutil.rmtree(self._shard_dir, ignore_errors=True)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""Selector that answers queries by reading its sources directly."""
+from __future__ import absolute_import
+from __future__ import division
+import random
+import sqlite3
+from glob import glob
+from numbers import Number
+
+from .._compatibility.builtins import *
+from .._compatibility.collections.abc import Mapping
+from .._compatibility.collections.abc import Set
+from .._load.get_reader import get_reader
+from .._utils import exhaustible
+from .._utils import string_types
+from .query import DictItems
+from .query import Result
+from .query import Selector
+from .query import _get_match_function
+from .query import _get_sample_size
+from .query import _max_integer
+from .query import _parse_columns
+from .query import _sample_string
+from .query import _sqlite_sortkey
+
+try:
+    FileNotFoundError  # New in Python 3.3.
+except NameError:
+    FileNotFoundError = OSError
+
+
+_number_cache_size = 10000  # Number of text-to-number conversions to keep.
+
+
+class _Aggregate(object):
+    """Accumulate values for an SQLite aggregate function (SUM, AVG,
+    COUNT, MIN, or MAX). Values are converted to numbers with the
+    *to_number* function.
+    """
+    def __init__(self, sqlfunc, distinct, to_number):
+        self.sqlfunc = sqlfunc
+        self.seen = set() if distinct else None
+        self.to_number = to_number
+        self.count = 0
+        self.extreme = None
+        self.int_sum = 0
+        self.float_sum = 0.0
+        self.compensation = 0.0  # Kahan-Babuska-Neumaier summation.
+        self.is_int = True
+
+    def add(self, value):
+        if value is None:
+            return  # <- EXIT! (Aggregates skip NULL values.)
+        if self.seen is not None:
+            if value in self.seen:
+                return  # <- EXIT!
+            self.seen.add(value)
+
+        self.count += 1
+        sqlfunc = self.sqlfunc
+        if sqlfunc == 'MIN' or sqlfunc == 'MAX':
+            if self.count == 1:
+                self.extreme = value
+            else:
+                key, extreme_key = _sqlite_sortkey(value), _sqlite_sortkey(self.extreme)
+                if (sqlfunc == 'MIN' and key < extreme_key) \
+                        or (sqlfunc == 'MAX' and key > extreme_key):
+                    self.extreme = value
+        elif sqlfunc == 'SUM' or sqlfunc == 'AVG':
+            number = self.to_number(value)
+            if self.is_int and isinstance(number, int):
+                self.int_sum += number
+                return  # <- EXIT!
+            if self.is_int:
+                self.is_int = False
+                self._add_float(float(self.int_sum))
+            self._add_float(float(number))
+
+    def _add_float(self, number):
+        total = self.float_sum + number
+        if abs(self.float_sum) >= abs(number):
+            self.compensation += (self.float_sum - total) + number
+        else:
+            self.compensation += (number - total) + self.float_sum
+        self.float_sum = total
+
+    def result(self):
+        if self.sqlfunc == 'COUNT':
+            return self.count
+        if self.sqlfunc == 'MIN' or self.sqlfunc == 'MAX':
+            return self.extreme
+        if not self.count:
+            return None
+        if self.is_int:
+            if self.sqlfunc == 'AVG':
+                return self.int_sum / self.count
+            if abs(self.int_sum) > _max_integer:
+                raise OverflowError('integer overflow')
+            return self.int_sum
+        total = self.float_sum + self.compensation
+        if self.sqlfunc == 'AVG':
+            return total / self.count
+        return total
+
+
+class StreamingSelector(Selector):
+    """A Selector that runs queries directly over its data sources
+    in a single pass without loading them into a database. It accepts
+    the same arguments as :class:`Selector` and works with the same
+    :class:`Query` methods::
+
+        select = datatest.StreamingSelector('daily_extract.csv')
+
+    Each query reads the sources from start to finish. Aggregates and
+    distinct values are computed with hash tables, so memory scales
+    with the number of groups rather than the number of rows (queries
+    that return every row of a grouping hold those rows in memory).
+    Sources must be readable more than once--file paths or sequences
+    rather than iterators. A *converters* mapping can be given to
+    convert the values of selected columns as they are read.
+    """
+    def __init__(self, objs=None, *args, **kwds):
+        """Initialize self."""
+        self._sources = []  # List of (obj, args, kwds) tuples.
+        self._fieldnames = []
+        self._obj_strings = []  # Strings for repr().
+        self._numbers = {}  # Cache of text values converted to numbers.
+        self._number_connection = None
+        if objs:
+            try:
+                self.load_data(objs, *args, **kwds)
+            except FileNotFoundError:
+                __tracebackhide__ = True
+                raise
+
+    def load_data(self, objs, *args, **kwds):
+        """Add one or more data sources to the StreamingSelector. The
+        given *objs*, *\\*args*, and *\\*\\*kwds*, can be any values
+        supported by the :class:`Selector` class initialization. Only
+        the header row of each source is read.
+        """
+        if isinstance(objs, string_types):
+            obj_list = glob(objs)  # Get shell-style wildcard matches.
+            if not obj_list:
+                __tracebackhide__ = True
+                raise FileNotFoundError('no files matching {0!r}'.format(objs))
+        elif not isinstance(objs, list) \
+                or isinstance(objs[0], (list, tuple, dict)):  # Not a list or is a
+            obj_list = [objs]                                 # reader-like list.
+        else:
+            obj_list = objs
+
+        for obj in obj_list:
+            if not isinstance(obj, string_types) and exhaustible(obj):
+                msg = ('StreamingSelector sources must be readable more than '
+                       'once, got exhaustible {0!r}')
+                raise TypeError(msg.format(obj.__class__.__name__))
+
+        fieldnames = list(self._fieldnames)
+        sources = []
+        for obj in obj_list:
+            header = self._read_header(obj, args, kwds)
+            if header is None:
+                self._append_obj_string(obj)
+                continue
+            if len(set(header)) != len(header):
+                msg = 'duplicate column name in {0!r}: {1!r}'
+                raise ValueError(msg.format(obj, header))
+            for name in header:
+                if name not in fieldnames:
+                    fieldnames.append(name)
+            sources.append((obj, args, kwds))
+            self._append_obj_string(obj)
+
+        self._fieldnames = fieldnames
+        self._sources.extend(sources)
+
+    @staticmethod
+    def _get_reader(obj, args, kwds):
+        kwds = dict(kwds)
+        kwds.pop('converters', None)
+        return get_reader(obj, *args, **kwds)
+
+    def _read_header(self, obj, args, kwds):
+        """Return list of column names for *obj* or None if empty."""
+        reader = self._get_reader(obj, args, kwds)
+        try:
+            header = next(iter(reader), None)
+        finally:
+            close = getattr(reader, 'close', None)
+            if close:
+                close()
+        if header is None:
+            return None
+        return [str(name).strip() for name in header]
+
+    @property
+    def fieldnames(self):
+        """A list of field names used by the data sources."""
+        return list(self._fieldnames)
+
+    def _get_available_fields(self):
+        return set(self._fieldnames)
+
+    @property
+    def storage(self):
+        raise TypeError('StreamingSelector does not use storage')
+
+    def create_index(self, *columns):
+        raise TypeError('StreamingSelector does not support indexes')
+
+    def index_report(self):
+        raise TypeError('StreamingSelector does not support indexes')
+
+    def query_cache_info(self):
+        raise TypeError('StreamingSelector does not cache query results')
+
+    def join(self, other, on, how='inner', suffix='_right'):
+        raise TypeError('StreamingSelector does not support joins')
+
+    def snapshot(self, path):
+        raise TypeError('StreamingSelector does not support snapshots')
+
+    @classmethod
+    def from_snapshot(cls, path, readonly=True, **kwds):
+        raise TypeError('StreamingSelector does not support snapshots')
+
+    def refresh(self):
+        raise TypeError('StreamingSelector does not support partitions '
+                        '(sources are read again by every query)')
+
+    def drop_source(self, source):
+        raise TypeError('StreamingSelector does not support partitions')
+
+    def _get_sql_query(self, method_name, args, kwds):
+        return None  # <- Queries read the sources directly, not SQL.
+
+    def sample(self, n=None, fraction=None, seed=None):
+        """Return a new in-memory :class:`Selector` that contains a
+        random sample of rows--either *n* rows or a *fraction* of
+        them. When *n* is given, the sample is drawn in a single pass
+        with reservoir sampling. When *fraction* is given, the sources
+        are read twice (once to count the rows). The same *seed*
+        always selects the same rows from the same data.
+        """
+        _get_sample_size(0, n, fraction)  # <- Validate arguments.
+        fieldnames = self.fieldnames
+        rng = random.Random(seed)
+        rows = self._iter_rows(fieldnames, {})
+        if fraction is not None:  # Count the rows, then read the sources again.
+            row_count = sum(1 for _ in rows)
+            size = _get_sample_size(row_count, None, fraction)
+            positions = set(rng.sample(range(row_count), size))
+            rows = self._iter_rows(fieldnames, {})
+            sampled = [row for position, row in enumerate(rows)
+                       if position in positions]
+        else:
+            reservoir = []  # List of (position, row) pairs.
+            for position, row in enumerate(rows):
+                if position < n:
+                    reservoir.append((position, row))
+                else:
+                    index = rng.randint(0, position)
+                    if index < n:
+                        reservoir[index] = (position, row)
+            reservoir.sort()
+            sampled = [row for _, row in reservoir]
+            size = len(sampled)
+
+        new_selector = Selector(storage='memory')
+        if fieldnames:
+            new_selector.load_data([fieldnames] + sampled)
+            new_selector._obj_strings = [_sample_string(size, self._obj_strings)]
+        return new_selector
+
+    def _iter_rows(self, columns, where):
+        """Return a generator of tuples containing values for the given
+        *columns* from rows that match the *where* predicates.
+        """
+        matchers = [(k, _get_match_function(v)) for k, v in where.items()]
+        names = list(columns) + [k for k, _ in matchers]
+        width = len(columns)
+        for obj, args, kwds in self._sources:
+            converters = kwds.get('converters') or {}
+            reader = iter(self._get_reader(obj, args, kwds))
+            header = [str(name).strip() for name in next(reader)]
+            positions = [header.index(x) if x in header else None for x in names]
+            funcs = [converters.get(x) for x in names]
+            for row in reader:
+                values = []
+                for position, func in zip(positions, funcs):
+                    if position is None or position >= len(row):
+                        value = ''
+                    else:
+                        value = row[position]
+                        if func and value is not None and value != '':
+                            value = func(value)
+                    values.append(value)
+
+                if all(match(x) for (_, match), x in zip(matchers, values[width:])):
+                    yield tuple(values[:width])
+
+    @staticmethod
+    def _sort_rows(rows, key_width):
+        return sorted(
+            rows,
+            key=lambda row: [_sqlite_sortkey(x) for x in row[:key_width]],
+        )
+
+    def _select_rows(self, columns, where, distinct):
+        key, value = _parse_columns(columns)
+        key_columns, value_columns = self._parse_key_value_names(key, value)
+        rows = self._iter_rows(key_columns + value_columns, where)
+
+        if distinct:
+            rows = self._distinct(rows)
+        if key:
+            rows = self._sort_rows(rows, len(key_columns))
+        return self._format_results(columns, iter(rows))
+
+    @staticmethod
+    def _distinct(rows):
+        seen = set()
+        for row in rows:
+            if row not in seen:
+                seen.add(row)
+                yield row
+
+    def _select(self, columns, **where):
+        key, value = _parse_columns(columns)
+        return self._select_rows(columns, where, isinstance(value, Set))
+
+    def _select_distinct(self, columns, **where):
+        return self._select_rows(columns, where, True)
+
+    def _to_number(self, value):
+        """Convert *value* to a number the same way as SQLite's sum()
+        function (e.g., '10' becomes 10, '2.5x' becomes 2.5, and
+        'abc' becomes 0.0).
+        """
+        if isinstance(value, Number) and not isinstance(value, bool):
+            return value
+
+        try:
+            return self._numbers[value]
+        except KeyError:
+            pass
+
+        if self._number_connection is None:
+            self._number_connection = sqlite3.connect(
+                ':memory:', check_same_thread=False)
+        cursor = self._number_connection.execute('SELECT sum(?)', (value,))
+        number = cursor.fetchone()[0]
+        if len(self._numbers) >= _number_cache_size:
+            self._numbers.clear()
+        self._numbers[value] = number
+        return number
+
+    def _select_aggregate(self, sqlfunc, columns, **where):
+        sqlfunc = sqlfunc.upper()
+        key, value = _parse_columns(columns)
+        key_columns, value_columns = self._parse_key_value_names(key, value)
+        distinct = isinstance(value, Set)
+        key_width = len(key_columns)
+
+        def new_group():
+            return [_Aggregate(sqlfunc, distinct, self._to_number)
+                    for _ in value_columns]
+
+        groups = {}
+        if not key:
+            groups[()] = new_group()  # <- Always one row without a key.
+        for row in self._iter_rows(key_columns + value_columns, where):
+            group_key = row[:key_width]
+            aggregates = groups.get(group_key)
+            if aggregates is None:
+                aggregates = groups[group_key] = new_group()
+            for aggregate, x in zip(aggregates, row[key_width:]):
+                aggregate.add(x)
+
+        rows = [k + tuple(x.result() for x in v) for k, v in groups.items()]
+        rows = self._sort_rows(rows, key_width)
+        results = self._format_results(columns, iter(rows))
+
+        if isinstance(columns, Mapping):
+            results = DictItems((k, next(v)) for k, v in results)
+            return Result(results, evaluation_type=dict)
+        return next(results)
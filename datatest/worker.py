@@ -0,0 +1,59 @@
+"""Worker server for RemoteSelector.
+
+Start a worker that loads the given sources and listens on a port::
+
+    python -m datatest.worker --port 7001 --authkey secret data/*.csv
+
+Once it is ready, the worker prints the address it is listening on.
+"""
+import os as _os
+import sys as _sys
+from optparse import OptionParser as _OptionParser
+from multiprocessing.connection import Listener as _Listener
+
+from datatest._query.remote import RemoteWorker
+from datatest._query.remote import _dataset_table
+from datatest._query.remote import _normalize_authkey
+
+
+def main(argv=None):
+    parser = _OptionParser(
+        usage='%prog [options] [SOURCE ...]',
+        description='Serve Selector data to RemoteSelector clients.',
+    )
+    parser.add_option('--host', default='localhost',
+                      help='interface to listen on (default: %default)')
+    parser.add_option('--port', type='int', default=0,
+                      help='port to listen on (default: any free port)')
+    parser.add_option('--authkey', default=_os.environ.get('DATATEST_AUTHKEY'),
+                      help='shared key used to authenticate clients '
+                           '(default: DATATEST_AUTHKEY environment variable)')
+    parser.add_option('--name', default='default',
+                      help='dataset name for the given sources (default: %default)')
+    options, sources = parser.parse_args(argv)
+    if not options.authkey:
+        parser.error('an authkey is required (use --authkey or DATATEST_AUTHKEY)')
+    try:
+        _dataset_table(options.name)
+    except ValueError as error:
+        parser.error(str(error))
+
+    worker = RemoteWorker()
+    if sources:
+        worker.load(options.name, sources)
+
+    authkey = _normalize_authkey(options.authkey)
+    listener = _Listener((options.host, options.port), authkey=authkey)
+    host, port = listener.address
+    _sys.stdout.write('listening on {0}:{1}\n'.format(host, port))
+    _sys.stdout.flush()
+    try:
+        worker.serve_forever(listener)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sqlite3
+import tempfile
+from . import _unittest as unittest
+
+from datatest._load.cache import get_fingerprint
+from datatest._load.cache import get_cache_file
+from datatest._load.cache import read_cache
+from datatest._load.cache import write_cache
+from datatest._load.temptable import table_exists
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'example.csv')
+        with open(self.path, 'wb') as fh:
+            fh.write(b'A,B\nx,1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_fingerprint(self):
+        path, size, mtime, digest = get_fingerprint(self.path)
+        self.assertEqual(path, os.path.abspath(self.path))
+        self.assertEqual(size, 8)
+        self.assertEqual(mtime, os.stat(self.path).st_mtime)
+        self.assertIsNone(digest)
+
+    def test_content_hash(self):
+        digest = get_fingerprint(self.path, content_hash=True)[3]
+        self.assertEqual(digest, '777f9bfdaac6256e4a717f30799e3484d9541256')
+
+    def test_cache_file(self):
+        cache_file1 = get_cache_file(self.temp_dir, self.path)
+        cache_file2 = get_cache_file(self.temp_dir, self.path, kwds={'encoding': 'utf-8'})
+        self.assertEqual(os.path.dirname(cache_file1), self.temp_dir)
+        self.assertTrue(cache_file1.endswith('.sqlite'))
+        self.assertNotEqual(cache_file1, cache_file2)
+
+
+class TestReadWriteCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.temp_dir, 'cache.sqlite')
+
+        connection = sqlite3.connect(':memory:')
+        connection.isolation_level = None
+        self.cursor = connection.cursor()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_missing_cache_file(self):
+        fingerprint = ('example.csv', 8, 1.5, None)
+        self.assertFalse(read_cache(self.cursor, 'tbl', self.cache_file, fingerprint))
+
+    def test_roundtrip(self):
+        self.cursor.execute('CREATE TEMPORARY TABLE source ("A", "B")')
+        self.cursor.execute("INSERT INTO source VALUES ('x', '1')")
+        fingerprint = ('example.csv', 8, 1.5, None)
+        write_cache(self.cursor, 'source', self.cache_file, fingerprint)
+
+        self.assertTrue(read_cache(self.cursor, 'tbl', self.cache_file, fingerprint))
+        self.cursor.execute('SELECT * FROM tbl')
+        self.assertEqual(self.cursor.fetchall(), [('x', '1')])
+
+    def test_stale_fingerprint(self):
+        self.cursor.execute('CREATE TEMPORARY TABLE source ("A", "B")')
+        write_cache(self.cursor, 'source', self.cache_file, ('example.csv', 8, 1.5, None))
+
+        fingerprint = ('example.csv', 8, 2.5, None)  # <- Different mtime.
+        self.assertFalse(read_cache(self.cursor, 'tbl', self.cache_file, fingerprint))
+        self.assertFalse(table_exists(self.cursor, 'tbl'))
+
+    def test_empty_source(self):
+        fingerprint = ('example.csv', 0, 1.5, None)
+        write_cache(self.cursor, 'missing_table', self.cache_file, fingerprint)
+        self.assertTrue(read_cache(self.cursor, 'tbl', self.cache_file, fingerprint))
+        self.assertFalse(table_exists(self.cursor, 'tbl'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import re
+from . import _unittest as unittest
+from datatest._compatibility.builtins import *
+from datatest._compatibility.collections import namedtuple
+from datatest._predicate import Predicate
+from datatest.validation import validate
+from datatest._query.query import Selector
+from datatest._query import columnar
+from datatest._query.columnar import ArraySelector
+from datatest._query.columnar import _ArrayColumn
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(not numpy, 'numpy not found')
+class TestArrayColumn(unittest.TestCase):
+    def test_sqlite_order(self):
+        column = _ArrayColumn(['b', 2, None, 1.5, 'a', b'x', 2])
+        self.assertEqual(column.uniques.tolist(), [None, 1.5, 2, 'a', 'b', b'x'])
+        self.assertEqual(column.codes.tolist(), [4, 2, 0, 1, 3, 5, 2])
+        self.assertEqual(column.null_code, 0)
+        self.assertIsNone(column.numbers)
+
+    def test_int_and_float_differ(self):
+        column = _ArrayColumn([1, 1.0])
+        self.assertEqual(len(column.uniques), 2)
+        self.assertEqual([type(x) for x in column.take([0, 1])], [int, float])
+
+    def test_numbers(self):
+        column = _ArrayColumn([3, 1, 2])
+        self.assertEqual(column.numbers.dtype, numpy.int64)
+        self.assertEqual(column.take([2, 0]), [2, 3])
+
+        column = _ArrayColumn([0.5, 1.5])
+        self.assertEqual(column.numbers.dtype, numpy.float64)
+
+        column = _ArrayColumn([1, 2 ** 64])  # <- Too large for int64.
+        self.assertIsNone(column.numbers)
+
+
+@unittest.skipIf(not numpy, 'numpy not found')
+class TestArraySelector(unittest.TestCase):
+    def setUp(self):
+        data = [
+            ['A', 'B', 'C', 'D'],
+            ['x', 'foo', 20, 1.5],
+            ['x', 'foo', 30, 2.5],
+            ['y', 'foo', 10, 0.25],
+            ['y', 'bar', 20, 4.0],
+            ['z', 'bar', 10, 8.0],
+            ['z', 'bar', 10, 0.5],
+        ]
+        self.select = Selector(data)
+        self.array_select = ArraySelector(data)
+
+    def assertSameResult(self, columns, method=None, **where):
+        expected = self.select(columns, **where)
+        actual = self.array_select(columns, **where)
+        if method:
+            expected = getattr(expected, method)()
+            actual = getattr(actual, method)()
+        self.assertEqual(actual.fetch(), expected.fetch())
+
+    def test_select(self):
+        self.assertSameResult('A')
+        self.assertSameResult(['A'])
+        self.assertSameResult(set(['A']))
+        self.assertSameResult(('A', 'C'))
+        self.assertSameResult({'A': 'C'})
+        self.assertSameResult({'B': 'A'})
+        self.assertSameResult({('A', 'B'): 'C'})
+        self.assertSameResult({'A': set(['B'])})
+        self.assertSameResult({'A': ('B', 'C')})
+
+        ntup = namedtuple('ntup', ['A', 'C'])
+        self.assertSameResult(ntup('A', 'C'))
+
+    def test_where(self):
+        self.assertSameResult('C', A='x')
+        self.assertSameResult('C', A=set(['x', 'z']))
+        self.assertSameResult('C', A='x', B='bar')
+        self.assertSameResult('A', C=lambda x: x > 15)
+        self.assertSameResult('A', B=re.compile('^b'))
+        self.assertSameResult('A', C=int)
+        self.assertSameResult('A', D=~Predicate(0.5))
+        self.assertSameResult({'A': 'D'}, B='foo')
+        self.assertSameResult('A', B='missing')
+
+    def test_distinct(self):
+        self.assertSameResult('A', 'distinct')
+        self.assertSameResult(('A', 'B'), 'distinct')
+        self.assertSameResult({'A': 'B'}, 'distinct')
+        self.assertSameResult({'A': 'C'}, 'distinct', B='bar')
+
+    def test_aggregate(self):
+        for method in ['sum', 'count', 'avg', 'min', 'max']:
+            self.assertSameResult('C', method)
+            self.assertSameResult('D', method)
+            self.assertSameResult(set(['C']), method)
+            self.assertSameResult({'A': 'C'}, method)
+            self.assertSameResult({'A': 'D'}, method)
+            self.assertSameResult({('A', 'B'): 'C'}, method)
+            self.assertSameResult({'B': set(['C'])}, method)
+            self.assertSameResult({'A': ('C', 'D')}, method)
+            self.assertSameResult('C', method, A='missing')
+            self.assertSameResult({'A': 'C'}, method, A='missing')
+
+    def test_text_aggregate(self):
+        # Text sums are computed by SQLite, counts and extremes are not.
+        for method in ['sum', 'count', 'avg', 'min', 'max']:
+            self.assertSameResult('B', method)
+            self.assertSameResult({'A': 'B'}, method)
+
+    def test_query_steps(self):
+        expected = self.select({'A': 'C'}).map(lambda x: x * 2).sum().fetch()
+        actual = self.array_select({'A': 'C'}).map(lambda x: x * 2).sum().fetch()
+        self.assertEqual(actual, expected)
+
+    def test_typed_where(self):
+        data = [['A', 'B', 'C', 'D'], ['x', '1', '2.5', 'a'], ['y', '2', '10', 'b']]
+        self.select = Selector(data, infer_types=True)
+        self.array_select = ArraySelector(data, infer_types=True)
+
+        self.assertSameResult('A', B='1')  # <- INTEGER column.
+        self.assertSameResult('A', B=1)
+        self.assertSameResult('A', B=1.0)
+        self.assertSameResult('A', C='10')  # <- REAL column.
+        self.assertSameResult('A', C='2.5')
+        self.assertSameResult('A', B=set(['2', 'z']))
+        self.assertSameResult('A', B=~Predicate('1'))
+        self.assertSameResult('A', D='a')  # <- TEXT column.
+        self.assertSameResult('A', B=lambda x: x == '1')  # <- Not converted.
+        self.assertEqual(self.array_select('A', B='1').fetch(), ['x'])
+
+    def test_validate(self):
+        query = self.array_select({'A': 'C'}).sum()
+        validate(query, {'x': 50, 'y': 30, 'z': 20})
+
+    def test_load_data(self):
+        self.array_select('C').sum().fetch()  # <- Builds arrays.
+        self.array_select.load_data([['A', 'C'], ['w', 100]])
+        self.assertEqual(self.array_select('C').sum().fetch(), 200)
+        self.assertEqual(self.array_select('A').fetch()[-1], 'w')
+
+    def test_integer_overflow(self):
+        select = ArraySelector([['A'], [2 ** 62], [2 ** 62]])
+        with self.assertRaises(OverflowError):
+            select('A').sum().fetch()
+
+    def test_sorted_grouping(self):
+        # Use numpy.unique() rather than bincount() for grouping.
+        original = columnar._max_dense_groups
+        columnar._max_dense_groups = 0
+        try:
+            self.assertSameResult({('A', 'B'): 'C'}, 'sum')
+            self.assertSameResult({'A': set(['C'])}, 'count')
+            self.assertSameResult(('A', 'B'), 'distinct')
+        finally:
+            columnar._max_dense_groups = original
+
+    def test_sample(self):
+        sample = self.array_select.sample(n=3, seed=1)
+        self.assertIsInstance(sample, ArraySelector)
+        self.assertEqual(sample('C').count().fetch(), 3)
+
+    def test_partitions(self):
+        select = ArraySelector([['A'], ['x'], ['y']], partitioned=True)
+        select.load_data([['A'], ['z']])
+        self.assertEqual(select('A', _source="[['A'], ['z']]").fetch(), ['z'])
+
+        select.drop_source("[['A'], ['x'], ['y']]")
+        self.assertEqual(select('A').fetch(), ['z'])
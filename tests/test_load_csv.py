@@ -8,6 +8,7 @@ from . import _unittest as unittest
 from datatest._compatibility.builtins import *
 
 from datatest._load.load_csv import load_csv
+from datatest._load.load_csv import read_csv_header
 
 try:
     from StringIO import StringIO
@@ -153,3 +154,24 @@ class TestLoadCsv(unittest.TestCase):
 
         error_message = str(cm.exception)
         self.assertIn('cannot attempt fallback', error_message.lower())
+
+
+class TestReadCsvHeader(unittest.TestCase):
+    def setUp(self):
+        self.original_cwd = os.path.abspath(os.getcwd())
+        os.chdir(os.path.join(os.path.dirname(__file__), 'sample_files'))
+
+    def tearDown(self):
+        os.chdir(self.original_cwd)
+
+    def test_header(self):
+        header = read_csv_header('sample_text_utf8.csv')
+        self.assertEqual(header, ['col1', 'col2'])
+
+    def test_latin1_file(self):
+        header = read_csv_header('sample_text_iso88591.csv')
+        self.assertEqual(header, ['col1', 'col2'])
+
+    def test_load_options_ignored(self):
+        header = read_csv_header('sample_text_utf8.csv', infer_types=True)
+        self.assertEqual(header, ['col1', 'col2'])
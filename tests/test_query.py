@@ -2,11 +2,15 @@
 from __future__ import absolute_import
 from __future__ import division
 import os
+import pickle
 import re
 import shutil
 import sqlite3
 import tempfile
 import textwrap
+import threading
+import time
+from numbers import Number
 from . import _io as io
 
 from . import _unittest as unittest
@@ -17,6 +21,8 @@ from datatest._utils import IterItems
 from datatest._utils import nonstringiter
 
 from datatest._load.working_directory import working_directory
+from datatest._predicate import Predicate
+from datatest._query import query as query_module
 from datatest._query.query import (
     BaseElement,
     _is_collection_of_items,
@@ -41,8 +47,15 @@ from datatest._query.query import (
     Query,
     Result,
     Selector,
+    LazyMapping,
+    _fetch_rows,
 )
 
+try:
+    TimeoutError
+except NameError:
+    TimeoutError = OSError
+
 
 class TestWorkingDirectory(unittest.TestCase):
     def setUp(self):
@@ -1299,6 +1312,32 @@ class TestQuery(unittest.TestCase):
         returned_value = query._explain(file=None)
         self.assertEqual(returned_value, expected)
 
+    def test_explain_sql(self):
+        select = Selector([['A', 'B'], ['x', 1], ['y', 2], ['x', 3]])
+        query = select({'A': 'B'}, A='x').sum()
+        explained = query._explain(file=None, sql=True)
+        self.assertIn('SQL Query:', explained)
+        self.assertIn('GROUP BY', explained)
+        self.assertIn("params: ['x']", explained)
+        self.assertIn('SQL Query Plan:', explained)
+        self.assertNotIn('USING INDEX', explained)
+
+        select.create_index('A')
+        explained = query._explain(file=None, sql=True)
+        self.assertIn('USING INDEX', explained)
+
+        explained = query._explain(file=None, analyze=True)
+        self.assertIn('SQL Query Plan (analyzed):', explained)
+
+        explained = Query('A')._explain(file=None, sql=True)
+        self.assertTrue(explained.endswith('SQL Query:\n  <not available>'))
+
+        explained = Query.from_object([1, 2])._explain(file=None, sql=True)
+        self.assertTrue(explained.endswith('SQL Query:\n  <not available>'))
+
+        explained = query._explain(file=None)
+        self.assertNotIn('SQL Query', explained)
+
     def test_repr(self):
         # Check "no selector" signature.
         query = Query(['label1'])
@@ -1347,6 +1386,65 @@ class TestQuery(unittest.TestCase):
         self.assertRegex(repr(query), regex)
 
 
+class TestLazyMapping(unittest.TestCase):
+    def setUp(self):
+        self.select = Selector([['A', 'B', 'C'],
+                                ['x', 'a', 1],
+                                ['y', 'b', 2],
+                                ['x', 'b', 3],
+                                ['z', None, 4]])
+
+    def assertSameMapping(self, query):
+        eager = query.fetch()
+        lazy = query.fetch(lazy=True)
+        self.assertIsInstance(lazy, LazyMapping)
+        self.assertEqual(list(lazy), list(eager))
+        self.assertEqual(len(lazy), len(eager))
+        for key in eager:
+            self.assertIn(key, lazy)
+            self.assertEqual(lazy[key], eager[key])
+
+    def test_results(self):
+        select = self.select
+        self.assertSameMapping(select({'A': 'C'}))
+        self.assertSameMapping(select({'A': set(['B'])}))
+        self.assertSameMapping(select({('A', 'B'): 'C'}))
+        self.assertSameMapping(select({'B': 'C'}))  # <- Includes None key.
+        self.assertSameMapping(select({'A': 'C'}).sum())
+        self.assertSameMapping(select({'A': 'C'}).map(lambda x: x * 2))
+        self.assertSameMapping(select({'A': 'C'}, B='b'))
+        self.assertSameMapping(select({'B': 'C'}, B=set(['a', 'b'])))
+
+    def test_missing_keys(self):
+        mapping = self.select({'A': 'C'}, B='b').fetch(lazy=True)
+        self.assertNotIn('z', mapping)  # <- Excluded by where-clause.
+        self.assertNotIn('q', mapping)
+        self.assertNotIn(['x'], mapping)
+        self.assertIsNone(mapping.get('q'))
+        with self.assertRaises(KeyError):
+            mapping['q']
+        with self.assertRaises(TypeError):
+            mapping[['x']]
+
+        mapping = self.select({('A', 'B'): 'C'}).fetch(lazy=True)
+        self.assertEqual(mapping[('x', 'a')], [1])
+        self.assertNotIn('x', mapping)
+
+    def test_index(self):
+        select = self.select
+        select({'A': 'C'}).fetch(lazy=True)
+        explained = select('C', A='x')._explain(file=None, sql=True)
+        self.assertIn('USING INDEX', explained)
+
+    def test_unsupported(self):
+        with self.assertRaises(TypeError):
+            self.select('A').fetch(lazy=True)
+        with self.assertRaises(TypeError):
+            self.select({'A': 'C'}).flatten().fetch(lazy=True)
+        with self.assertRaises(TypeError):
+            Query({'A': 'C'}).fetch(lazy=True)  # <- No source.
+
+
 class TestSelector(unittest.TestCase):
     def setUp(self):
         data = [['label1', 'label2', 'value'],
@@ -1496,24 +1594,82 @@ class TestSelector(unittest.TestCase):
         self.assertRegex(result[0], r'FUNC\d+\(A\)')
         self.assertEqual(result[1], [])
 
-        # Predicate (a type)
+        # Predicate (a type) translated into SQL.
         prev_len = len(select._user_function_dict)
         predicate = int
         result = select._build_where_clause({'A': predicate})
-        self.assertEqual(len(result), 2)
-        self.assertRegex(result[0], r'FUNC\d+\(A\)')
-        self.assertEqual(result[1], [])
-        self.assertEqual(len(select._user_function_dict), prev_len + 1)
+        self.assertEqual(result, ("typeof(A) IN ('integer')", []))
+        self.assertEqual(len(select._user_function_dict), prev_len)
 
-        # Predicate (a boolean)
+        # Predicate (a boolean) translated into SQL.
         prev_len = len(select._user_function_dict)
         predicate = True
         result = select._build_where_clause({'A': predicate})
         self.assertEqual(len(result), 2)
-        self.assertRegex(result[0], r'FUNC\d+\(A\)')
+        self.assertTrue(result[0].startswith('(CASE typeof(A)'))
         self.assertEqual(result[1], [])
+        self.assertEqual(len(select._user_function_dict), prev_len)
+
+        # Predicate (a tuple) still uses a user-defined function.
+        prev_len = len(select._user_function_dict)
+        predicate = ('x', int)
+        result = select._build_where_clause({'A': predicate})
+        self.assertRegex(result[0], r'FUNC\d+\(A\)')
         self.assertEqual(len(select._user_function_dict), prev_len + 1)
 
+    def test_build_where_clause_regex(self):
+        select = Selector([['A', 'B'], ['x', 1]])
+
+        result = select._build_where_clause({'A': re.compile('^a.c')})
+        self.assertIn('A GLOB ?', result[0])
+        self.assertEqual(result[1], ['*\n*', 'a?c*'])
+
+        result = select._build_where_clause({'A': re.compile(r'x\*.*y$')})
+        self.assertEqual(result[1], ['*\n*', '*x[*]*y'])
+
+        # Complex regex uses a user-defined function.
+        result = select._build_where_clause({'A': re.compile(r'\d+')})
+        self.assertRegex(result[0], r'^FUNC\d+\(A\)$')
+
+    def assertNativeMatch(self, values, predicates):
+        select = Selector()
+        select._connection.execute('CREATE TEMPORARY TABLE t (A)')
+        select._connection.executemany('INSERT INTO t VALUES (?)',
+                                       [(x,) for x in values])
+        select._table = 't'
+
+        for pred in predicates:
+            matcher = Predicate(pred)
+            expected = [x for x in values if matcher(x)]
+            clause, params = select._build_where_clause({'A': pred})
+            self.assertNotRegex(clause, r'^FUNC\d+\(A\)$', msg=repr(pred))
+            cursor = select._connection.execute(
+                'SELECT A FROM t WHERE ' + clause, params)
+            actual = [x[0] for x in cursor]
+            self.assertEqual(actual, expected, msg=repr(pred))
+
+    def test_native_predicates_match_python(self):
+        """Predicates translated into SQL should select the same values
+        that are matched when the predicates are evaluated in Python.
+        """
+        values = [None, 0, 1, -5, 2 ** 40, 0.0, 2.5, '', 'abc', 'xabcx',
+                  'ABC', b'', b'ab']
+        predicates = [
+            True, False, Ellipsis, int, float, str, bytes, object,
+            Number, set([1, 'abc']), Predicate(False), ~Predicate(True),
+            ~Predicate(int), ~Predicate('abc'), ~Predicate(set(['abc'])),
+        ]
+        self.assertNativeMatch(values, predicates)
+
+    def test_native_regex_match_python(self):
+        values = ['', 'abc', 'xabcx', 'ABC', 'a*c', 'a.c', 'ab\nc', 'abc\n']
+        predicates = [
+            re.compile('abc'), re.compile('^a.c$'), re.compile('^a.*'),
+            re.compile(r'a\*c'), re.compile(r'a\.c'), re.compile('c$'),
+            ~Predicate(re.compile('^ab')),
+        ]
+        self.assertNativeMatch(values, predicates)
+
     def test_execute_query(self):
         data = [['A', 'B'], ['x', 101], ['y', 202], ['z', 303]]
         source = Selector(data)
@@ -1754,6 +1910,1205 @@ class TestSelector(unittest.TestCase):
         self.assertEqual(query.fetch(), expected)
 
 
+class TestSelectorTypedLoad(unittest.TestCase):
+    def setUp(self):
+        self.data = [['A', 'B'], ['x', '9'], ['x', '10'], ['y', '007']]
+
+    def test_untyped(self):
+        select = Selector(self.data)
+        self.assertEqual(select('B').max().fetch(), '9')
+
+    def test_infer_types(self):
+        select = Selector(self.data, infer_types=True)
+        msg = 'leading zeros should keep column as text'
+        self.assertEqual(select('B').fetch(), ['9', '10', '007'], msg=msg)
+
+        select = Selector(self.data[:3], infer_types=True)
+        self.assertEqual(select('B').max().fetch(), 10)
+        self.assertEqual(select({'A': 'B'}).sum().fetch(), {'x': 19})
+
+    def test_converters(self):
+        select = Selector(self.data, converters={'B': int})
+        self.assertEqual(select('B').max().fetch(), 10)
+        self.assertEqual(select('B').fetch(), [9, 10, 7])
+
+    def test_csv_file(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, 'example.csv')
+            with open(path, 'wb') as fh:
+                fh.write(b'A,B\nx,9\nx,10\n')
+            select = Selector(path, infer_types=True)
+            self.assertEqual(select('B').max().fetch(), 10)
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+class TestSelectorHeaderPrescan(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.paths = []
+        for index, text in enumerate([b'A,B\nx,1\n',
+                                      b'A,C\ny,2\n',
+                                      b'',  # <- Empty file.
+                                      b'D,A,C\n3,z,4\n']):
+            path = os.path.join(self.temp_dir, 'file{0}.csv'.format(index))
+            with open(path, 'wb') as fh:
+                fh.write(text)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_union_schema(self):
+        select = Selector()
+        statements = []
+        set_trace = getattr(select._connection, 'set_trace_callback', None)
+        if set_trace:
+            set_trace(lambda statement: statements.append(statement))
+
+        select.load_data(self.paths)
+        self.assertEqual(select.fieldnames, ['A', 'B', 'C', 'D'])
+        self.assertEqual(
+            select(('A', 'B', 'C', 'D')).fetch(),
+            [('x', '1', '', ''), ('y', '', '2', ''), ('z', '', '4', '3')],
+        )
+        alter_statements = [x for x in statements if x.startswith('ALTER')]
+        self.assertEqual(alter_statements, [], msg='schema should be created once')
+
+    def test_existing_table(self):
+        select = Selector(self.paths[0])
+        select.load_data(self.paths[1:])
+        self.assertEqual(select.fieldnames, ['A', 'B', 'C', 'D'])
+        self.assertEqual(select('A').fetch(), ['x', 'y', 'z'])
+
+    def test_rollback(self):
+        bad_path = os.path.join(self.temp_dir, 'bad.csv')
+        with open(bad_path, 'wb') as fh:
+            fh.write(b',\nx,y\n')  # <- Duplicate empty column names.
+
+        select = Selector()
+        with self.assertRaises(sqlite3.OperationalError):
+            select.load_data([bad_path, self.paths[1]])
+        self.assertIsNone(select._table)
+
+
+class TestSelectorLazyLoad(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.paths = []
+        for index, text in enumerate([b'A,B\nx,1\ny,2\n', b'A,C\nz,3\n']):
+            path = os.path.join(self.temp_dir, 'file{0}.csv'.format(index))
+            with open(path, 'wb') as fh:
+                fh.write(text)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_deferred(self):
+        select = Selector(self.paths, lazy=True)
+        self.assertEqual(select.fieldnames, ['A', 'B', 'C'])
+        self.assertIn('file0.csv', repr(select))
+        with self.assertRaises(LookupError):
+            select('missing')
+        self.assertIsNone(select._table_name, msg='should not be loaded yet')
+
+        self.assertEqual(select('A').fetch(), ['x', 'y', 'z'])
+        self.assertIsNotNone(select._table_name)
+        self.assertEqual(select.fieldnames, ['A', 'B', 'C'])
+        self.assertEqual(len(select._obj_strings), 2)
+
+    def test_load_data(self):
+        select = Selector(self.paths[0], lazy=True)
+        select.load_data([['A', 'D'], ['w', 4]])
+        self.assertEqual(select.fieldnames, ['A', 'B', 'D'])
+        self.assertIsNone(select._table_name)
+
+        self.assertEqual(select('A').fetch(), ['x', 'y', 'w'])
+
+        select.load_data(self.paths[1])  # <- Deferred again.
+        self.assertEqual(select.fieldnames, ['A', 'B', 'D', 'C'])
+        self.assertEqual(select('A').fetch(), ['x', 'y', 'w', 'z'])
+
+    def test_exhaustible_source(self):
+        select = Selector(self.paths[0], lazy=True)
+        select.load_data(iter([['A', 'E'], ['v', 5]]))  # <- Loaded now.
+        self.assertIsNotNone(select._table_name)
+        self.assertEqual(select('A').fetch(), ['x', 'y', 'v'])
+
+    def test_failed_load(self):
+        bad_path = os.path.join(self.temp_dir, 'bad.csv')
+        with open(bad_path, 'wb') as fh:
+            fh.write(b'A,A\nx,y\n')  # <- Duplicate column name.
+
+        select = Selector(bad_path, lazy=True)
+        with self.assertRaises(sqlite3.OperationalError):
+            select('A').fetch()
+        self.assertTrue(select._pending_loads, msg='should stay pending')
+
+    def test_threads(self):
+        path = os.path.join(self.temp_dir, 'big.csv')
+        with open(path, 'wb') as fh:
+            fh.write(b'A,B\n' + b'x,1\n' * 20000)
+
+        for _ in range(3):
+            select = Selector([path] + self.paths, lazy=True)
+            results = []
+
+            def worker():
+                try:
+                    results.append(select('A').count().fetch())
+                except Exception as err:
+                    results.append(err)
+
+            threads = [threading.Thread(target=worker) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(results, [20003] * 4)
+
+    def test_reconnect(self):
+        select = Selector(self.paths, lazy=True)
+        select._connection_pid = -1  # <- Simulate use after a fork.
+        self.assertEqual(select('B').fetch(), ['1', '2', ''])
+
+
+class TestSelectorPartitions(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.paths = []
+        for index, text in enumerate([b'A,B\nx,1\ny,2\n', b'A,C\nz,3\n']):
+            path = os.path.join(self.temp_dir, 'file{0}.csv'.format(index))
+            with open(path, 'wb') as fh:
+                fh.write(text)
+            self.paths.append(path)
+        self.select = Selector(self.paths, partitioned=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_hidden_field(self):
+        self.assertEqual(self.select.fieldnames, ['A', 'B', 'C'])
+        self.assertEqual(
+            self.select({'_source': 'A'}).fetch(),
+            {self.paths[0]: ['x', 'y'], self.paths[1]: ['z']},
+        )
+
+        self.select.load_data([['A'], ['w']])
+        self.assertEqual(self.select('A', _source="[['A'], ['w']]").fetch(), ['w'])
+
+    def test_not_partitioned(self):
+        select = Selector(self.paths)
+        self.assertEqual(select.fieldnames, ['A', 'B', 'C'])
+        with self.assertRaises(LookupError):
+            select('A', _source=self.paths[0])
+        with self.assertRaises(TypeError):
+            select.drop_source(self.paths[0])
+
+    def test_pruning(self):
+        self.assertEqual(self.select('A', _source=self.paths[1]).fetch(), ['z'])
+        self.assertEqual(self.select('A', _source=set(self.paths)).fetch(), ['x', 'y', 'z'])
+        self.assertEqual(self.select('A', _source=re.compile('0.csv$')).fetch(), ['x', 'y'])
+        self.assertEqual(self.select('A', _source='missing.csv').fetch(), [])
+
+        expression, params = self.select._prune_partitions(lambda x: x.endswith('1.csv'))
+        self.assertEqual(expression, '_source IN (?)')
+        self.assertEqual(params, [self.paths[1]])
+
+        explained = self.select('A', _source=self.paths[1])._explain(file=None, sql=True)
+        self.assertIn('USING INDEX', explained)
+
+    def test_drop_source(self):
+        self.select.drop_source(self.paths[0])
+        self.assertEqual(self.select('A').fetch(), ['z'])
+        self.assertNotIn('file0.csv', repr(self.select))
+
+        self.select.load_data(self.paths[0])  # <- Replace source.
+        self.assertEqual(self.select('A').fetch(), ['z', 'x', 'y'])
+
+        with self.assertRaises(LookupError):
+            self.select.drop_source('missing.csv')
+
+    def test_reserved_name(self):
+        with self.assertRaises(ValueError):
+            Selector([['_source', 'A'], ['x', 1]], partitioned=True)
+
+    def test_snapshot(self):
+        path = os.path.join(self.temp_dir, 'data.snapshot')
+        self.select.snapshot(path)
+        shared = Selector.from_snapshot(path)
+        self.assertEqual(shared.fieldnames, ['A', 'B', 'C'])
+        self.assertEqual(shared('A', _source=self.paths[1]).fetch(), ['z'])
+
+
+class TestSelectorRefresh(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.paths = []
+        for index, text in enumerate(['A,B\nx,1\ny,2\n', 'A,B\nz,3\n']):
+            path = os.path.join(self.temp_dir, 'file{0}.csv'.format(index))
+            self.write_file(path, text)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @staticmethod
+    def write_file(path, text, mtime=1000000000):
+        with open(path, 'wb') as fh:
+            fh.write(text.encode('ascii'))
+        os.utime(path, (mtime, mtime))
+
+    def test_unchanged(self):
+        select = Selector(self.paths, partitioned=True)
+        self.assertEqual(select.refresh(), [])
+        self.assertEqual(select('A').fetch(), ['x', 'y', 'z'])
+
+    def test_changed(self):
+        select = Selector(self.paths + [[['A', 'B'], ['w', 4]]], partitioned=True)
+        select.create_index('A')
+
+        self.write_file(self.paths[0], 'A,B,C\nx,10,foo\n', mtime=1000000100)
+        self.assertEqual(select.refresh(), [self.paths[0]])
+        self.assertEqual(select({'_source': ('A', 'B')}).fetch(), {
+            self.paths[0]: [('x', '10')],
+            self.paths[1]: [('z', '3')],
+            "[['A', 'B'], ['w', 4]]": [('w', 4)],
+        })
+        self.assertEqual(select.fieldnames, ['A', 'B', 'C'])
+        self.assertEqual(len(select._obj_strings), 3)
+        self.assertEqual(select.refresh(), [], msg='fingerprint should be updated')
+
+    def test_missing_file(self):
+        select = Selector(self.paths, partitioned=True)
+        self.write_file(self.paths[0], 'A,B\nq,9\n', mtime=1000000100)
+        os.remove(self.paths[1])
+        with self.assertRaises(FileNotFoundError):
+            select.refresh()
+        self.assertEqual(select('A').fetch(), ['x', 'y', 'z'], msg='unchanged')
+
+    def test_failed_reload(self):
+        select = Selector(self.paths, partitioned=True)
+        self.write_file(self.paths[0], 'A,B\nq,9\n', mtime=1000000100)
+        self.write_file(self.paths[1], 'A,B\nr,8\n', mtime=1000000100)
+
+        original = query_module._load_obj
+        def load_obj(cursor, table, obj, args, kwds):
+            if obj == self.paths[1]:
+                raise ValueError('failed to load')
+            return original(cursor, table, obj, args, kwds)
+
+        query_module._load_obj = load_obj
+        try:
+            with self.assertRaises(ValueError):
+                select.refresh()
+        finally:
+            query_module._load_obj = original
+        self.assertEqual(select('A').fetch(), ['x', 'y', 'z'], msg='rolled back')
+
+        self.assertEqual(select.refresh(), self.paths)  # <- Still changed.
+        self.assertEqual(select('A').fetch(), ['q', 'r'])
+
+    def test_query_cache(self):
+        select = Selector(self.paths, partitioned=True, query_cache=100000)
+        self.assertEqual(select('B').fetch(), ['1', '2', '3'])
+        self.write_file(self.paths[1], 'A,B\nz,30\n', mtime=1000000100)
+        select.refresh()
+        self.assertEqual(select('B').fetch(), ['1', '2', '30'])
+
+    def test_not_partitioned(self):
+        select = Selector(self.paths)
+        with self.assertRaises(TypeError):
+            select.refresh()
+
+
+class TestSelectorParallelLoad(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.paths = []
+        for index, text in enumerate([b'A,B\nx,1\ny,2\n',
+                                      b'A,C\nz,3\n',
+                                      b'A,B\n',  # <- Header only.
+                                      b'B,A\n4,w\n']):
+            path = os.path.join(self.temp_dir, 'file{0}.csv'.format(index))
+            with open(path, 'wb') as fh:
+                fh.write(text)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_workers(self):
+        expected = Selector(self.paths)(('A', 'B', 'C')).fetch()
+        select = Selector(self.paths, workers=2)
+        self.assertEqual(select.fieldnames, ['A', 'B', 'C'])
+        self.assertEqual(select(('A', 'B', 'C')).fetch(), expected)
+        self.assertEqual(len(repr(select).splitlines()), 5)
+
+    def test_mixed_sources(self):
+        select = Selector()
+        data = [['A', 'D'], ['v', 5]]
+        select.load_data([self.paths[0], data, self.paths[1]], workers=2)
+        self.assertEqual(select('A').fetch(), ['x', 'y', 'v', 'z'])
+
+    def test_infer_types(self):
+        select = Selector(self.paths, workers=2, infer_types=True)
+        self.assertEqual(select('B').sum().fetch(), 7)
+        self.assertEqual(select('A', B=1).fetch(), ['x'])  # <- Typed column.
+
+    def test_with_cache(self):
+        cache_dir = os.path.join(self.temp_dir, 'cache')
+        Selector(self.paths[:2], cache_dir=cache_dir)  # <- Builds cache.
+        select = Selector(self.paths, workers=2, cache_dir=cache_dir)
+        expected = Selector(self.paths)(('A', 'B', 'C')).fetch()
+        self.assertEqual(select(('A', 'B', 'C')).fetch(), expected)
+
+    def test_rollback(self):
+        bad_path = os.path.join(self.temp_dir, 'bad.csv')
+        with open(bad_path, 'wb') as fh:
+            fh.write(b',\nx,y\n')  # <- Duplicate empty column names.
+
+        select = Selector(self.paths[0])
+        with self.assertRaises(sqlite3.OperationalError):
+            select.load_data([self.paths[1], bad_path], workers=2)
+        self.assertEqual(select.fieldnames, ['A', 'B'])
+        self.assertEqual(select('A').fetch(), ['x', 'y'])
+
+
+class TestSelectorBulkLoad(unittest.TestCase):
+    def test_bulk_load(self):
+        select = Selector([['A', 'B'], ['x', 1]])
+        select.create_index('A')
+
+        select.load_data([['A', 'B'], ['y', 2], ['z', 3]], bulk_load=True)
+        self.assertEqual(select('A').fetch(), ['x', 'y', 'z'])
+
+        cursor = select._connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM sqlite_temp_master WHERE type='index'")
+        self.assertEqual(cursor.fetchone()[0], 1, msg='index should be rebuilt')
+        cursor.execute('PRAGMA temp.journal_mode')
+        self.assertNotEqual(cursor.fetchone()[0], 'memory', msg='should be restored')
+
+    def test_init(self):
+        select = Selector([['A', 'B'], ['x', 1], ['y', 2]], bulk_load=True)
+        self.assertEqual(select('B').sum().fetch(), 3)
+
+
+class TestSelectorStorage(unittest.TestCase):
+    def setUp(self):
+        self.data = [['A', 'B'], ['x', 1], ['y', 2]]
+
+    def test_default(self):
+        select = Selector(self.data)
+        self.assertEqual(select.storage, 'tempfile')
+        self.assertEqual(select('B').sum().fetch(), 3)
+
+    def test_memory(self):
+        select = Selector(self.data, storage='memory')
+        self.assertEqual(select.storage, 'memory')
+        self.assertEqual(select('B').sum().fetch(), 3)
+
+        cursor = select._connection.cursor()
+        cursor.execute('PRAGMA temp_store')
+        self.assertEqual(cursor.fetchone()[0], 2)  # <- 2 is MEMORY.
+
+    def test_file_path(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, 'storage.sqlite')
+            select = Selector(self.data, storage=path)
+            self.assertEqual(select.storage, path)
+            self.assertEqual(select('B').sum().fetch(), 3)
+
+            select.load_data([['A', 'C'], ['z', 3]], bulk_load=True)
+            self.assertEqual(select('A').fetch(), ['x', 'y', 'z'])
+
+            connection = sqlite3.connect(path)  # <- Table is stored in file.
+            cursor = connection.execute('SELECT A FROM ' + select._table)
+            self.assertEqual(cursor.fetchall(), [('x',), ('y',), ('z',)])
+            connection.close()
+            select._connection.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_reopen_file_path(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, 'storage.sqlite')
+            for value in ['x', 'y', 'z']:
+                select = Selector([['A'], [value]], storage=path)
+                self.assertEqual(select('A').fetch(), [value])
+                select._connection.close()
+                del select  # <- Its table is replaced by the next Selector.
+
+            connection = sqlite3.connect(path)
+            cursor = connection.execute(
+                "SELECT name FROM sqlite_master WHERE type='table'")
+            self.assertEqual(cursor.fetchall(), [('datatest_selector',)])
+            cursor = connection.execute('SELECT A FROM datatest_selector')
+            self.assertEqual(cursor.fetchall(), [('z',)], msg='should be replaced')
+            connection.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_shared_file_path(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, 'storage.sqlite')
+            a = Selector([['A'], ['x']], storage=path)
+            b = Selector([['B'], ['y']], storage=path)
+            self.assertEqual(a.fieldnames, ['A'])
+            self.assertEqual(a('A').fetch(), ['x'])
+            self.assertEqual(b('B').fetch(), ['y'])
+            self.assertEqual(b._table, 'datatest_selector_1')
+            a._connection.close()
+            b._connection.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_bad_storage(self):
+        with self.assertRaises(ValueError):
+            Selector(self.data, storage=None)
+
+    def test_reconnect(self):
+        select = Selector(self.data, storage='memory')
+        select._connection_pid = -1  # <- Simulate access from forked process.
+        self.assertEqual(select('A').fetch(), ['x', 'y'])
+
+
+class TestSelectorIndexAdvisor(unittest.TestCase):
+    def setUp(self):
+        self.data = [['A', 'B', 'C'], ['x', 'a', 1], ['y', 'b', 2], ['x', 'b', 3]]
+
+    def get_indexes(self, select):
+        cursor = select._connection.cursor()
+        cursor.execute("SELECT name FROM sqlite_temp_master WHERE type='index'")
+        return [x[0] for x in cursor.fetchall()]
+
+    def test_recommend(self):
+        select = Selector(self.data)
+        for _ in range(5):
+            select({'A': 'C'}).sum().fetch()
+        select('C', B='b').fetch()
+
+        report = select.index_report()
+        self.assertEqual(len(report), 1)
+        self.assertEqual(report[0].columns, ('A',))
+        self.assertEqual(report[0].uses, 5)
+        self.assertEqual(report[0].status, 'recommended')
+        self.assertIsNone(report[0].seconds_saved)
+        self.assertEqual(self.get_indexes(select), [], msg='should not create index')
+
+    def test_auto_index(self):
+        select = Selector(self.data, auto_index=True)
+        for _ in range(5):
+            select('C', A='x', B=set(['a', 'b'])).fetch()
+        self.assertEqual(self.get_indexes(select), ['idx_{0}_A_B'.format(select._table)])
+
+        select('C', A='x', B=set(['a', 'b'])).fetch()  # <- Uses index.
+        report = select.index_report()
+        self.assertEqual(report[0].columns, ('A', 'B'))
+        self.assertEqual(report[0].status, 'created')
+        self.assertGreaterEqual(report[0].seconds_saved, 0.0)
+
+    def test_function_predicates_not_tracked(self):
+        select = Selector(self.data, auto_index=True)
+        for _ in range(5):
+            select('C', A=lambda x: x == 'x').fetch()
+        self.assertEqual(select.index_report(), [])
+
+
+class TestSelectorQueryCache(unittest.TestCase):
+    def setUp(self):
+        self.data = [['A', 'B', 'C'], ['x', 'a', 1], ['y', 'b', 2], ['x', 'b', 3]]
+
+    def test_disabled_by_default(self):
+        select = Selector(self.data)
+        select('C', A='x').fetch()
+        select('C', A='x').fetch()
+        self.assertEqual(select.query_cache_info(), (0, 0, 0, 0))
+
+    def test_hits_and_misses(self):
+        select = Selector(self.data, query_cache=100000)
+        self.assertEqual(select({'A': 'C'}).fetch(), {'x': [1, 3], 'y': [2]})
+        self.assertEqual(select({'A': 'C'}).fetch(), {'x': [1, 3], 'y': [2]})
+        self.assertEqual(select('C', B=set(['a'])).fetch(), [1])
+        self.assertEqual(select('C', B=set(['a'])).fetch(), [1])
+
+        info = select.query_cache_info()
+        self.assertEqual(info.hits, 2)
+        self.assertEqual(info.misses, 2)
+        self.assertEqual(info.maxsize, 100000)
+        self.assertGreater(info.currsize, 0)
+
+    def test_invalidated_by_load(self):
+        select = Selector(self.data, query_cache=100000)
+        self.assertEqual(select('C', A='x').fetch(), [1, 3])
+
+        select.load_data([['A', 'B', 'C'], ['x', 'c', 4]])
+        self.assertEqual(select.query_cache_info().currsize, 0)
+        self.assertEqual(select('C', A='x').fetch(), [1, 3, 4])
+        self.assertEqual(select.query_cache_info().hits, 0)
+
+    def test_function_predicates_not_cached(self):
+        select = Selector(self.data, query_cache=100000)
+        select('C', A=lambda x: x == 'x').fetch()
+        select('C', A=lambda x: x == 'x').fetch()
+        self.assertEqual(select.query_cache_info(), (0, 0, 100000, 0))
+
+    def test_parameter_types(self):
+        typed = Selector([['A', 'B'], ['x', '1'], ['y', 'a']], infer_types=True)
+        cached = Selector([['A', 'B'], ['x', '1'], ['y', 'a']], infer_types=True,
+                          query_cache=100000)
+        self.assertEqual(typed('A', B=1).fetch(), ['x'])
+        self.assertEqual(typed('A', B=1.0).fetch(), [])  # <- TEXT column.
+        for value in [1, 1.0]:
+            self.assertEqual(cached('A', B=value).fetch(),
+                             typed('A', B=value).fetch())
+
+    def test_nested_function_keys(self):
+        select = Selector(self.data, query_cache=100000)
+        first = select._get_cache_key('C', '', {'A': (lambda x: True,)})
+        second = select._get_cache_key('C', '', {'A': (lambda x: True,)})
+        self.assertNotEqual(first, second)
+
+    def test_memory_budget(self):
+        select = Selector(self.data, query_cache=1)  # <- Budget too small.
+        self.assertEqual(select('C').fetch(), [1, 2, 3])
+        self.assertEqual(select('C').fetch(), [1, 2, 3])
+        self.assertEqual(select.query_cache_info().currsize, 0)
+
+    def test_least_recently_used(self):
+        select = Selector(self.data, query_cache=100000)
+        select('A').fetch()
+        select('B').fetch()
+        size_a_and_b = select.query_cache_info().currsize
+
+        select._query_cache.maxsize = size_a_and_b
+        select('A').fetch()  # <- Hit makes 'A' the most recently used.
+        select('C').fetch()  # <- Evicts 'B'.
+        select('A').fetch()
+        select('B').fetch()
+
+        info = select.query_cache_info()
+        self.assertEqual(info.hits, 2)
+        self.assertEqual(info.misses, 4)
+
+
+class TestSelectorSchemaCache(unittest.TestCase):
+    def setUp(self):
+        self.select = Selector([['A', 'B', 'C'],
+                                ['x', 'a', 1],
+                                ['y', 'b', 2],
+                                ['x', 'b', 3]])
+
+    def test_fieldnames(self):
+        select = self.select
+        self.assertEqual(select.fieldnames, ['A', 'B', 'C'])
+        self.assertIsNotNone(select._schema_cache)
+
+        select.fieldnames.append('D')  # <- Must not change the cache.
+        self.assertEqual(select.fieldnames, ['A', 'B', 'C'])
+
+    def test_invalidated_by_load(self):
+        select = self.select
+        self.assertEqual(select('C').fetch(), [1, 2, 3])
+        with self.assertRaises(LookupError):
+            select('D')
+
+        select.load_data([['A', 'D'], ['z', 'q']])
+        self.assertEqual(select.fieldnames, ['A', 'B', 'C', 'D'])
+        self.assertEqual(select(('A', 'D')).fetch(),
+                         [('x', ''), ('y', ''), ('x', ''), ('z', 'q')])
+
+    def test_clauses(self):
+        select = self.select
+        self.assertEqual(select({'A': 'C'}).sum().fetch(), {'x': 4, 'y': 2})
+        self.assertEqual(select({'A': 'C'}).sum().fetch(), {'x': 4, 'y': 2})
+        self.assertEqual(select({'A': 'C'}).max().fetch(), {'x': 3, 'y': 2})
+        self.assertEqual(select({'A': set(['C'])}).fetch(),
+                         {'x': set([1, 3]), 'y': set([2])})
+        self.assertEqual(select({'A': ['C']}).fetch(), {'x': [1, 3], 'y': [2]})
+        self.assertEqual(select(set(['A'])).fetch(), set(['x', 'y']))
+        self.assertEqual(select(['A']).fetch(), ['x', 'y', 'x'])
+
+    def test_where_params(self):
+        select = self.select
+        self.assertEqual(select('C', A='x').fetch(), [1, 3])
+        self.assertEqual(select('C', A='y').fetch(), [2])  # <- Same shape.
+        self.assertEqual(select('C', A='x', B='b').fetch(), [3])
+        self.assertEqual(select('C', B='b', A='y').fetch(), [2])
+        self.assertEqual(select('C', B=set(['a'])).fetch(), [1])
+        self.assertEqual(select('C', B=set(['a', 'b'])).fetch(), [1, 2, 3])
+        self.assertEqual(select('C', C=1).fetch(), [1])
+        self.assertEqual(select('C', C=True).fetch(), [1, 2, 3])
+
+    def test_where_not_cached(self):
+        select = self.select
+        self.assertEqual(select('C', A=lambda x: x == 'x').fetch(), [1, 3])
+        self.assertEqual(select('C', A=re.compile('^y')).fetch(), [2])
+        self.assertEqual(select._statement_cache.get(('where', (('A', None),))), None)
+
+    def test_cache_size(self):
+        select = self.select
+        original = query_module._statement_cache_size
+        query_module._statement_cache_size = 2
+        try:
+            select('A').fetch()
+            select('B').fetch()
+            select('C').fetch()  # <- Cache is cleared when full.
+            self.assertLessEqual(len(select._statement_cache), 2)
+            self.assertEqual(select('A').fetch(), ['x', 'y', 'x'])
+        finally:
+            query_module._statement_cache_size = original
+
+
+class TestSelectorSample(unittest.TestCase):
+    def setUp(self):
+        data = [['A', 'B']] + [['xyz'[i % 3], i] for i in range(100)]
+        self.select = Selector(data)
+
+    def test_n(self):
+        sample = self.select.sample(n=10, seed=1)
+        values = sample('B').fetch()
+        self.assertEqual(len(values), 10)
+        self.assertEqual(values, sorted(values), msg='original order')
+        self.assertTrue(set(values) <= set(self.select('B').fetch()))
+        self.assertEqual(sample.fieldnames, ['A', 'B'])
+
+    def test_fraction(self):
+        sample = self.select.sample(fraction=0.25, seed=1)
+        self.assertEqual(sample('B').count().fetch(), 25)
+
+    def test_deterministic(self):
+        first = self.select.sample(n=10, seed=1234)('B').fetch()
+        second = self.select.sample(n=10, seed=1234)('B').fetch()
+        self.assertEqual(first, second)
+
+    def test_noncontiguous_rowids(self):
+        cursor = self.select._connection.cursor()
+        cursor.execute('DELETE FROM {0} WHERE B % 2 = 1'.format(self.select._table))
+        values = self.select.sample(n=10, seed=1)('B').fetch()
+        self.assertEqual(len(values), 10)
+        self.assertEqual(len(set(values)), 10)
+        self.assertTrue(all(x % 2 == 0 for x in values))
+        self.assertEqual(values, sorted(values), msg='original order')
+        self.assertEqual(values, self.select.sample(n=10, seed=1)('B').fetch())
+
+        values = self.select.sample(fraction=0.8, seed=1)('B').fetch()
+        self.assertEqual(len(set(values)), 40)
+        self.assertTrue(all(x % 2 == 0 for x in values))
+
+    def test_sparse_rowids(self):
+        cursor = self.select._connection.cursor()
+        cursor.execute('DELETE FROM {0} WHERE B % 10 != 0'.format(self.select._table))
+        values = self.select.sample(n=5, seed=1)('B').fetch()
+        self.assertEqual(len(set(values)), 5)
+        self.assertTrue(all(x % 10 == 0 for x in values))
+        self.assertEqual(values, sorted(values), msg='original order')
+
+    def test_column_types(self):
+        select = Selector([['A', 'B'], ['x', '5'], ['y', '6']], infer_types=True)
+        sample = select.sample(fraction=1.0)
+        self.assertEqual(sample('A', B='5').fetch(), ['x'])
+        self.assertEqual(sample('B').sum().fetch(), 11)
+
+    def test_partitioned(self):
+        select = Selector([['A'], ['x'], ['y']], partitioned=True)
+        select.load_data([['A'], ['z']])
+        sample = select.sample(fraction=1.0)
+        self.assertEqual(sample.fieldnames, ['A'])
+        self.assertEqual(sample('A').fetch(), ['x', 'y', 'z'])
+        self.assertEqual(sample('A', _source=select('_source').fetch()[-1]).fetch(),
+                         ['z'])
+
+    def test_size_limits(self):
+        self.assertEqual(self.select.sample(n=0)('B').fetch(), [])
+        self.assertEqual(self.select.sample(n=1000)('B').count().fetch(), 100)
+        self.assertEqual(Selector().sample(n=5).fieldnames, [])
+
+    def test_bad_arguments(self):
+        with self.assertRaises(TypeError):
+            self.select.sample()
+        with self.assertRaises(TypeError):
+            self.select.sample(n=5, fraction=0.5)
+        with self.assertRaises(ValueError):
+            self.select.sample(fraction=1.5)
+        with self.assertRaises(ValueError):
+            self.select.sample(n=-1)
+
+    def test_repr(self):
+        select = Selector([['A'], ['x']])
+        self.assertEqual(repr(select.sample(n=1)),
+                         "<Selector sample of 1 rows from [['A'], ['x']]>")
+
+
+class TestSelectorArraysize(unittest.TestCase):
+    def setUp(self):
+        self.data = [['A', 'B', 'C'],
+                     ['x', 'a', 1],
+                     ['y', 'b', 2],
+                     ['x', 'b', 3],
+                     ['y', 'a', 4],
+                     ['z', 'a', 5]]
+
+    def assertSameResults(self, select):
+        """Check result shapes against a Selector with arraysize=1."""
+        baseline = Selector(self.data, arraysize=1)
+        namedtup = namedtuple('namedtup', ['A', 'C'])
+        for columns in ['C', ['C'], set(['A']), ('A', 'C'), [('A', 'C')],
+                        [namedtup('A', 'C')], {'A': 'C'}, {'A': ('B', 'C')},
+                        {('A', 'B'): 'C'}, {namedtup('A', 'B'): ['C']},
+                        {'A': set(['B'])}]:
+            self.assertEqual(select(columns).fetch(),
+                             baseline(columns).fetch(),
+                             msg=repr(columns))
+
+    def test_default(self):
+        select = Selector(self.data)
+        self.assertSameResults(select)
+
+    def test_batches(self):
+        select = Selector(self.data, arraysize=2)  # <- Uneven batches.
+        self.assertSameResults(select)
+
+    def test_fetch_rows(self):
+        cursor = Selector(self.data, arraysize=2)._execute_query('C')
+        self.assertEqual(cursor.arraysize, 2)
+        self.assertEqual(list(_fetch_rows(cursor)), [(1,), (2,), (3,), (4,), (5,)])
+
+        rows = iter([(1,), (2,)])  # <- Not a cursor.
+        self.assertEqual(list(_fetch_rows(rows)), [(1,), (2,)])
+
+
+class TestSelectorLimits(unittest.TestCase):
+    def setUp(self):
+        self.data = [['A', 'B']] + [['x', i] for i in range(5000)]
+
+    def test_timeout(self):
+        def slow(value):
+            time.sleep(0.001)
+            return True
+
+        select = Selector(self.data, timeout=0.05)
+        with self.assertRaises(TimeoutError) as cm:
+            select('A', B=slow).fetch()
+        self.assertIn('query exceeded timeout of 0.05 seconds', str(cm.exception))
+        self.assertEqual(select('B').count().fetch(), 5000)  # <- Still usable.
+
+    def test_timeout_counts_sqlite_time(self):
+        select = Selector(self.data[:6], timeout=0.05, arraysize=1)
+        rows = []
+        for value in select('B').execute():
+            time.sleep(0.02)  # <- Time spent by the caller is not counted.
+            rows.append(value)
+        self.assertEqual(rows, [0, 1, 2, 3, 4])
+
+    def test_progress(self):
+        steps = []
+        select = Selector(self.data, progress=steps.append)
+        del steps[:]  # <- Clear steps reported while loading.
+        select('B').sum().fetch()
+        self.assertTrue(steps)
+        self.assertEqual(steps, list(range(1000, len(steps) * 1000 + 1, 1000)))
+
+    def test_progress_cancel(self):
+        class Cancelled(Exception):
+            pass
+
+        cancel = [False]
+        def progress(steps):
+            if cancel[0]:
+                raise Cancelled()
+
+        select = Selector(self.data, progress=progress)
+        cancel[0] = True
+        with self.assertRaises(Cancelled):
+            select('B').fetch()
+
+        with self.assertRaises(Cancelled):
+            select.load_data([['A', 'C'], ['y', 1]] * 2000)
+        cancel[0] = False
+        self.assertEqual(select.fieldnames, ['A', 'B'])  # <- Load rolled back.
+        self.assertEqual(select('B').count().fetch(), 5000)
+
+    def test_other_operations(self):
+        class Cancelled(Exception):
+            pass
+
+        cancel = [False]
+        def progress(steps):
+            if cancel[0]:
+                raise Cancelled()
+
+        select = Selector(self.data, progress=progress, partitioned=True)
+        source = select('_source').fetch()[0]
+        small = Selector([['A', 'C'], ['x', 1]], progress=progress)
+        other = Selector(self.data)
+        cancel[0] = True
+        with self.assertRaises(Cancelled):
+            select.sample(n=4000)
+        with self.assertRaises(Cancelled):
+            small.join(other, on='A')  # <- Copying *other* is checked, too.
+        with self.assertRaises(Cancelled):
+            select.drop_source(source)
+        cancel[0] = False
+        self.assertEqual(select('B').count().fetch(), 5000)  # <- Rolled back.
+        self.assertEqual(other('B').count().fetch(), 5000)
+
+    def test_no_limits(self):
+        cursor = Selector(self.data)._execute_query('B')
+        self.assertIsInstance(cursor, query_module._LockedCursor)  # <- Not monitored.
+
+
+class TestSelectorSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'data.snapshot')
+        self.data = [['A', 'B'], ['x', 1], ['y', 2], ['x', 3]]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def get_indexes(self, select):
+        cursor = select._connection.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' "
+                       "UNION SELECT name FROM sqlite_temp_master WHERE type='index'")
+        return [x[0] for x in cursor.fetchall()]
+
+    def test_readonly(self):
+        select = Selector(self.data)
+        select.create_index('A')
+        select.snapshot(self.path)
+        self.assertEqual(os.listdir(self.temp_dir), ['data.snapshot'])
+
+        shared = Selector.from_snapshot(self.path)
+        self.assertEqual(repr(shared), repr(select))
+        self.assertEqual(shared.fieldnames, ['A', 'B'])
+        self.assertEqual(shared({'A': 'B'}).sum().fetch(), {'x': 4, 'y': 2})
+        self.assertEqual(shared('B', A='x').fetch(), [1, 3])
+        self.assertEqual(shared.storage, self.path)
+        self.assertEqual(len(self.get_indexes(shared)), 1)
+
+        with self.assertRaises(sqlite3.OperationalError):
+            shared.load_data([['A', 'B'], ['z', 4]])
+
+        shared._connection_pid = -1  # <- Simulate use after a fork.
+        self.assertEqual(shared('B', A='x').fetch(), [1, 3])
+        with self.assertRaises(sqlite3.OperationalError):
+            shared.load_data([['A', 'B'], ['z', 4]])
+
+    def test_readonly_auto_index(self):
+        Selector(self.data).snapshot(self.path)
+        shared = Selector.from_snapshot(self.path, auto_index=True)
+        for _ in range(6):
+            self.assertEqual(shared({'A': 'B'}).sum().fetch(), {'x': 4, 'y': 2})
+
+        report = shared.index_report()
+        self.assertEqual([(x.columns, x.status) for x in report],
+                         [(('A',), 'recommended')])
+        self.assertEqual(self.get_indexes(shared), [])
+
+    def test_not_readonly(self):
+        Selector(self.data).snapshot(self.path)
+
+        select = Selector.from_snapshot(self.path, readonly=False)
+        self.assertEqual(select.storage, 'memory')
+        select.load_data([['A', 'C'], ['z', 5]])
+        self.assertEqual(select.fieldnames, ['A', 'B', 'C'])
+        self.assertEqual(select('A').fetch(), ['x', 'y', 'x', 'z'])
+
+        # Snapshot is unchanged.
+        self.assertEqual(Selector.from_snapshot(self.path)('A').fetch(), ['x', 'y', 'x'])
+
+    def test_empty_selector(self):
+        Selector().snapshot(self.path)
+        select = Selector.from_snapshot(self.path)
+        self.assertEqual(repr(select), '<Selector (no data loaded)>')
+
+    def test_file_storage(self):
+        storage = os.path.join(self.temp_dir, 'storage.sqlite')
+        select = Selector(self.data, storage=storage)
+        select.snapshot(self.path)
+        select._connection.close()
+        del select  # <- Its table can be replaced.
+
+        copied = Selector.from_snapshot(self.path, readonly=False, storage=storage + '2')
+        self.assertEqual(copied('B').sum().fetch(), 6)
+        copied._connection.close()
+
+        Selector([['A', 'B'], ['z', 9]]).snapshot(self.path)
+        copied = Selector.from_snapshot(self.path, readonly=False, storage=storage)
+        self.assertEqual(copied._table, 'datatest_selector')
+        self.assertEqual(copied('B').sum().fetch(), 9, msg='should replace old table')
+
+    def test_errors(self):
+        with self.assertRaises(FileNotFoundError):
+            Selector.from_snapshot(self.path)
+
+        with open(self.path, 'wb') as fh:
+            fh.write(b'')  # <- Empty database without a snapshot table.
+        with self.assertRaises(ValueError):
+            Selector.from_snapshot(self.path)
+
+
+class TestSelectorJoin(unittest.TestCase):
+    def setUp(self):
+        self.orders = Selector([['order_id', 'customer_id', 'amount'],
+                                [1, 10, 5],
+                                [2, 11, 6],
+                                [3, 99, 7],
+                                [4, 10, 8]])
+        self.customers = Selector([['id', 'name'],
+                                   [10, 'a'],
+                                   [11, 'b'],
+                                   [12, 'c']])
+
+    def test_inner(self):
+        joined = self.orders.join(self.customers, on={'customer_id': 'id'})
+        self.assertEqual(joined.fieldnames,
+                         ['order_id', 'customer_id', 'amount', 'id', 'name'])
+        self.assertEqual(joined(('order_id', 'name')).fetch(),
+                         [(1, 'a'), (2, 'b'), (4, 'a')])
+        self.assertEqual(joined({'name': 'amount'}).sum().fetch(),
+                         {'a': 13, 'b': 6})
+
+    def test_left(self):
+        joined = self.orders.join(self.customers, on={'customer_id': 'id'}, how='left')
+        orphans = joined('order_id', id=lambda x: x is None)
+        self.assertEqual(orphans.fetch(), [3])
+
+    def test_suffix(self):
+        other = Selector([['customer_id', 'amount'], [10, 100], [11, 200]])
+        joined = self.orders.join(other, on='customer_id')
+        self.assertEqual(joined.fieldnames, ['order_id', 'customer_id', 'amount',
+                                             'customer_id_right', 'amount_right'])
+
+        joined = self.orders.join(other, on=['customer_id'], suffix='_2')
+        self.assertEqual(joined(('amount', 'amount_2')).fetch(),
+                         [(5, 100), (6, 200), (8, 100)])
+
+    def test_attached_file(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, 'customers.sqlite')
+            customers = Selector([['id', 'name'], [10, 'a'], [11, 'b']], storage=path)
+            joined = self.orders.join(customers, on={'customer_id': 'id'})
+            self.assertEqual(joined('name').fetch(), ['a', 'b', 'a'])
+
+            snapshot_path = os.path.join(temp_dir, 'orders.snapshot')
+            self.orders.snapshot(snapshot_path)
+            orders = Selector.from_snapshot(snapshot_path)
+            joined = orders.join(self.customers, on={'customer_id': 'id'})
+            self.assertEqual(joined.storage, 'tempfile')
+            self.assertEqual(joined('name').fetch(), ['a', 'b', 'a'])
+
+            cursor = joined._connection.cursor()
+            cursor.execute('PRAGMA database_list')
+            self.assertEqual([x[1] for x in cursor], ['main', 'temp'],
+                             msg='attached databases should be detached')
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_column_types(self):
+        typed = Selector([['id', 'B'], ['1', '5'], ['2', '6']], infer_types=True)
+        untyped = Selector([['id', 'C'], ['1', 'x'], ['2', 'y']])
+        self.assertEqual(typed('id', B='5').fetch(), [1])
+
+        joined = typed.join(untyped, on='id')
+        self.assertEqual(joined('id', B='5').fetch(), [1])  # <- Type is kept.
+        self.assertEqual(joined(('id', 'C')).fetch(), [(1, 'x'), (2, 'y')])
+        self.assertEqual(untyped.join(typed, on='id')('C').fetch(), ['x', 'y'])
+
+    def test_staged_files_removed(self):
+        tempdir = tempfile.gettempdir()
+        before = set(x for x in os.listdir(tempdir) if x.startswith('datatest_stage_'))
+        self.orders.join(self.customers, on={'customer_id': 'id'})
+        after = set(x for x in os.listdir(tempdir) if x.startswith('datatest_stage_'))
+        self.assertEqual(after, before)
+
+    def test_bad_arguments(self):
+        with self.assertRaises(LookupError):
+            self.orders.join(self.customers, on='missing')
+
+        with self.assertRaises(ValueError):
+            self.orders.join(self.customers, on={'customer_id': 'id'}, how='outer')
+
+        with self.assertRaises(TypeError):
+            self.orders.join([['id'], [10]], on='id')
+
+
+class TestSelectorConnection(unittest.TestCase):
+    def test_separate_connections(self):
+        select1 = Selector([['A'], ['x']])
+        select2 = Selector([['A'], ['y']])
+        self.assertIsNot(select1._connection, select2._connection)
+
+    def test_threads(self):
+        selectors = [Selector([['A', 'B']] + [['x', i] for i in range(50)])
+                     for _ in range(4)]
+        results = {}
+
+        def worker(index, select):
+            results[index] = select('B').sum().fetch()
+
+        threads = [threading.Thread(target=worker, args=(i, s))
+                   for i, s in enumerate(selectors)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {0: 1225, 1: 1225, 2: 1225, 3: 1225})
+
+    def test_threads_sharing_selector(self):
+        select = Selector([['A', 'B']] + [['x', i] for i in range(5000)])
+        results = []
+
+        def worker(index):  # <- Registers functions while others run them.
+            try:
+                for _ in range(10):
+                    query = select('B', B=lambda x, i=index: x % 4 == i)
+                    results.append(query.count().fetch())
+            except Exception as err:
+                results.append(err)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        self.assertFalse(any(x.is_alive() for x in threads), msg='deadlocked')
+        self.assertEqual(results, [1250] * 40)
+
+    @staticmethod
+    def run_forked(function):
+        """Call *function* in a forked child process and return its
+        result (or the repr of the exception it raised).
+        """
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # <- In child process.
+            os.close(read_fd)
+            try:
+                result = function()
+            except BaseException as err:
+                result = repr(err)
+            with os.fdopen(write_fd, 'wb') as fh:
+                pickle.dump(result, fh)
+            os._exit(0)
+
+        os.close(write_fd)
+        with os.fdopen(read_fd, 'rb') as fh:
+            result = pickle.load(fh)
+        os.waitpid(pid, 0)
+        return result
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork()')
+    def test_reconnect_after_fork(self):
+        for storage in ['tempfile', 'memory']:
+            select = Selector([['A', 'B'], ['x', 1], ['y', 2]], storage=storage)
+            select.create_index('A')
+            select('A', B=lambda x: x > 1).fetch()  # <- Registers a function.
+            parent_connection = select._connection
+
+            def grandchild():
+                return (select('A').fetch(),
+                        select('A', B=lambda x: x > 1).fetch())
+
+            def child():
+                results = [select('A').fetch(),
+                           select._connection is parent_connection,
+                           select._user_function_dict]
+                select.load_data([['A', 'B'], ['z', 3]])
+                results.append(self.run_forked(grandchild))
+                results.append(select('A').fetch())
+                return results
+
+            self.assertEqual(
+                self.run_forked(child),
+                [['x', 'y'], False, {}, (['x', 'y', 'z'], ['y', 'z']), ['x', 'y', 'z']],
+                msg=storage,
+            )
+            self.assertEqual(select('A').fetch(), ['x', 'y'], msg='parent is unchanged')
+
+
+class TestSelectorCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.file1 = os.path.join(self.temp_dir, 'file1.csv')
+        self.file2 = os.path.join(self.temp_dir, 'file2.csv')
+        self.write_file(self.file1, 'A,B\nx,1\ny,2\n')
+        self.write_file(self.file2, 'A,C\nz,3\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @staticmethod
+    def write_file(path, text, mtime=None):
+        with open(path, 'wb') as fh:
+            fh.write(text.encode('ascii'))
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_cached_load(self):
+        pattern = os.path.join(self.temp_dir, '*.csv')
+        select = Selector(pattern, cache_dir=self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        expected = [('x', '1', ''), ('y', '2', ''), ('z', '', '3')]
+        self.assertEqual(sorted(select(('A', 'B', 'C')).fetch()), expected)
+
+        # Rewrite cache with bogus data to verify that it gets used.
+        connection = sqlite3.connect(':memory:')
+        cursor = connection.cursor()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            cursor.execute('ATTACH DATABASE ? AS cache', (path,))
+            cursor.execute("UPDATE cache.datatest_data SET A = A || '!'")
+            connection.commit()
+            cursor.execute('DETACH DATABASE cache')
+
+        select = Selector(pattern, cache_dir=self.cache_dir)
+        self.assertEqual(sorted(select('A').fetch()), ['x!', 'y!', 'z!'])
+
+    def test_changed_source(self):
+        pattern = os.path.join(self.temp_dir, '*.csv')
+        select = Selector(pattern, cache_dir=self.cache_dir)
+
+        self.write_file(self.file2, 'A,C\nzz,33\n', mtime=1000000000)
+        select = Selector(pattern, cache_dir=self.cache_dir)
+        self.assertEqual(sorted(select('A').fetch()), ['x', 'y', 'zz'])
+
+    def test_content_hash(self):
+        self.write_file(self.file1, 'A,B\nx,1\n', mtime=1000000000)
+        Selector(self.file1, cache_dir=self.cache_dir, cache_hash=True)
+
+        # Same size and mtime but different contents.
+        self.write_file(self.file1, 'A,B\nq,1\n', mtime=1000000000)
+        select = Selector(self.file1, cache_dir=self.cache_dir, cache_hash=True)
+        self.assertEqual(select('A').fetch(), ['q'])
+
+    def test_typed_columns(self):
+        expected = Selector(self.file1, infer_types=True)('A', B='1').fetch()
+        self.assertEqual(expected, ['x'])
+        for _ in range(2):  # <- Write the cache, then read it.
+            select = Selector(self.file1, cache_dir=self.cache_dir, infer_types=True)
+            self.assertEqual(select('A', B='1').fetch(), expected)
+            self.assertEqual(select('B').sum().fetch(), 3)
+
+    def test_non_file_objects(self):
+        data = [['A', 'B'], ['w', 0]]
+        select = Selector(cache_dir=self.cache_dir)
+        select.load_data(data)
+        select.load_data(self.file1)
+        self.assertEqual(select('A').fetch(), ['w', 'x', 'y'])
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+
 class TestQueryToCsv(unittest.TestCase):
     def setUp(self):
         self.select = Selector([['A', 'B'], ['x', 1], ['y', 2]])
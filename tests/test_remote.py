@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from multiprocessing import AuthenticationError
+from . import _unittest as unittest
+from datatest._compatibility.builtins import *
+from datatest._query.query import Selector
+from datatest._query.remote import RemoteSelector
+from datatest._query.remote import _dataset_table
+from datatest._query.remote import _parse_address
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def is_large(value):  # <- Must be importable by the workers.
+    return value > 15
+
+
+def start_worker(*args):
+    """Start a worker process and return a tuple of (process, address)."""
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR)
+    command = [sys.executable, '-m', 'datatest.worker', '--authkey', 'secret']
+    process = subprocess.Popen(command + list(args), cwd=ROOT_DIR, env=env,
+                               stdout=subprocess.PIPE)
+    line = process.stdout.readline().decode('utf-8')
+    return process, line.split()[-1]
+
+
+def stop_worker(process):
+    process.terminate()
+    process.wait()
+    process.stdout.close()
+
+
+class TestHelpers(unittest.TestCase):
+    def test_parse_address(self):
+        self.assertEqual(_parse_address('example.com:7001'), ('example.com', 7001))
+        self.assertEqual(_parse_address(':7001'), ('localhost', 7001))
+        self.assertEqual(_parse_address(('example.com', '7001')), ('example.com', 7001))
+        self.assertEqual(_parse_address(b'example.com:7001'.decode('ascii')), ('example.com', 7001))
+
+    def test_dataset_table(self):
+        self.assertEqual(_dataset_table('orders_2019'), 'dataset_orders_2019')
+        with self.assertRaises(ValueError):
+            _dataset_table('orders; DROP TABLE x')
+
+
+class TestRemoteSelector(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.workers = [start_worker(), start_worker()]
+        cls.addresses = [address for _, address in cls.workers]
+
+    @classmethod
+    def tearDownClass(cls):
+        for process, _ in cls.workers:
+            stop_worker(process)
+
+    def setUp(self):
+        data = [
+            ['A', 'B', 'C'],
+            ['x', 'foo', 20],
+            ['x', 'foo', 30],
+            ['y', 'foo', 10],
+            ['y', 'bar', 20],
+            ['z', 'bar', 10],
+            ['z', 'bar', 10],
+        ]
+        self.name = self.id().rpartition('.')[2]  # <- Dataset for each test.
+        self.select = Selector(data)
+        self.remote = RemoteSelector(data, addresses=self.addresses,
+                                     authkey='secret', name=self.name)
+
+    def tearDown(self):
+        self.remote.close()
+
+    def assertSameResult(self, columns, method=None, **where):
+        expected = self.select(columns, **where)
+        actual = self.remote(columns, **where)
+        if method:
+            expected = getattr(expected, method)()
+            actual = getattr(actual, method)()
+        self.assertEqual(actual.fetch(), expected.fetch())
+
+    def test_select(self):
+        self.assertSameResult('A')
+        self.assertSameResult(('A', 'C'))
+        self.assertSameResult({'A': 'C'})
+        self.assertSameResult({'B': set(['A'])})
+        self.assertSameResult('A', 'distinct')
+
+    def test_aggregate(self):
+        for method in ['sum', 'count', 'avg', 'min', 'max']:
+            self.assertSameResult('C', method)
+            self.assertSameResult({'A': 'C'}, method)
+            self.assertSameResult({'B': set(['C'])}, method)
+
+    def test_where(self):
+        self.assertSameResult('C', A='x')
+        self.assertSameResult('A', C=is_large)
+        with self.assertRaises(TypeError):
+            self.remote('A', C=lambda x: x > 15).fetch()
+
+    def test_streamed_results(self):
+        expected = self.select(('A', 'C')).fetch()
+        first = iter(self.remote(('A', 'C')).execute())
+        self.assertEqual(next(first), expected[0])
+
+        abandoned = iter(self.remote('B').execute())
+        next(abandoned)
+        del abandoned
+
+        self.assertSameResult({'A': 'C'}, 'sum')  # <- Query while streaming.
+        self.remote.create_index('A')
+        self.assertEqual([expected[0]] + list(first), expected)
+        self.assertEqual(self.remote._streams, {})
+
+    def test_slow_client(self):
+        data = [['A', 'B']] + [['x' * 200, i] for i in range(60000)]  # <- Exceeds socket buffers.
+        name = self.name + '_large'
+        slow = RemoteSelector(data, addresses=self.addresses[:1],
+                              authkey='secret', name=name)
+        rows = iter(slow(('A', 'B')).execute())
+        next(rows)  # <- Leave most of the reply unread.
+
+        results = []
+
+        def query_other():
+            other = RemoteSelector(addresses=self.addresses[:1],
+                                   authkey='secret', name=name)
+            results.append(other('B').count().fetch())
+            other.close()
+
+        thread = threading.Thread(target=query_other)
+        thread.daemon = True
+        thread.start()
+        thread.join(30)
+        self.assertEqual(results, [60000], msg='blocked by a slow client')
+        self.assertEqual(len(list(rows)), 59999)
+        slow.close()
+
+    def test_load_data(self):
+        self.remote.load_data([['A', 'D'], ['w', 'q']])
+        self.select.load_data([['A', 'D'], ['w', 'q']])
+        self.assertEqual(self.remote.fieldnames, ['A', 'B', 'C', 'D'])
+        self.assertSameResult(('A', 'D'))
+
+    def test_create_index(self):
+        self.remote.create_index('A')
+        self.assertSameResult('C', A='x')
+
+    def test_reconnect(self):
+        self.remote.close()
+        self.remote = RemoteSelector(addresses=self.addresses,
+                                     authkey='secret', name=self.name)
+        self.assertSameResult(('A', 'B', 'C'))
+
+    def test_worker_error(self):
+        with self.assertRaises(LookupError):
+            self.remote('X').fetch()
+        self.assertSameResult('A')  # <- Still usable.
+
+    def test_bad_arguments(self):
+        with self.assertRaises(TypeError):
+            RemoteSelector(addresses=self.addresses)  # <- No authkey.
+        with self.assertRaises(AuthenticationError):
+            RemoteSelector(addresses=self.addresses, authkey='wrong')
+
+
+class TestWorkerSources(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.workers = []
+        for text in [b'A,B\nx,1\ny,2\n', b'A,B,C\nz,3,foo\n']:
+            path = os.path.join(self.temp_dir, 'file{0}.csv'.format(len(self.workers)))
+            with open(path, 'wb') as fh:
+                fh.write(text)
+            self.workers.append(start_worker(path))
+
+    def tearDown(self):
+        for process, _ in self.workers:
+            stop_worker(process)
+        shutil.rmtree(self.temp_dir)
+
+    def test_preloaded(self):
+        remote = RemoteSelector(addresses=[x for _, x in self.workers],
+                                authkey='secret')
+        try:
+            self.assertEqual(remote.fieldnames, ['A', 'B', 'C'])
+            self.assertEqual(remote({'A': 'B'}).fetch(),
+                             {'x': ['1'], 'y': ['2'], 'z': ['3']})
+            self.assertEqual(sorted(remote('C').fetch()), ['', '', 'foo'])
+        finally:
+            remote.close()
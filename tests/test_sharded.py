@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import sqlite3
+from . import _unittest as unittest
+from datatest._compatibility.builtins import *
+from datatest._predicate import Predicate
+from datatest._query.query import Selector
+from datatest._query.sharded import ShardedSelector
+from datatest._query.sharded import _merge_values
+
+
+def is_large(value):  # <- Module-level functions can be sent to workers.
+    return value > 15
+
+
+class TestMergeValues(unittest.TestCase):
+    def test_sum_and_count(self):
+        self.assertEqual(_merge_values('SUM', [10, None, 2.5]), 12.5)
+        self.assertIsNone(_merge_values('SUM', [None, None]))
+        self.assertEqual(_merge_values('COUNT', [2, 3]), 5)
+        self.assertEqual(_merge_values('COUNT', []), 0)
+
+    def test_overflow(self):
+        with self.assertRaises(OverflowError):
+            _merge_values('SUM', [2 ** 62, 2 ** 62])
+
+    def test_avg(self):
+        self.assertEqual(_merge_values('AVG', [(10, 1), (20, 3)]), 7.5)
+        self.assertIsNone(_merge_values('AVG', [(None, 0), (None, 0)]))
+
+    def test_min_max(self):
+        self.assertEqual(_merge_values('MIN', ['a', None, 5]), 5)
+        self.assertEqual(_merge_values('MAX', ['a', None, 5]), 'a')
+        self.assertIsNone(_merge_values('MAX', [None]))
+
+
+class TestShardedSelector(unittest.TestCase):
+    def setUp(self):
+        data = [
+            ['A', 'B', 'C', 'D'],
+            ['x', 'foo', 20, 1.5],
+            ['x', 'foo', 30, 2.5],
+            ['y', 'foo', 10, 0.25],
+            ['y', 'bar', 20, ''],
+            ['z', 'bar', 10, 'a'],
+            ['z', 'bar', 10, 0.5],
+            ['w', 'baz', 5, None],
+        ]
+        self.select = Selector(data)
+        self.sharded = ShardedSelector(data, shards=3)
+
+    def tearDown(self):
+        self.sharded.close()
+
+    def assertSameResult(self, columns, method=None, **where):
+        expected = self.select(columns, **where)
+        actual = self.sharded(columns, **where)
+        if method:
+            expected = getattr(expected, method)()
+            actual = getattr(actual, method)()
+        self.assertEqual(actual.fetch(), expected.fetch())
+
+    def test_shards(self):
+        counts = []
+        for path in self.sharded._shard_paths:
+            connection = sqlite3.connect(path)
+            cursor = connection.execute(
+                'SELECT count(*) FROM {0}'.format(self.sharded._table))
+            counts.append(cursor.fetchone()[0])
+            connection.close()
+        self.assertEqual(counts, [2, 3, 2])
+
+    def test_select(self):
+        self.assertSameResult('A')
+        self.assertSameResult(set(['A']))
+        self.assertSameResult(('A', 'C'))
+        self.assertSameResult({'A': 'C'})
+        self.assertSameResult({('A', 'B'): 'D'})
+        self.assertSameResult({'B': set(['A'])})
+
+    def test_where(self):
+        self.assertSameResult('C', A='x')
+        self.assertSameResult('A', B=set(['bar']))
+        self.assertSameResult('A', B=re.compile('^f'))
+        self.assertSameResult('A', C=is_large)
+        self.assertSameResult('A', C=lambda x: x > 15)  # <- Runs locally.
+        self.assertSameResult('A', D=~Predicate(''))
+
+    def test_streamed_results(self):
+        expected = self.select(('A', 'C')).fetch()
+        first = iter(self.sharded(('A', 'C')).execute())
+        self.assertEqual(next(first), expected[0])
+
+        abandoned = iter(self.sharded('B').execute())
+        next(abandoned)
+        del abandoned
+
+        self.assertSameResult({'A': 'C'}, 'sum')  # <- Query while streaming.
+        self.assertEqual([expected[0]] + list(first), expected)
+        self.assertEqual(self.sharded._streams, {})
+
+    def test_distinct(self):
+        self.assertSameResult('A', 'distinct')
+        self.assertSameResult({'B': 'A'}, 'distinct')
+
+    def test_aggregate(self):
+        for method in ['sum', 'count', 'avg', 'min', 'max']:
+            self.assertSameResult('C', method)
+            self.assertSameResult('D', method)
+            self.assertSameResult(set(['A']), method)
+            self.assertSameResult({'A': 'C'}, method)
+            self.assertSameResult({'A': 'D'}, method)
+            self.assertSameResult({('A', 'B'): 'C'}, method)
+            self.assertSameResult({'B': set(['C'])}, method)
+            self.assertSameResult('C', method, A='missing')
+            self.assertSameResult({'A': 'C'}, method, A='missing')
+
+    def test_shard_key(self):
+        self.sharded.close()
+        data = [['A', 'B', 'C', 'D']] + self.select(('A', 'B', 'C', 'D')).fetch()
+        self.sharded = ShardedSelector(data, shards=3, shard_key='A')
+        for method in ['sum', 'count', 'avg', 'min', 'max']:
+            self.assertSameResult({'A': 'C'}, method)
+            self.assertSameResult({'A': set(['C'])}, method)
+
+    def test_load_data(self):
+        self.sharded.load_data([['A', 'E'], ['v', 1]])
+        self.select.load_data([['A', 'E'], ['v', 1]])
+        self.assertEqual(self.sharded.fieldnames, ['A', 'B', 'C', 'D', 'E'])
+        self.assertSameResult(('A', 'E'))
+        self.assertSameResult({'A': 'C'}, 'sum')
+
+    def test_create_index(self):
+        self.sharded.create_index('A')
+        self.assertSameResult('C', A='x')
+
+    def test_close(self):
+        self.sharded('A').fetch()  # <- Starts workers.
+        shard_dir = self.sharded._shard_dir
+        self.sharded.close()
+        self.assertFalse(os.path.exists(shard_dir))
+
+    def test_unsupported(self):
+        with self.assertRaises(TypeError):
+            self.sharded.sample(n=2)
+        with self.assertRaises(TypeError):
+            self.sharded.join(self.select, on='A')
+        with self.assertRaises(TypeError):
+            self.sharded.snapshot('shards.sqlite')
+        with self.assertRaises(ValueError):
+            ShardedSelector([['A'], ['x']], partitioned=True)
+        with self.assertRaises(TypeError):
+            ShardedSelector.from_snapshot('shards.sqlite')
+        for name in ['query_cache', 'auto_index', 'timeout', 'progress']:
+            with self.assertRaises(ValueError):
+                ShardedSelector([['A'], ['x']], **{name: 1})
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import shutil
+import tempfile
+from . import _unittest as unittest
+from datatest._compatibility.builtins import *
+from datatest._predicate import Predicate
+from datatest._query.query import Selector
+from datatest._query.streaming import StreamingSelector
+from datatest._query.streaming import _Aggregate
+
+
+class TestAggregate(unittest.TestCase):
+    def aggregate(self, sqlfunc, values, distinct=False):
+        select = StreamingSelector()
+        aggregate = _Aggregate(sqlfunc, distinct, select._to_number)
+        for value in values:
+            aggregate.add(value)
+        return aggregate.result()
+
+    def test_sum(self):
+        self.assertEqual(self.aggregate('SUM', ['10', '20']), 30)
+        self.assertEqual(self.aggregate('SUM', ['10', '2.5']), 12.5)
+        self.assertEqual(self.aggregate('SUM', ['abc', '5']), 5.0)
+        self.assertIsInstance(self.aggregate('SUM', ['', '4']), float)
+        self.assertIsNone(self.aggregate('SUM', []))
+        self.assertEqual(self.aggregate('SUM', [1, 1, 2], distinct=True), 3)
+
+    def test_overflow(self):
+        with self.assertRaises(OverflowError):
+            self.aggregate('SUM', [2 ** 62, 2 ** 62])
+
+    def test_avg(self):
+        self.assertEqual(self.aggregate('AVG', ['10', '20']), 15.0)
+        self.assertIsNone(self.aggregate('AVG', []))
+
+    def test_count(self):
+        self.assertEqual(self.aggregate('COUNT', ['a', None, '']), 2)
+        self.assertEqual(self.aggregate('COUNT', []), 0)
+
+    def test_min_max(self):
+        self.assertEqual(self.aggregate('MIN', ['9', '10', None]), '10')
+        self.assertEqual(self.aggregate('MAX', ['9', '10', 11]), '9')
+        self.assertIsNone(self.aggregate('MAX', []))
+
+
+class TestStreamingSelector(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.paths = []
+        for index, text in enumerate([
+            b'A,B,C\nx,foo,20\nx,foo,30\ny,foo,10\n',
+            b'A,B,D\ny,bar,a\nz,bar,b\nz,bar,c\n',
+            b'',  # <- Empty file.
+        ]):
+            path = os.path.join(self.temp_dir, 'file{0}.csv'.format(index))
+            with open(path, 'wb') as fh:
+                fh.write(text)
+            self.paths.append(path)
+
+        self.select = Selector(self.paths)
+        self.streaming = StreamingSelector(self.paths)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def assertSameResult(self, columns, method=None, **where):
+        expected = self.select(columns, **where)
+        actual = self.streaming(columns, **where)
+        if method:
+            expected = getattr(expected, method)()
+            actual = getattr(actual, method)()
+        self.assertEqual(actual.fetch(), expected.fetch())
+
+    def test_fieldnames(self):
+        self.assertEqual(self.streaming.fieldnames, ['A', 'B', 'C', 'D'])
+
+    def test_wildcard(self):
+        streaming = StreamingSelector(os.path.join(self.temp_dir, '*.csv'))
+        self.assertEqual(set(streaming.fieldnames), set(['A', 'B', 'C', 'D']))
+
+    def test_select(self):
+        self.assertSameResult('A')
+        self.assertSameResult(set(['A']))
+        self.assertSameResult(('A', 'C'))
+        self.assertSameResult({'A': 'C'})
+        self.assertSameResult({('A', 'B'): 'D'})
+        self.assertSameResult({'B': set(['A'])})
+
+    def test_where(self):
+        self.assertSameResult('C', A='x')
+        self.assertSameResult('A', B=set(['bar']))
+        self.assertSameResult('A', B=re.compile('^f'))
+        self.assertSameResult('A', C=lambda x: x != '')
+        self.assertSameResult('A', D=~Predicate(''))
+
+    def test_distinct(self):
+        self.assertSameResult('A', 'distinct')
+        self.assertSameResult({'B': 'A'}, 'distinct')
+
+    def test_aggregate(self):
+        for method in ['sum', 'count', 'avg', 'min', 'max']:
+            self.assertSameResult('C', method)
+            self.assertSameResult('D', method)
+            self.assertSameResult(set(['A']), method)
+            self.assertSameResult({'A': 'C'}, method)
+            self.assertSameResult({('A', 'B'): 'C'}, method)
+            self.assertSameResult({'B': set(['A'])}, method)
+            self.assertSameResult('C', method, A='missing')
+            self.assertSameResult({'A': 'C'}, method, A='missing')
+
+    def test_converters(self):
+        streaming = StreamingSelector(self.paths, converters={'C': int})
+        self.assertEqual(streaming('C').fetch(), [20, 30, 10, '', '', ''])
+        self.assertEqual(streaming('C', C=int).sum().fetch(), 60)
+
+    def test_exhaustible_source(self):
+        with self.assertRaises(TypeError):
+            StreamingSelector(iter([['A'], ['x']]))
+
+    def test_sequence_source(self):
+        streaming = StreamingSelector([['A', 'B'], ['x', 1], ['y', 2]])
+        self.assertEqual(streaming({'A': 'B'}).sum().fetch(), {'x': 1, 'y': 2})
+        self.assertEqual(streaming('B').sum().fetch(), 3)  # <- Reads again.
+
+    def test_sample(self):
+        sample = self.streaming.sample(n=3, seed=1)
+        self.assertIsInstance(sample, Selector)
+        self.assertEqual(len(sample('A').fetch()), 3)
+        self.assertEqual(sample.fieldnames, ['A', 'B', 'C', 'D'])
+        self.assertEqual(sample('C').fetch(),
+                         self.streaming.sample(n=3, seed=1)('C').fetch())
+
+        sample = self.streaming.sample(fraction=0.5, seed=1)
+        rows = sample(('A', 'B', 'C')).fetch()
+        self.assertEqual(len(rows), 3)
+        remaining = iter(self.streaming(('A', 'B', 'C')).fetch())
+        self.assertTrue(all(x in remaining for x in rows), msg='original order')
+        self.assertEqual(rows, self.streaming.sample(fraction=0.5, seed=1)(('A', 'B', 'C')).fetch())
+
+        with self.assertRaises(TypeError):
+            self.streaming.sample()
+
+    def test_explain_sql(self):
+        explained = self.streaming('A')._explain(file=None, sql=True)
+        self.assertIn('SQL Query:\n  <not available>', explained)
+
+    def test_unsupported(self):
+        snapshot = os.path.join(self.temp_dir, 'data.snapshot')
+        calls = [
+            lambda: self.streaming.storage,
+            lambda: self.streaming.create_index('A'),
+            lambda: self.streaming.index_report(),
+            lambda: self.streaming.query_cache_info(),
+            lambda: self.streaming.snapshot(snapshot),
+            lambda: StreamingSelector.from_snapshot(snapshot),
+            lambda: self.streaming.refresh(),
+            lambda: self.streaming.drop_source(self.paths[0]),
+        ]
+        for call in calls:
+            with self.assertRaises(TypeError):
+                call()
+        self.assertFalse(os.path.exists(snapshot))
+
+    def test_join(self):
+        with self.assertRaises(TypeError):
+            self.streaming.join(self.select, on='A')
+
+        with self.assertRaises(TypeError):
+            self.select.join(self.streaming, on='A')
@@ -1,21 +1,31 @@
 # -*- coding: utf-8 -*-
 import itertools
+import os
+import shutil
 import sqlite3
+import tempfile
 import unittest
 
 import datatest._load.temptable as temptable
 from datatest._compatibility import collections
 from datatest._load.temptable import (
+    uses_temp_database,
     table_exists,
     new_table_name,
     normalize_names,
     normalize_default,
+    infer_types,
+    infer_column_types,
+    convert_records,
     create_table,
     get_columns,
+    get_column_types,
     insert_records,
     alter_table,
+    copy_table,
     drop_table,
     savepoint,
+    bulk_load,
     load_data,
 )
 
@@ -108,6 +118,77 @@ class TestNormalizeDefault(unittest.TestCase):
         self.assertEqual(normalized, "''")
 
 
+class TestInferTypes(unittest.TestCase):
+    def test_strings(self):
+        records = [
+            ('1', '1.5', 'x', '0', ''),
+            ('20', '2', 'y', '-3', ''),
+        ]
+        types = infer_types(['A', 'B', 'C', 'D', 'E'], records)
+        self.assertEqual(types, ['INTEGER', 'REAL', 'TEXT', 'INTEGER', ''])
+
+    def test_non_canonical_integers(self):
+        records = [('007',), ('+5',), (' 5',), ('99999999999999999999',)]
+        for record in records:
+            self.assertEqual(infer_types(['A'], [record]), ['TEXT'], msg=record)
+
+    def test_reals(self):
+        records = [('1.5',), ('.5',), ('1e10',), ('-2.5E-3',)]
+        for record in records:
+            self.assertEqual(infer_types(['A'], [record]), ['REAL'], msg=record)
+
+        records = [('nan',), ('inf',), ('1.5.1',)]
+        for record in records:
+            self.assertEqual(infer_types(['A'], [record]), ['TEXT'], msg=record)
+
+    def test_numbers(self):
+        records = [(1, 1.5, None), (2, 3, None)]
+        types = infer_types(['A', 'B', 'C'], records)
+        self.assertEqual(types, ['INTEGER', 'REAL', ''])
+
+
+class TestInferColumnTypes(unittest.TestCase):
+    def setUp(self):
+        connection = sqlite3.connect(':memory:')
+        connection.isolation_level = None
+        self.cursor = connection.cursor()
+
+    def infer(self, values):
+        self.cursor.execute('DROP TABLE IF EXISTS staged')
+        self.cursor.execute('CREATE TABLE staged (A)')
+        self.cursor.executemany('INSERT INTO staged VALUES (?)', [(x,) for x in values])
+        return infer_column_types(self.cursor, 'staged', ['A'])[0]
+
+    def test_same_as_infer_types(self):
+        values = ['1', '20', '-3', '0', '007', '+5', ' 5', '-0', '1.5', '.5',
+                  '1e10', '-2.5E-3', '5.', '-.5', '-5.5', '..5', '-', '.', '1-2.5',
+                  'nan', 'inf', '1.5.1', 'x', '', None,
+                  '99999999999999999999', '9223372036854775807',
+                  '-9223372036854775808', 1, 1.5]
+        for value in values:
+            expected = infer_types(['A'], [(value,)])[0]
+            self.assertEqual(self.infer([value]), expected, msg=repr(value))
+
+    def test_columns(self):
+        self.assertEqual(self.infer(['1', '', None, '2']), 'INTEGER')
+        self.assertEqual(self.infer(['1', '2.5', 3]), 'REAL')
+        self.assertEqual(self.infer(['1', '2.5', 'x']), 'TEXT')
+        self.assertEqual(self.infer(['', None]), '')
+        self.assertEqual(self.infer([]), '')
+
+
+class TestConvertRecords(unittest.TestCase):
+    def test_convert(self):
+        records = [('x', '1', '2'), ('y', '', '3')]
+        converted = convert_records(['A', 'B', 'C'], records, {'B': float, 'D': int})
+        self.assertEqual(list(converted), [['x', 1.0, '2'], ['y', '', '3']])
+
+    def test_no_matching_columns(self):
+        records = [('x', '1')]
+        converted = convert_records(['A', 'B'], records, {'D': int})
+        self.assertIs(converted, records)
+
+
 class TestCreateTable(unittest.TestCase):
     def setUp(self):
         connection = sqlite3.connect(':memory:')
@@ -175,6 +256,27 @@ class TestCreateTable(unittest.TestCase):
             create_table(self.cursor, 'test_table4', ['', 'B', '    '])
 
 
+class TestUsesTempDatabase(unittest.TestCase):
+    def test_temp_databases(self):
+        for database in (':memory:', ''):
+            cursor = sqlite3.connect(database).cursor()
+            self.assertTrue(uses_temp_database(cursor), msg=database)
+
+    def test_file_database(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, 'test.sqlite')
+            connection = sqlite3.connect(path)
+            self.assertFalse(uses_temp_database(connection.cursor()))
+
+            create_table(connection.cursor(), 'test_table', ['A', 'B'])
+            cursor = connection.execute('SELECT name FROM sqlite_master')
+            self.assertEqual(cursor.fetchall(), [('test_table',)])
+            connection.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+
 class TestGetColumns(unittest.TestCase):
     def setUp(self):
         connection = sqlite3.connect(':memory:')
@@ -234,6 +336,14 @@ class TestInsertRecords(unittest.TestCase):
         ]
         self.assertEqual(results, expected)
 
+    def test_chunk_size(self):
+        self.cursor.execute('CREATE TEMPORARY TABLE test_table ("A", "B")')
+        records = iter([('x', 1), ('y', 2), ('z', 3)])
+        insert_records(self.cursor, 'test_table', ['A', 'B'], records, chunk_size=2)
+
+        self.cursor.execute('SELECT A, B FROM test_table')
+        self.assertEqual(self.cursor.fetchall(), [('x', 1), ('y', 2), ('z', 3)])
+
     def test_wrong_number_of_values(self):
         self.cursor.execute('CREATE TEMPORARY TABLE test_table ("A", "B")')
 
@@ -301,6 +411,43 @@ class TestAlterTable(unittest.TestCase):
         self.assertEqual(columns, ['A', 'B', 'C', 'D'])
 
 
+class TestCopyTable(unittest.TestCase):
+    def setUp(self):
+        connection = sqlite3.connect(':memory:')
+        self.cursor = connection.cursor()
+        self.cursor.execute('CREATE TEMPORARY TABLE source ("A", "C")')
+        self.cursor.execute("INSERT INTO source VALUES ('x', 1)")
+
+    def test_new_table(self):
+        copy_table(self.cursor, 'test_table', 'source')
+        self.assertEqual(get_columns(self.cursor, 'test_table'), ['A', 'C'])
+        self.cursor.execute('SELECT * FROM test_table')
+        self.assertEqual(self.cursor.fetchall(), [('x', 1)])
+
+    def test_existing_table(self):
+        self.cursor.execute('CREATE TEMPORARY TABLE test_table ("A", "B")')
+        self.cursor.execute("INSERT INTO test_table VALUES ('y', 2)")
+        copy_table(self.cursor, 'test_table', 'source')
+
+        columns = get_columns(self.cursor, 'test_table')
+        self.assertEqual(columns, ['A', 'B', 'C'])
+        self.cursor.execute('SELECT * FROM test_table')
+        self.assertEqual(self.cursor.fetchall(), [('y', 2, ''), ('x', None, 1)])
+
+    def test_declared_types(self):
+        self.cursor.execute('CREATE TEMPORARY TABLE typed ("A" TEXT, "D" INTEGER)')
+        copy_table(self.cursor, 'test_table', 'typed')
+        self.assertEqual(get_column_types(self.cursor, 'test_table'), ['TEXT', 'INTEGER'])
+
+        copy_table(self.cursor, 'other_table', 'source')
+        copy_table(self.cursor, 'other_table', 'typed')  # <- Adds column D.
+        self.assertEqual(get_column_types(self.cursor, 'other_table'), ['', '', 'INTEGER'])
+
+    def test_missing_source(self):
+        copy_table(self.cursor, 'test_table', 'missing_table')
+        self.assertFalse(table_exists(self.cursor, 'test_table'))
+
+
 class TestDropTable(unittest.TestCase):
     def test_drop_table(self):
         connection = sqlite3.connect(':memory:')
@@ -398,6 +545,62 @@ class TestSavepoint(unittest.TestCase):
                 pass
 
 
+class TestBulkLoad(unittest.TestCase):
+    def setUp(self):
+        connection = sqlite3.connect(':memory:')
+        connection.isolation_level = None
+        self.cursor = connection.cursor()
+
+    def get_pragma(self, name):
+        self.cursor.execute('PRAGMA temp.{0}'.format(name))
+        return self.cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        journal_mode = self.get_pragma('journal_mode')
+        cache_size = self.get_pragma('cache_size')
+
+        with bulk_load(self.cursor, cache_size=-1024):
+            self.assertEqual(self.get_pragma('journal_mode'), 'memory')
+            self.assertEqual(self.get_pragma('cache_size'), -1024)
+            self.cursor.execute('CREATE TEMPORARY TABLE test_table ("A")')
+
+        self.assertEqual(self.get_pragma('journal_mode'), journal_mode)
+        self.assertEqual(self.get_pragma('cache_size'), cache_size)
+
+    def test_deferred_indexes(self):
+        def get_indexes():
+            self.cursor.execute("SELECT name FROM sqlite_temp_master WHERE type='index'")
+            return [x[0] for x in self.cursor.fetchall()]
+
+        self.cursor.execute('CREATE TEMPORARY TABLE test_table ("A")')
+        self.cursor.execute('CREATE INDEX temp.idx_a ON test_table ("A")')
+
+        with bulk_load(self.cursor, 'test_table'):
+            self.assertEqual(get_indexes(), [])
+            load_data(self.cursor, 'test_table', ['A'], [('x',), ('y',)])
+
+        self.assertEqual(get_indexes(), ['idx_a'])
+
+    def test_savepoint_rollback(self):
+        self.cursor.execute('CREATE TEMPORARY TABLE test_table ("A")')
+        try:
+            with bulk_load(self.cursor, 'test_table'):
+                with savepoint(self.cursor):
+                    self.cursor.execute("INSERT INTO test_table VALUES ('x')")
+                    raise Exception()
+        except Exception:
+            pass
+
+        self.cursor.execute('SELECT * FROM test_table')
+        self.assertEqual(self.cursor.fetchall(), [])
+
+    def test_bad_isolation_level(self):
+        connection = sqlite3.connect(':memory:')
+        connection.isolation_level = 'DEFERRED'
+        with self.assertRaises(ValueError):
+            bulk_load(connection.cursor())
+
+
 class TestLoadData(unittest.TestCase):
     def setUp(self):
         connection = sqlite3.connect(':memory:')
@@ -471,6 +674,41 @@ class TestLoadData(unittest.TestCase):
         self.cursor.execute('SELECT A, B FROM testtable2')
         self.assertEqual(self.cursor.fetchall(), [('x', 1), ('y', None), (None, 3)])
 
+    def test_infer_types(self):
+        records = [['A', 'B', 'C'], ['x', '10', '1.5'], ['y', '9', '']]
+        load_data(self.cursor, 'testtable', records, infer_types=True)
+
+        self.cursor.execute('PRAGMA table_info(testtable)')
+        self.assertEqual([x[2] for x in self.cursor], ['TEXT', 'INTEGER', 'REAL'])
+
+        self.cursor.execute('SELECT A, B, C FROM testtable ORDER BY B')
+        self.assertEqual(self.cursor.fetchall(), [('y', 9, ''), ('x', 10, 1.5)])
+
+    def test_infer_types_from_every_value(self):
+        records = [['A', 'B']] + [[str(i), str(i)] for i in range(5000)]
+        records += [['00501', '1e3']]  # <- Found after many integers.
+        load_data(self.cursor, 'testtable', records, infer_types=True)
+
+        self.cursor.execute('PRAGMA table_info(testtable)')
+        self.assertEqual([x[2] for x in self.cursor], ['TEXT', 'REAL'])
+
+        self.cursor.execute('SELECT A, B FROM testtable WHERE rowid = 5001')
+        self.assertEqual(self.cursor.fetchall(), [('00501', 1000.0)])
+        self.cursor.execute("SELECT name FROM sqlite_temp_master WHERE type='table'")
+        self.assertEqual(self.cursor.fetchall(), [('testtable',)], msg='staging table dropped')
+
+    def test_chunk_size(self):
+        records = [['A'], ['x'], ['y'], ['z']]
+        load_data(self.cursor, 'testtable', records, chunk_size=2)
+        self.cursor.execute('SELECT A FROM testtable')
+        self.assertEqual(self.cursor.fetchall(), [('x',), ('y',), ('z',)])
+
+    def test_converters(self):
+        records = [['A', 'B'], ['x', '10'], ['y', '9']]
+        load_data(self.cursor, 'testtable', records, converters={'B': float})
+        self.cursor.execute('SELECT SUM(B), MAX(B) FROM testtable')
+        self.assertEqual(self.cursor.fetchall(), [(19.0, 10.0)])
+
     def test_empty_records(self):
         records = []
 